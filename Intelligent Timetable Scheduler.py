@@ -1,13 +1,48 @@
 import streamlit as st
+from streamlit.errors import StreamlitAPIException
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from collections import defaultdict
-import random
 import json
 from datetime import datetime
 from io import BytesIO
 import base64
+import os
+import secrets
+import tempfile
+import zipfile
+
+from timetable.core import (
+    validate_constraints,
+    generate_timetable_with_optimization,
+)
+from timetable.week import STANDARD_WEEK, WEEKDAYS, Week
+from timetable.constraints import ConstraintRegistry, HARD, SOFT
+from timetable.genetic import evolve_timetables
+from timetable.portfolio import run_portfolio, summarize_portfolio_log, DEFAULT_PORTFOLIO
+from timetable.exact import exact_available, solve_exact
+from timetable.term import TermPlanner, term_summary
+from timetable.substitution import OccupancyIndex
+from timetable.teacher_index import TeacherIndex
+from timetable.availability import AvailabilityIndex, session_mask
+from timetable.analytics import (
+    slot_table, timetable_cells, teacher_workload, subject_distribution, daily_load, session_load,
+    utilization, idle_gaps,
+)
+from timetable.columnar import columnar_available, export_store, import_store
+from timetable.render import (
+    create_display_timetable, style_timetable, render_batch, section_documents, teacher_documents,
+    pdf_available, file_stem,
+)
+from timetable.history import HistoryStore
+from timetable.diff import diff_snapshots, diff_timetables, take_snapshot
+from timetable.checkpoint import KEEP_FOR, Checkpoint, instance_fingerprint, prune_checkpoints
+from timetable.diagnosis import LAB, diagnose_unallocated, summarize_constraints
+from timetable.scenarios import EDIT_TYPES, base_configuration, apply_edits, describe_edit, evaluate_scenarios
+from timetable.subjects import SubjectStore
+from timetable.catalog import Catalog
+from timetable.footprint import DEFAULT_LIMITS, LIMIT_LABELS, enforce_limits, format_bytes, session_footprint
 
 # -------------------------------------------------
 # PAGE CONFIG
@@ -68,11 +103,6 @@ st.markdown("""
 # -------------------------------------------------
 # CONSTANTS
 # -------------------------------------------------
-DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
-PERIODS = [f"P{i}" for i in range(1, 9)]
-PERIODS_FN = PERIODS[:4]
-PERIODS_AN = PERIODS[4:]
-
 # ENHANCED: Department and Semester specific teachers
 TEACHERS_BY_DEPT_SEMESTER = {
     "ECE": {
@@ -151,6 +181,10 @@ TEACHERS_BY_DEPT_SEMESTER = {
 
 LAB_FLOORS = ["Lab 1", "Lab 2", "Lab 3", "Lab 4", "Lab 5"]
 CLASSROOMS = ["C1", "C2", "C3", "C4", "C5"]
+# Every session's portfolio races, for tuning the default portfolio (python -m timetable.portfolio)
+PORTFOLIO_LOG = "portfolio_log.jsonl"
+# Saved progress of long runs, by session checkpoint key (see timetable.checkpoint)
+CHECKPOINT_DIR = "checkpoints"
 
 # -------------------------------------------------
 # PRE-DEFINED SUBJECTS (DEPARTMENT-SPECIFIC)
@@ -661,6 +695,15 @@ PREDEFINED_SUBJECTS = {
 }
 
 
+@st.cache_resource
+def shared_catalog():
+    """Predefined subjects and teachers, built once per server process and shared read-only by every session"""
+    return Catalog(PREDEFINED_SUBJECTS, TEACHERS_BY_DEPT_SEMESTER)
+
+
+catalog = shared_catalog()
+
+
 # -------------------------------------------------
 # ENHANCED TEACHER ASSIGNMENT TRACKING
 # -------------------------------------------------
@@ -793,71 +836,17 @@ def extract_teacher_name_from_option(option_text):
 # -------------------------------------------------
 def calculate_teacher_workload(timetable, subject_teacher_map):
     """Calculate workload for each teacher"""
-    workload = defaultdict(int)
-    for day in DAYS:
-        for period in PERIODS:
-            subject = timetable.loc[day, period]
-            if subject and subject != "" and subject != "Library" and subject != "BREAK":
-                teacher = subject_teacher_map.get(subject)
-                if teacher:
-                    workload[teacher] += 1
-    return dict(workload)
+    return teacher_workload(slot_table([("", timetable, subject_teacher_map)], week)).to_dict()
 
 
 def calculate_utilization_score(timetable):
     """Calculate how well the timetable is utilized"""
-    total_slots = len(DAYS) * len(PERIODS)
-    filled_slots = 0
-    library_slots = 0
-
-    for day in DAYS:
-        for period in PERIODS:
-            cell = timetable.loc[day, period]
-            if cell and cell != "":
-                if cell == "Library":
-                    library_slots += 1
-                else:
-                    filled_slots += 1
-
-    utilization = (filled_slots / total_slots) * 100
-    return utilization, filled_slots, library_slots
-
-
-def validate_constraints(timetable, confirmed_theory):
-    """Validate all constraints and return violations"""
-    violations = []
-
-    # Check max 2 periods per subject per day
-    for subject in confirmed_theory:
-        subject_name = subject["name"]
-        for day in DAYS:
-            count = sum(1 for period in PERIODS if timetable.loc[day, period] == subject_name)
-            if count > 2:
-                violations.append({
-                    "type": "max_per_day",
-                    "subject": subject_name,
-                    "day": day,
-                    "count": count,
-                    "message": f"{subject_name} appears {count} times on {day} (max: 2)"
-                })
-
-    # Check same session for 2 periods
-    for subject in confirmed_theory:
-        subject_name = subject["name"]
-        for day in DAYS:
-            periods_on_day = [p for p in PERIODS if timetable.loc[day, p] == subject_name]
-            if len(periods_on_day) == 2:
-                sess1 = "FN" if periods_on_day[0] in PERIODS_FN else "AN"
-                sess2 = "FN" if periods_on_day[1] in PERIODS_FN else "AN"
-                if sess1 != sess2:
-                    violations.append({
-                        "type": "session_split",
-                        "subject": subject_name,
-                        "day": day,
-                        "message": f"{subject_name} on {day} spans both sessions"
-                    })
-
-    return violations
+    return utilization(slot_table([("", timetable, {})], week))
+
+
+def lab_period_count(labs):
+    """Periods taken by labs, one whole session each"""
+    return sum(week.session_length(l.get("session") or "FN") for l in labs)
 
 
 def export_to_excel(timetable, summary_data, timetable_name, workload_data=None):
@@ -866,7 +855,7 @@ def export_to_excel(timetable, summary_data, timetable_name, workload_data=None)
 
     with pd.ExcelWriter(output, engine='openpyxl') as writer:
         # Timetable sheet
-        display_timetable = create_display_timetable(timetable)
+        display_timetable = create_display_timetable(timetable, week)
         display_timetable.to_excel(writer, sheet_name='Timetable', index=True)
 
         # Summary sheet
@@ -883,241 +872,156 @@ def export_to_excel(timetable, summary_data, timetable_name, workload_data=None)
     return output.getvalue()
 
 
-def create_display_timetable(timetable):
-    """Create display version with break column"""
-    display_columns = PERIODS_FN + ["BREAK"] + PERIODS_AN
-    display_timetable = pd.DataFrame("", index=DAYS, columns=display_columns)
+def export_teacher_timetables(teacher_index, teachers):
+    """Export personal timetables to Excel, one sheet per teacher"""
+    output = BytesIO()
 
-    for day in DAYS:
-        for period in PERIODS_FN:
-            display_timetable.loc[day, period] = timetable.loc[day, period]
-        display_timetable.loc[day, "BREAK"] = "BREAK"
-        for period in PERIODS_AN:
-            display_timetable.loc[day, period] = timetable.loc[day, period]
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        for teacher in teachers:
+            sheet_name = "".join(c for c in teacher if c not in '[]:*?/\\')[:31]
+            display_timetable = create_display_timetable(teacher_index.personal_timetable(teacher), week)
+            display_timetable.to_excel(writer, sheet_name=sheet_name, index=True)
 
-    return display_timetable
+    return output.getvalue()
 
 
-# -------------------------------------------------
-# ADVANCED TIMETABLE GENERATION WITH SCORING
-# -------------------------------------------------
-def generate_timetable_with_optimization(confirmed_theory, confirmed_lab, max_iterations=100):
+def prepared_download(name, label, build):
     """
-    Generate timetable with optimization scoring
-    Tries multiple iterations and returns the best one
+    Download data built only when the Prepare button is pressed, and kept
+    until the timetable store changes; None until then.
     """
-    best_timetable = None
-    best_score = -1
-    best_unallocated = None
-
-    for iteration in range(max_iterations):
-        timetable, unallocated = generate_single_timetable(confirmed_theory, confirmed_lab)
+    prepared = st.session_state.prepared_downloads
+    if name in prepared and prepared[name][0] != st.session_state.store_version:
+        del prepared[name]
+    if name not in prepared:
+        if not st.button(label, key=f"prepare_{name}", use_container_width=True):
+            return None
+        prepared[name] = (st.session_state.store_version, build())
+    return prepared[name][1]
 
-        if timetable is not None:
-            score = calculate_timetable_score(timetable, confirmed_theory, unallocated)
 
-            if score > best_score:
-                best_score = score
-                best_timetable = timetable.copy()
-                best_unallocated = unallocated.copy() if unallocated else []
-
-                # If perfect score, stop early
-                if score >= 95 and not unallocated:
-                    break
-
-    return best_timetable, best_unallocated, best_score
-
-
-def calculate_timetable_score(timetable, confirmed_theory, unallocated):
+def store_availability(teacher_free_periods):
     """
-    Calculate quality score of timetable
-    Factors:
-    - Allocation completeness (40%)
-    - Distribution quality (30%)
-    - Constraint satisfaction (30%)
+    AvailabilityIndex of the timetable store, kept until the store or the
+    teachers' preferred free periods change.
     """
-    score = 0
-
-    # 1. Allocation completeness (40 points)
-    total_periods_needed = sum(s["periods"] for s in confirmed_theory)
-    if total_periods_needed > 0:
-        unallocated_periods = sum(u["remaining"] for u in unallocated) if unallocated else 0
-        allocated_periods = total_periods_needed - unallocated_periods
-        allocation_score = (allocated_periods / total_periods_needed) * 40
-        score += allocation_score
-    else:
-        score += 40
-
-    # 2. Distribution quality (30 points)
-    distribution_penalties = 0
-    for subject in confirmed_theory:
-        subject_name = subject["name"]
-        day_counts = []
-        for day in DAYS:
-            count = sum(1 for period in PERIODS if timetable.loc[day, period] == subject_name)
-            day_counts.append(count)
-
-        # Penalize uneven distribution
-        if day_counts:
-            max_count = max(day_counts)
-            min_count = min([c for c in day_counts if c > 0] or [0])
-            if max_count - min_count > 1:
-                distribution_penalties += 5
-
-    distribution_score = max(0, 30 - distribution_penalties)
-    score += distribution_score
-
-    # 3. Constraint satisfaction (30 points)
-    violations = validate_constraints(timetable, confirmed_theory)
-    constraint_score = max(0, 30 - (len(violations) * 5))
-    score += constraint_score
-
-    return min(100, score)
-
-
-def generate_single_timetable(confirmed_theory, confirmed_lab):
-    """Generate a single timetable attempt"""
-    timetable = pd.DataFrame("", index=DAYS, columns=PERIODS)
-    lab_sessions = {}
-
-    # Check lab conflicts
-    lab_conflicts = []
-    for i, lab1 in enumerate(confirmed_lab):
-        for j, lab2 in enumerate(confirmed_lab):
-            if i < j:
-                if lab1["day"] == lab2["day"] and lab1["session"] == lab2["session"]:
-                    lab_conflicts.append((lab1["name"], lab2["name"], lab1["day"], lab1["session"]))
-
-    if lab_conflicts:
-        return None, lab_conflicts
-
-    # Get teacher preferences (free periods)
-    teacher_free_periods = st.session_state.get("teacher_preferences", {})
-
-    # Allocate labs
-    for lab in confirmed_lab:
-        day = lab["day"]
-        session = lab["session"]
-        lab_sessions[day] = session
-
-        slots = PERIODS_FN if session == "FN" else PERIODS_AN
-
-        for slot in slots:
-            timetable.loc[day, slot] = lab["name"]
-
-    # Sort subjects by periods (descending) for better allocation
-    sorted_subjects = sorted(confirmed_theory, key=lambda x: x["periods"], reverse=True)
-
-    subject_day_count = defaultdict(lambda: defaultdict(int))
-    subject_day_session = defaultdict(lambda: defaultdict(str))
-
-    unallocated = []
-
-    # Allocate theory subjects
-    for subject in sorted_subjects:
-        periods_needed = subject["periods"]
-        subject_name = subject["name"]
-        teacher = subject.get("teacher")
-        allocated_count = 0
-
-        # Get all available slots
-        all_slots = []
-        for day in DAYS:
-            if day in lab_sessions:
-                lab_session = lab_sessions[day]
-                available_periods = PERIODS_AN if lab_session == "FN" else PERIODS_FN
-            else:
-                available_periods = PERIODS[:]
-
-            for period in available_periods:
-                if timetable.loc[day, period] == "":
-                    # Check if teacher has a free period at this time
-                    if teacher and teacher in teacher_free_periods:
-                        if (day, period) not in teacher_free_periods[teacher]:
-                            all_slots.append((day, period))
-                    else:
-                        all_slots.append((day, period))
-
-        random.shuffle(all_slots)
-
-        attempts = 0
-        max_attempts = len(all_slots) * 3
-
-        while allocated_count < periods_needed and attempts < max_attempts:
-            attempts += 1
-
-            valid_slots = []
-            for day, period in all_slots:
-                # Check max 2 per day
-                if subject_day_count[subject_name][day] >= 2:
-                    continue
-
-                if timetable.loc[day, period] != "":
-                    continue
-
-                current_session = "FN" if period in PERIODS_FN else "AN"
-
-                # If already allocated on this day, must be same session
-                if subject_day_count[subject_name][day] > 0:
-                    required_session = subject_day_session[subject_name][day]
-                    if current_session != required_session:
-                        continue
-
-                valid_slots.append((day, period, current_session))
-
-            if not valid_slots:
-                break
-
-            # Prefer days with fewer allocations for this subject
-            valid_slots.sort(key=lambda x: subject_day_count[subject_name][x[0]])
-
-            day, period, session = valid_slots[0]
-
-            timetable.loc[day, period] = subject_name
-            subject_day_count[subject_name][day] += 1
-            subject_day_session[subject_name][day] = session
-            allocated_count += 1
+    preferences = tuple(sorted((teacher, tuple(map(tuple, periods)))
+                               for teacher, periods in teacher_free_periods.items()))
+    key = (st.session_state.store_version, preferences)
+    cached = st.session_state.availability_cache
+    if cached is None or cached[0] != key:
+        cached = (key, AvailabilityIndex.from_store(st.session_state.saved_timetables, teacher_free_periods, week))
+        st.session_state.availability_cache = cached
+    return cached[1]
+
+
+def show_timetable_diff(diff, key):
+    """Summary metrics and change tables of a diff_snapshots result"""
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Changed Slots", len(diff["slots"]))
+    with col2:
+        st.metric("Sections Changed", int((diff["sections"]["Status"] != "unchanged").sum()))
+    with col3:
+        st.metric("Disruption", f"{diff['disruption'] * 100:.1f}%")
+
+    if diff["slots"].empty:
+        st.success("No changes!")
+        return
+
+    changes_tab, subjects_tab, teachers_tab, sections_tab = st.tabs(
+        ["Changed Periods", "By Subject", "By Teacher", "By Section"])
+    with changes_tab:
+        st.dataframe(diff["slots"], use_container_width=True, hide_index=True)
+        st.download_button(
+            label="Download Change Notice (CSV)",
+            data=diff["slots"].to_csv(index=False).encode("utf-8"),
+            file_name="Timetable_Changes.csv",
+            mime="text/csv",
+            use_container_width=True,
+            key=f"{key}_download"
+        )
+    with subjects_tab:
+        st.dataframe(diff["subjects"], use_container_width=True, hide_index=True)
+    with teachers_tab:
+        st.dataframe(diff["teachers"], use_container_width=True, hide_index=True)
+    with sections_tab:
+        st.dataframe(diff["sections"], use_container_width=True, hide_index=True)
+
+
+def can_generate():
+    """Whether the Generate button is enabled for the current subjects"""
+    subjects = st.session_state.subjects
+    if any(l.needs_schedule for l in subjects.of_kind("lab")):
+        return False
+    confirmed_lab = subjects.confirmed("lab")
+    if any(l.day not in week.days for l in confirmed_lab):
+        return False
+    return bool(confirmed_lab) or bool(subjects.confirmed("theory"))
 
-            all_slots = [(d, p) for d, p in all_slots if not (d == day and p == period)]
 
-        if allocated_count < periods_needed:
-            unallocated.append({
-                "subject": subject_name,
-                "needed": periods_needed,
-                "allocated": allocated_count,
-                "remaining": periods_needed - allocated_count
-            })
+def rerun_editor():
+    """
+    Rerun only the calling editor fragment; the sidebar and other tabs catch up
+    on the next full run. A change that enables or disables generation reruns
+    the whole page so the Generate button is never stale.
+    """
+    if can_generate() != st.session_state.get("generate_enabled"):
+        st.rerun()
+    try:
+        st.rerun(scope="fragment")
+    except StreamlitAPIException:
+        # The edit arrived with a full run (not from inside the fragment)
+        st.rerun()
 
-    # Fill empty slots with Library
-    for day in DAYS:
-        for period in PERIODS:
-            if timetable.loc[day, period] == "":
-                timetable.loc[day, period] = "Library"
 
-    return timetable, unallocated
+def preferences_changed():
+    """Rerun after a teacher preference edit; a generated timetable is now out of date"""
+    if st.session_state.timetable_generated:
+        st.session_state.timetable_generated = False
+        st.rerun()
+    rerun_editor()
 
 
 # -------------------------------------------------
 # SESSION STATE INITIALIZATION
 # -------------------------------------------------
 def init_state():
+    if "checkpoint_key" not in st.session_state:
+        # A new session: drop saved runs nobody resumed in time
+        prune_checkpoints(CHECKPOINT_DIR)
     defaults = {
-        "theory_subjects": [],
-        "lab_subjects": [],
+        "subjects": SubjectStore(),
         "timetable_generated": False,
         "predefined_loaded": False,
         "current_regulation": None,
         "current_semester": None,
         "current_dept": None,
-        "deleted_theory_subjects": [],
-        "deleted_lab_subjects": [],
         "timetable": None,
         "unallocated": None,
         "timetable_score": 0,
-        "history": [],
+        "timetable_pool": [],
+        "week": STANDARD_WEEK,
+        "history": HistoryStore(),
         "teacher_preferences": {},
         "generation_count": 0,
         "teacher_assignments": {},
+        "scheduling_rules": [],
+        "rule_count": 0,
+        "portfolio_history": [],
+        "term_plan": None,
+        "saved_timetables": {},
+        "store_version": 0,
+        "prepared_downloads": {},
+        "availability_cache": None,
+        "teacher_index": TeacherIndex(),
+        "published_versions": [],
+        "scenarios": {},
+        "scenario_results": None,
+        "diagnosis": None,
+        # Names this session's checkpoint files, so sessions on one server never share a run
+        "checkpoint_key": secrets.token_hex(4),
+        "session_limits": dict(DEFAULT_LIMITS),
     }
     for k, v in defaults.items():
         if k not in st.session_state:
@@ -1126,6 +1030,13 @@ def init_state():
 
 init_state()
 init_teacher_assignments()
+# Generated artifacts beyond the session's caps are dropped, oldest first
+evicted = enforce_limits(st.session_state, st.session_state.session_limits)
+if evicted:
+    st.toast("Freed memory: dropped " + ", ".join(
+        f"{count} old {LIMIT_LABELS[key].lower()}" for key, count in evicted.items()))
+# Days, periods and session split of every timetable in this session
+week = st.session_state.week
 
 
 # -------------------------------------------------
@@ -1133,14 +1044,7 @@ init_teacher_assignments()
 # -------------------------------------------------
 def get_subject_teacher_map():
     """Create a mapping of subjects to teachers"""
-    mapping = {}
-    for s in st.session_state.theory_subjects:
-        if s["confirmed"]:
-            mapping[s["name"]] = s["teacher"]
-    for l in st.session_state.lab_subjects:
-        if l["confirmed"]:
-            mapping[l["name"]] = l["teacher"]
-    return mapping
+    return {s.name: s.teacher for s in st.session_state.subjects.records.values() if s.confirmed}
 
 
 def prepare_summary_data(timetable):
@@ -1148,10 +1052,9 @@ def prepare_summary_data(timetable):
     summary_data = []
     sno = 1
 
-    for s in st.session_state.theory_subjects:
+    for s in st.session_state.subjects.of_kind("theory"):
         if s["confirmed"]:
-            actual_periods = sum(1 for day in DAYS for period in PERIODS
-                                 if timetable.loc[day, period] == s["name"])
+            actual_periods = int((week.cells(timetable) == s["name"]).sum())
             subject_type = "Theory (Pre-defined)" if s.get("is_predefined", False) else "Theory (Custom)"
             summary_data.append({
                 "S.No": sno,
@@ -1165,7 +1068,7 @@ def prepare_summary_data(timetable):
             })
             sno += 1
 
-    for l in st.session_state.lab_subjects:
+    for l in st.session_state.subjects.of_kind("lab"):
         if l["confirmed"]:
             subject_type = "Lab (Pre-defined)" if l.get("is_predefined", False) else "Lab (Custom)"
             summary_data.append({
@@ -1175,8 +1078,8 @@ def prepare_summary_data(timetable):
                 "Teacher": l["teacher"],
                 "Credit": l.get("credit", 2),
                 "Type": f"{subject_type} ({l.get('floor', 'N/A')})",
-                "Periods per Week": 4,
-                "Allocated": 4
+                "Periods per Week": lab_period_count([l]),
+                "Allocated": lab_period_count([l])
             })
             sno += 1
 
@@ -1190,17 +1093,19 @@ with st.sidebar:
     st.markdown("### Configuration")
 
     # Quick Stats
-    if st.session_state.theory_subjects or st.session_state.lab_subjects:
+    if st.session_state.subjects:
         st.markdown("#### Quick Stats")
+        confirmed_theory = [s for s in st.session_state.subjects.of_kind("theory") if s.confirmed]
+        confirmed_lab = [l for l in st.session_state.subjects.of_kind("lab") if l.confirmed]
         col1, col2 = st.columns(2)
         with col1:
-            st.metric("Theory", len([s for s in st.session_state.theory_subjects if s["confirmed"]]))
+            st.metric("Theory", len(confirmed_theory))
         with col2:
-            st.metric("Labs", len([l for l in st.session_state.lab_subjects if l["confirmed"]]))
+            st.metric("Labs", len(confirmed_lab))
 
-        total_periods = sum(s["periods"] for s in st.session_state.theory_subjects if s["confirmed"])
-        total_periods += len([l for l in st.session_state.lab_subjects if l["confirmed"]]) * 4
-        st.metric("Total Periods", f"{total_periods}/40")
+        total_periods = sum(s.periods for s in confirmed_theory)
+        total_periods += lab_period_count(confirmed_lab)
+        st.metric("Total Periods", f"{total_periods}/{week.slot_count}")
 
         # Show teacher assignment summary
         num_teachers_used = len(st.session_state.teacher_assignments)
@@ -1222,7 +1127,7 @@ with st.sidebar:
             timetable_name = f"{dept}_{regulation}_{semester}_Timetable_{section}"
 
             try:
-                display_tt = create_display_timetable(st.session_state.timetable)
+                display_tt = create_display_timetable(st.session_state.timetable, week)
                 st.download_button(
                     "Download CSV",
                     display_tt.to_csv().encode("utf-8"),
@@ -1255,11 +1160,77 @@ with st.sidebar:
 
     st.markdown("---")
 
+    # Week shape: every engine, view and export follows it
+    st.markdown("#### Week Shape")
+    st.caption(f"Current: {week.label}")
+    with st.form("week_shape_form"):
+        week_days = st.number_input("Days per Week", 1, len(WEEKDAYS), len(week.days))
+        week_periods = st.number_input("Periods per Day", 2, 12, len(week.periods))
+        week_forenoon = st.number_input("Forenoon Periods", 1, 11, week.split,
+                                        help="Periods before the break; labs take a whole session")
+        stored = len(st.session_state.saved_timetables) + len(st.session_state.published_versions)
+        discard_stored = st.checkbox(f"Discard {len(st.session_state.saved_timetables)} saved timetable(s) "
+                                     "and published versions") if stored else True
+        apply_week = st.form_submit_button("Apply Week Shape", use_container_width=True)
+
+    if apply_week:
+        try:
+            new_week = Week(int(week_days), int(week_periods), int(week_forenoon))
+        except ValueError as e:
+            st.error(str(e))
+        else:
+            if new_week == week:
+                st.info("The week already has this shape")
+            elif not discard_stored:
+                st.error("Saved timetables keep their week shape; tick the box to discard them first")
+            else:
+                # Everything generated so far has the old shape
+                st.session_state.week = new_week
+                st.session_state.history = HistoryStore(week=new_week)
+                st.session_state.teacher_index = TeacherIndex(new_week)
+                st.session_state.saved_timetables = {}
+                st.session_state.store_version += 1
+                st.session_state.published_versions = []
+                st.session_state.timetable = None
+                st.session_state.unallocated = None
+                st.session_state.timetable_pool = []
+                st.session_state.timetable_generated = False
+                st.session_state.term_plan = None
+                st.session_state.scenario_results = None
+                st.session_state.diagnosis = None
+                st.rerun()
+
+    st.markdown("---")
+
+    # Session memory: what this session holds, and caps on what generation keeps
+    st.markdown("#### Session Memory")
+    if st.checkbox("Show memory footprint", key="show_footprint"):
+        footprint = session_footprint(st.session_state, shared=(catalog, STANDARD_WEEK))
+        st.metric("This Session", format_bytes(footprint["Bytes"].sum()))
+        top = footprint.head(8).assign(Size=lambda df: df["Bytes"].map(format_bytes))
+        st.dataframe(top[["Key", "Size", "Share"]], use_container_width=True, hide_index=True)
+    with st.form("session_limits_form"):
+        new_limits = {
+            key: st.number_input(label, 0, None, st.session_state.session_limits[key], key=f"limit_{key}")
+            for key, label in LIMIT_LABELS.items()
+        }
+        apply_limits = st.form_submit_button("Apply Limits", use_container_width=True)
+
+    if apply_limits:
+        st.session_state.session_limits = {key: int(value) for key, value in new_limits.items()}
+        st.rerun()
+
+    st.markdown("---")
+
     # Reset Options
     st.markdown("#### Reset Options")
     if st.button("Clear All Data", use_container_width=True, type="secondary"):
+        # The checkpoint key survives, so a run saved before clearing can still be resumed
+        checkpoint_key = st.session_state.checkpoint_key
         for key in list(st.session_state.keys()):
             del st.session_state[key]
+        st.session_state.checkpoint_key = checkpoint_key
+        prune_checkpoints(CHECKPOINT_DIR)
         st.rerun()
 
 # -------------------------------------------------
@@ -1271,12 +1242,13 @@ st.markdown('<p class="sub-header">created by **Yogesh** | Intelligent Schedulin
 # -------------------------------------------------
 # MAIN TABS
 # -------------------------------------------------
-tab1, tab2, tab3, tab4, tab5 = st.tabs([
+tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
     "Setup",
     "Subjects",
     "Preferences",
     "Generate",
-    "Analytics"
+    "Analytics",
+    "Faculty"
 ])
 
 # -------------------------------------------------
@@ -1309,7 +1281,7 @@ with tab1:
         )
 
     # Get semester-specific teachers
-    teachers = TEACHERS_BY_DEPT_SEMESTER.get(dept, {}).get(semester, [])
+    teachers = catalog.teachers(dept, semester)
 
     if not teachers:
         st.error(f"No teachers defined for {dept} - Semester {semester}")
@@ -1325,40 +1297,12 @@ with tab1:
             st.session_state.current_semester != semester or
             st.session_state.current_dept != dept):
 
-        st.session_state.theory_subjects = []
-        st.session_state.lab_subjects = []
-        st.session_state.deleted_theory_subjects = []
-        st.session_state.deleted_lab_subjects = []
+        st.session_state.subjects = subjects = SubjectStore()
         st.session_state.teacher_assignments = {}
 
-        # MODIFIED: Load department-specific subjects
-        if regulation in PREDEFINED_SUBJECTS:
-            if dept in PREDEFINED_SUBJECTS[regulation]:
-                if semester in PREDEFINED_SUBJECTS[regulation][dept]:
-                    for sub in PREDEFINED_SUBJECTS[regulation][dept][semester]["theory"]:
-                        st.session_state.theory_subjects.append({
-                            "name": sub["name"],
-                            "code": sub["code"],
-                            "credit": sub["credit"],
-                            "periods": sub["periods"],
-                            "teacher": None,
-                            "confirmed": False,
-                            "is_predefined": True
-                        })
-
-                    for lab in PREDEFINED_SUBJECTS[regulation][dept][semester]["lab"]:
-                        st.session_state.lab_subjects.append({
-                            "name": lab["name"],
-                            "code": lab["code"],
-                            "credit": 2,
-                            "day": None,
-                            "session": None,
-                            "floor": None,
-                            "teacher": None,
-                            "confirmed": False,
-                            "is_predefined": True,
-                            "needs_schedule": True
-                        })
+        # Department-specific subjects, referencing the shared catalog entries
+        for entry in catalog.subjects(regulation, dept, semester):
+            subjects.add_from_catalog(entry, needs_schedule=entry.kind == "lab")
 
         st.session_state.predefined_loaded = True
         st.session_state.current_regulation = regulation
@@ -1392,12 +1336,15 @@ with tab1:
 with tab2:
     subjects_tab1, subjects_tab2 = st.tabs(["Theory Subjects", "Lab Subjects"])
 
+    # Each editor reruns on its own: assigning or deleting a subject does not re-execute the whole page
     # THEORY SUBJECTS
-    with subjects_tab1:
+    @st.fragment
+    def theory_subjects_editor(teachers):
         st.markdown("### Theory Subjects Management")
+        subjects = st.session_state.subjects
 
         # Show pre-defined subjects
-        predefined_theory = [s for s in st.session_state.theory_subjects if s.get("is_predefined", False)]
+        predefined_theory = [s for s in subjects.of_kind("theory") if s.is_predefined]
 
         if predefined_theory:
             st.markdown("#### Pre-defined Theory Subjects")
@@ -1411,8 +1358,6 @@ with tab2:
                         st.metric("Credit", sub["credit"])
 
                     with col2:
-                        actual_index = st.session_state.theory_subjects.index(sub)
-
                         if not sub["confirmed"]:
                             # MODIFIED: Get formatted teacher options with availability status
                             teacher_options = format_teacher_options_with_status(teachers, "theory")
@@ -1420,7 +1365,7 @@ with tab2:
                             teacher_selected = st.selectbox(
                                 "Select Teacher",
                                 teacher_options,
-                                key=f"t_teacher_pre_{actual_index}",
+                                key=f"t_teacher_pre_{sub.id}",
                                 help="Shows availability: ✓ (Available), ⚡ (1 slot left), ✗ (Full)"
                             )
 
@@ -1433,50 +1378,49 @@ with tab2:
                                 if info["count"] > 0:
                                     st.caption(f"📚 Currently teaching: {', '.join(info['subjects'])}")
 
-                            if st.button("Assign Teacher", key=f"t_confirm_pre_{actual_index}",
+                            if st.button("Assign Teacher", key=f"t_confirm_pre_{sub.id}",
                                          use_container_width=True) and teacher != "Select":
                                 sub["teacher"] = teacher
                                 sub["confirmed"] = True
                                 assign_teacher_to_subject(teacher, sub["name"], "theory")
-                                st.rerun()
+                                rerun_editor()
                         else:
                             st.success(f"✅ Assigned to: **{sub['teacher']}**")
                             teacher_info = get_teacher_assignment_info(sub['teacher'])
                             st.caption(f"Teacher load: {teacher_info['count']}/2 subjects")
 
-                            if st.button("Change Teacher", key=f"t_cancel_pre_{actual_index}",
+                            if st.button("Change Teacher", key=f"t_cancel_pre_{sub.id}",
                                          use_container_width=True):
                                 unassign_teacher_from_subject(sub["teacher"], sub["name"], "theory")
                                 sub["teacher"] = None
                                 sub["confirmed"] = False
-                                st.rerun()
+                                rerun_editor()
 
                     with col3:
-                        if st.button("Delete", key=f"t_delete_pre_{actual_index}",
+                        if st.button("Delete", key=f"t_delete_pre_{sub.id}",
                                      use_container_width=True, type="secondary"):
-                            deleted_sub = sub.copy()
-                            st.session_state.deleted_theory_subjects.append(deleted_sub)
                             if sub["confirmed"]:
                                 unassign_teacher_from_subject(sub["teacher"], sub["name"], "theory")
-                            st.session_state.theory_subjects.remove(sub)
-                            st.rerun()
+                            subjects.remove(sub.id, keep=True)
+                            rerun_editor()
 
         # Restore deleted subjects
-        if st.session_state.deleted_theory_subjects:
+        deleted_theory = [s for s in subjects.deleted.values() if s.kind == "theory"]
+        if deleted_theory:
             with st.expander("Restore Deleted Subjects", expanded=False):
-                for i, deleted_sub in enumerate(st.session_state.deleted_theory_subjects):
+                for deleted_sub in deleted_theory:
                     col1, col2 = st.columns([4, 1])
                     with col1:
                         st.write(
                             f"**{deleted_sub['name']}** ({deleted_sub['code']}) - {deleted_sub['periods']} periods")
                     with col2:
-                        if st.button("Restore", key=f"restore_theory_{i}", use_container_width=True):
-                            restored_sub = deleted_sub.copy()
-                            restored_sub["teacher"] = None
-                            restored_sub["confirmed"] = False
-                            st.session_state.theory_subjects.append(restored_sub)
-                            st.session_state.deleted_theory_subjects.pop(i)
-                            st.rerun()
+                        if st.button("Restore", key=f"restore_theory_{deleted_sub.id}", use_container_width=True):
+                            try:
+                                subjects.restore(deleted_sub.id, teacher=None, confirmed=False)
+                            except ValueError as e:
+                                st.error(str(e))
+                            else:
+                                rerun_editor()
 
         st.markdown("---")
 
@@ -1496,23 +1440,15 @@ with tab2:
         if add_theory:
             if not t_name or not t_code:
                 st.error("Please fill all required fields")
-            elif any(s["name"] == t_name or s["code"] == t_code for s in st.session_state.theory_subjects):
+            elif subjects.duplicate("theory", t_name, t_code):
                 st.error("Subject already exists")
             else:
-                st.session_state.theory_subjects.append({
-                    "name": t_name,
-                    "code": t_code,
-                    "credit": t_credit,
-                    "periods": t_periods,
-                    "teacher": None,
-                    "confirmed": False,
-                    "is_predefined": False
-                })
+                subjects.add("theory", t_name, t_code, credit=t_credit, periods=t_periods)
                 st.success(f"Added: {t_name}")
-                st.rerun()
+                rerun_editor()
 
         # Show custom subjects
-        custom_theory = [s for s in st.session_state.theory_subjects if not s.get("is_predefined", False)]
+        custom_theory = [s for s in subjects.of_kind("theory") if not s.is_predefined]
         if custom_theory:
             st.markdown("#### Custom Theory Subjects")
             for i, sub in enumerate(custom_theory):
@@ -1524,8 +1460,6 @@ with tab2:
                         st.metric("Credit", sub["credit"])
 
                     with col2:
-                        actual_index = st.session_state.theory_subjects.index(sub)
-
                         if not sub["confirmed"]:
                             # MODIFIED: Get formatted teacher options with availability status
                             teacher_options = format_teacher_options_with_status(teachers, "theory")
@@ -1533,7 +1467,7 @@ with tab2:
                             teacher_selected = st.selectbox(
                                 "Select Teacher",
                                 teacher_options,
-                                key=f"t_teacher_custom_{actual_index}",
+                                key=f"t_teacher_custom_{sub.id}",
                                 help="Shows availability: ✓ (Available), ⚡ (1 slot left), ✗ (Full)"
                             )
 
@@ -1544,82 +1478,71 @@ with tab2:
                                 if info["count"] > 0:
                                     st.caption(f"📚 Currently teaching: {', '.join(info['subjects'])}")
 
-                            if st.button("Assign Teacher", key=f"t_confirm_custom_{actual_index}",
+                            if st.button("Assign Teacher", key=f"t_confirm_custom_{sub.id}",
                                          use_container_width=True) and teacher != "Select":
                                 sub["teacher"] = teacher
                                 sub["confirmed"] = True
                                 assign_teacher_to_subject(teacher, sub["name"], "theory")
-                                st.rerun()
+                                rerun_editor()
                         else:
                             st.success(f"✅ Assigned to: **{sub['teacher']}**")
                             teacher_info = get_teacher_assignment_info(sub['teacher'])
                             st.caption(f"Teacher load: {teacher_info['count']}/2 subjects")
 
-                            if st.button("Change Teacher", key=f"t_cancel_custom_{actual_index}",
+                            if st.button("Change Teacher", key=f"t_cancel_custom_{sub.id}",
                                          use_container_width=True):
                                 unassign_teacher_from_subject(sub["teacher"], sub["name"], "theory")
                                 sub["teacher"] = None
                                 sub["confirmed"] = False
-                                st.rerun()
+                                rerun_editor()
 
                     with col3:
-                        if st.button("Delete", key=f"t_delete_custom_{actual_index}",
+                        if st.button("Delete", key=f"t_delete_custom_{sub.id}",
                                      use_container_width=True, type="secondary"):
                             if sub["confirmed"]:
                                 unassign_teacher_from_subject(sub["teacher"], sub["name"], "theory")
-                            st.session_state.theory_subjects.remove(sub)
-                            st.rerun()
+                            subjects.remove(sub.id)
+                            rerun_editor()
 
     # LAB SUBJECTS
-    with subjects_tab2:
+    @st.fragment
+    def lab_subjects_editor(teachers):
         st.markdown("### Lab Subjects Management")
+        subjects = st.session_state.subjects
 
         # Labs needing schedule
-        predefined_labs_needing_schedule = [l for l in st.session_state.lab_subjects
-                                            if l.get("is_predefined", False) and l.get("needs_schedule", False)]
+        predefined_labs_needing_schedule = [l for l in subjects.of_kind("lab") if l.is_predefined and l.needs_schedule]
 
         if predefined_labs_needing_schedule:
             st.markdown("#### Schedule Pre-defined Labs")
             st.info("Set day and session for each lab")
 
-            for i, lab in enumerate(predefined_labs_needing_schedule):
-                actual_index = st.session_state.lab_subjects.index(lab)
-
+            for lab in predefined_labs_needing_schedule:
                 with st.expander(f"{lab['name']} ({lab['code']})", expanded=True):
-                    with st.form(f"predefined_lab_schedule_{actual_index}"):
+                    with st.form(f"predefined_lab_schedule_{lab.id}"):
                         col1, col2, col3, col4 = st.columns(4)
                         with col1:
-                            l_day = st.selectbox("Day", DAYS, key=f"pre_lab_day_{actual_index}")
+                            l_day = st.selectbox("Day", week.days, key=f"pre_lab_day_{lab.id}")
                         with col2:
                             l_session = st.radio("Session", ["FN", "AN"], horizontal=True,
-                                                 key=f"pre_lab_session_{actual_index}")
+                                                 key=f"pre_lab_session_{lab.id}")
                         with col3:
                             l_floor = st.selectbox("Lab Floor", LAB_FLOORS,
-                                                   key=f"pre_lab_floor_{actual_index}")
+                                                   key=f"pre_lab_floor_{lab.id}")
                         with col4:
                             schedule_lab = st.form_submit_button("Set Schedule", use_container_width=True)
 
                         if schedule_lab:
-                            conflict = False
-                            for existing_lab in st.session_state.lab_subjects:
-                                if (existing_lab != lab and
-                                        existing_lab.get("day") == l_day and
-                                        existing_lab.get("session") == l_session):
-                                    st.error(f"Conflict with {existing_lab['name']} on {l_day} {l_session}")
-                                    conflict = True
-                                    break
-
-                            if not conflict:
-                                lab["day"] = l_day
-                                lab["session"] = l_session
-                                lab["floor"] = l_floor
-                                lab["needs_schedule"] = False
+                            try:
+                                subjects.schedule_lab(lab.id, l_day, l_session, floor=l_floor, needs_schedule=False)
+                            except ValueError as e:
+                                st.error(str(e))
+                            else:
                                 st.success("Schedule set!")
-                                st.rerun()
+                                rerun_editor()
 
         # Scheduled labs
-        scheduled_predefined_labs = [l for l in st.session_state.lab_subjects
-                                     if l.get("is_predefined", False) and not l.get("needs_schedule", False)]
+        scheduled_predefined_labs = [l for l in subjects.of_kind("lab") if l.is_predefined and not l.needs_schedule]
 
         if scheduled_predefined_labs:
             st.markdown("#### Pre-defined Labs (Scheduled)")
@@ -1634,9 +1557,7 @@ with tab2:
 
             st.markdown("---")
 
-            for i, lab in enumerate(scheduled_predefined_labs):
-                actual_index = st.session_state.lab_subjects.index(lab)
-
+            for lab in scheduled_predefined_labs:
                 with st.expander(f"{lab['name']} - {lab['day']} {lab['session']}",
                                  expanded=not lab["confirmed"]):
                     col1, col2, col3 = st.columns([2, 2, 1])
@@ -1653,7 +1574,7 @@ with tab2:
                             teacher_selected = st.selectbox(
                                 "Select Teacher",
                                 teacher_options,
-                                key=f"l_teacher_pre_{actual_index}",
+                                key=f"l_teacher_pre_{lab.id}",
                                 help="Shows availability: ✓ (Available), ⚡ (1 slot left), ✗ (Full)"
                             )
 
@@ -1666,17 +1587,17 @@ with tab2:
 
                             col2a, col2b = st.columns(2)
                             with col2a:
-                                if st.button("Assign", key=f"l_confirm_pre_{actual_index}",
+                                if st.button("Assign", key=f"l_confirm_pre_{lab.id}",
                                              use_container_width=True) and teacher != "Select":
                                     lab["teacher"] = teacher
                                     lab["confirmed"] = True
                                     assign_teacher_to_subject(teacher, lab["name"], "lab")
-                                    st.rerun()
+                                    rerun_editor()
                             with col2b:
-                                if st.button("Reschedule", key=f"l_reschedule_{actual_index}",
+                                if st.button("Reschedule", key=f"l_reschedule_{lab.id}",
                                              use_container_width=True):
                                     lab["needs_schedule"] = True
-                                    st.rerun()
+                                    rerun_editor()
                         else:
                             st.success(f"✅ Assigned to: **{lab['teacher']}**")
                             teacher_info = get_teacher_assignment_info(lab['teacher'])
@@ -1684,51 +1605,49 @@ with tab2:
 
                             col2a, col2b = st.columns(2)
                             with col2a:
-                                if st.button("Change", key=f"l_cancel_pre_{actual_index}",
+                                if st.button("Change", key=f"l_cancel_pre_{lab.id}",
                                              use_container_width=True):
                                     unassign_teacher_from_subject(lab["teacher"], lab["name"], "lab")
                                     lab["teacher"] = None
                                     lab["confirmed"] = False
-                                    st.rerun()
+                                    rerun_editor()
                             with col2b:
-                                if st.button("Reschedule", key=f"l_reschedule2_{actual_index}",
+                                if st.button("Reschedule", key=f"l_reschedule2_{lab.id}",
                                              use_container_width=True):
                                     lab["needs_schedule"] = True
                                     if lab["confirmed"]:
                                         unassign_teacher_from_subject(lab["teacher"], lab["name"], "lab")
                                         lab["teacher"] = None
                                         lab["confirmed"] = False
-                                    st.rerun()
+                                    rerun_editor()
 
                     with col3:
-                        if st.button("Delete", key=f"l_delete_scheduled_{actual_index}",
+                        if st.button("Delete", key=f"l_delete_scheduled_{lab.id}",
                                      use_container_width=True, type="secondary"):
-                            deleted_lab = lab.copy()
-                            st.session_state.deleted_lab_subjects.append(deleted_lab)
                             if lab["confirmed"]:
                                 unassign_teacher_from_subject(lab["teacher"], lab["name"], "lab")
-                            st.session_state.lab_subjects.remove(lab)
-                            st.rerun()
+                            subjects.remove(lab.id, keep=True)
+                            rerun_editor()
 
         # Restore deleted labs
-        if st.session_state.deleted_lab_subjects:
+        deleted_labs = [l for l in subjects.deleted.values() if l.kind == "lab"]
+        if deleted_labs:
             with st.expander("Restore Deleted Labs", expanded=False):
-                for i, deleted_lab in enumerate(st.session_state.deleted_lab_subjects):
+                for deleted_lab in deleted_labs:
                     col1, col2 = st.columns([4, 1])
                     with col1:
                         schedule_info = f" - {deleted_lab.get('day', 'Not scheduled')} {deleted_lab.get('session', '')}" if deleted_lab.get(
                             'day') else " - Not scheduled"
                         st.write(f"**{deleted_lab['name']}** ({deleted_lab['code']}){schedule_info}")
                     with col2:
-                        if st.button("Restore", key=f"restore_lab_{i}", use_container_width=True):
-                            restored_lab = deleted_lab.copy()
-                            restored_lab["teacher"] = None
-                            restored_lab["confirmed"] = False
-                            if not restored_lab.get("day"):
-                                restored_lab["needs_schedule"] = True
-                            st.session_state.lab_subjects.append(restored_lab)
-                            st.session_state.deleted_lab_subjects.pop(i)
-                            st.rerun()
+                        if st.button("Restore", key=f"restore_lab_{deleted_lab.id}", use_container_width=True):
+                            try:
+                                subjects.restore(deleted_lab.id, teacher=None, confirmed=False,
+                                                 needs_schedule=deleted_lab.needs_schedule or not deleted_lab.day)
+                            except ValueError as e:
+                                st.error(str(e))
+                            else:
+                                rerun_editor()
 
         st.markdown("---")
 
@@ -1739,7 +1658,7 @@ with tab2:
             with col1:
                 l_name = st.text_input("Lab Name")
                 l_credit = st.number_input("Lab Credit", 1, 3, 2)
-                l_day = st.selectbox("Day", DAYS)
+                l_day = st.selectbox("Day", week.days)
             with col2:
                 l_code = st.text_input("Lab Code")
                 l_session = st.radio("Session", ["FN", "AN"], horizontal=True)
@@ -1750,41 +1669,21 @@ with tab2:
         if add_lab:
             if not l_name or not l_code:
                 st.error("Please fill all required fields")
-            elif any(l["name"] == l_name or l["code"] == l_code for l in st.session_state.lab_subjects):
+            elif subjects.duplicate("lab", l_name, l_code):
                 st.error("Lab already exists")
+            elif subjects.lab_at(l_day, l_session):
+                st.error(f"Conflict with {subjects.lab_at(l_day, l_session).name} on {l_day} {l_session}")
             else:
-                conflict = False
-                for existing_lab in st.session_state.lab_subjects:
-                    if existing_lab.get("day") == l_day and existing_lab.get("session") == l_session:
-                        st.error(f"Conflict with {existing_lab['name']} on {l_day} {l_session}")
-                        conflict = True
-                        break
-
-                if not conflict:
-                    st.session_state.lab_subjects.append({
-                        "name": l_name,
-                        "code": l_code,
-                        "credit": l_credit,
-                        "day": l_day,
-                        "session": l_session,
-                        "floor": l_floor,
-                        "teacher": None,
-                        "confirmed": False,
-                        "is_predefined": False,
-                        "needs_schedule": False
-                    })
-                    st.success(f"Added: {l_name}")
-                    st.rerun()
+                subjects.add("lab", l_name, l_code, credit=l_credit, day=l_day, session=l_session, floor=l_floor)
+                st.success(f"Added: {l_name}")
+                rerun_editor()
 
         # Show custom labs
-        custom_labs = [l for l in st.session_state.lab_subjects
-                       if not l.get("is_predefined", False) and not l.get("needs_schedule", False)]
+        custom_labs = [l for l in subjects.of_kind("lab") if not l.is_predefined and not l.needs_schedule]
 
         if custom_labs:
             st.markdown("#### Custom Lab Subjects")
-            for i, lab in enumerate(custom_labs):
-                actual_index = st.session_state.lab_subjects.index(lab)
-
+            for lab in custom_labs:
                 with st.expander(f"{lab['name']} - {lab['day']} {lab['session']}",
                                  expanded=not lab["confirmed"]):
                     col1, col2, col3 = st.columns([2, 2, 1])
@@ -1801,7 +1700,7 @@ with tab2:
                             teacher_selected = st.selectbox(
                                 "Select Teacher",
                                 teacher_options,
-                                key=f"l_teacher_custom_{actual_index}",
+                                key=f"l_teacher_custom_{lab.id}",
                                 help="Shows availability: ✓ (Available), ⚡ (1 slot left), ✗ (Full)"
                             )
 
@@ -1812,31 +1711,36 @@ with tab2:
                                 if info["count"] > 0:
                                     st.caption(f"📚 Currently teaching: {', '.join(info['subjects'])}")
 
-                            if st.button("Assign Teacher", key=f"l_confirm_custom_{actual_index}",
+                            if st.button("Assign Teacher", key=f"l_confirm_custom_{lab.id}",
                                          use_container_width=True) and teacher != "Select":
                                 lab["teacher"] = teacher
                                 lab["confirmed"] = True
                                 assign_teacher_to_subject(teacher, lab["name"], "lab")
-                                st.rerun()
+                                rerun_editor()
                         else:
                             st.success(f"✅ Assigned to: **{lab['teacher']}**")
                             teacher_info = get_teacher_assignment_info(lab['teacher'])
                             st.caption(f"Teacher load: {teacher_info['count']}/2 subjects")
 
-                            if st.button("Change Teacher", key=f"l_cancel_custom_{actual_index}",
+                            if st.button("Change Teacher", key=f"l_cancel_custom_{lab.id}",
                                          use_container_width=True):
                                 unassign_teacher_from_subject(lab["teacher"], lab["name"], "lab")
                                 lab["teacher"] = None
                                 lab["confirmed"] = False
-                                st.rerun()
+                                rerun_editor()
 
                     with col3:
-                        if st.button("Delete", key=f"l_delete_custom_{actual_index}",
+                        if st.button("Delete", key=f"l_delete_custom_{lab.id}",
                                      use_container_width=True, type="secondary"):
                             if lab["confirmed"]:
                                 unassign_teacher_from_subject(lab["teacher"], lab["name"], "lab")
-                            st.session_state.lab_subjects.remove(lab)
-                            st.rerun()
+                            subjects.remove(lab.id)
+                            rerun_editor()
+
+    with subjects_tab1:
+        theory_subjects_editor(teachers)
+    with subjects_tab2:
+        lab_subjects_editor(teachers)
 
 # -------------------------------------------------
 # TAB 3: PREFERENCES
@@ -1851,147 +1755,215 @@ with tab3:
     if not assigned_teachers:
         st.warning("No teachers assigned yet. Please assign teachers to subjects first.")
     else:
-        # Select teacher
-        selected_teacher = st.selectbox(
-            "Select Teacher",
-            ["Select a teacher"] + sorted(assigned_teachers),
-            key="pref_teacher_select"
-        )
-
-        if selected_teacher != "Select a teacher":
-            # Show teacher's current assignments
-            teacher_info = get_teacher_assignment_info(selected_teacher)
-            st.info(f"**{selected_teacher}** is currently assigned to: {', '.join(teacher_info['subjects'])}")
-
-            # Initialize teacher preferences if not exists
-            if selected_teacher not in st.session_state.teacher_preferences:
-                st.session_state.teacher_preferences[selected_teacher] = []
+        # Picking a teacher and editing their free periods rerun only this editor, not the whole page
+        @st.fragment
+        def teacher_preferences_editor(assigned_teachers):
+            # Select teacher
+            selected_teacher = st.selectbox(
+                "Select Teacher",
+                ["Select a teacher"] + sorted(assigned_teachers),
+                key="pref_teacher_select"
+            )
 
-            # Show current free periods
-            current_free = st.session_state.teacher_preferences[selected_teacher]
+            if selected_teacher != "Select a teacher":
+                # Show teacher's current assignments
+                teacher_info = get_teacher_assignment_info(selected_teacher)
+                st.info(f"**{selected_teacher}** is currently assigned to: {', '.join(teacher_info['subjects'])}")
 
-            if current_free:
-                st.markdown("**Current Free Periods:**")
-                free_df = pd.DataFrame([
-                    {"Day": day, "Period": period}
-                    for day, period in current_free
-                ])
-                st.dataframe(free_df, use_container_width=True, hide_index=True)
-
-                if st.button("Clear All Free Periods", key="clear_all_free"):
+                # Initialize teacher preferences if not exists
+                if selected_teacher not in st.session_state.teacher_preferences:
                     st.session_state.teacher_preferences[selected_teacher] = []
-                    st.success("Cleared all free periods")
-                    if st.session_state.timetable_generated:
-                        st.session_state.timetable_generated = False
-                        st.info("Teacher preferences changed. Please regenerate the timetable.")
-                    st.rerun()
-            else:
-                st.markdown("**Current Free Periods:**")
-                st.info("No free periods set for this teacher yet.")
-
-            st.markdown("---")
 
-            # Visual grid to select multiple periods
-            st.markdown("**Quick Selection Grid:**")
-            st.caption("Click on cells to toggle free periods")
-
-            for day in DAYS:
-                st.markdown(f"**{day}:**")
-                cols = st.columns(8)
-
-                for i, period in enumerate(PERIODS):
-                    with cols[i]:
-                        is_free = (day, period) in current_free
-                        button_label = "✓" if is_free else period
-                        button_type = "secondary" if is_free else "primary"
-
-                        if st.button(
-                                button_label,
-                                key=f"grid_{selected_teacher}_{day}_{period}",
-                                use_container_width=True,
-                                type=button_type
-                        ):
-                            if is_free:
-                                st.session_state.teacher_preferences[selected_teacher].remove((day, period))
+                # Show current free periods
+                current_free = st.session_state.teacher_preferences[selected_teacher]
+
+                if current_free:
+                    st.markdown("**Current Free Periods:**")
+                    free_df = pd.DataFrame([
+                        {"Day": day, "Period": period}
+                        for day, period in current_free
+                    ])
+                    st.dataframe(free_df, use_container_width=True, hide_index=True)
+
+                    if st.button("Clear All Free Periods", key="clear_all_free"):
+                        st.session_state.teacher_preferences[selected_teacher] = []
+                        st.success("Cleared all free periods")
+                        preferences_changed()
+                else:
+                    st.markdown("**Current Free Periods:**")
+                    st.info("No free periods set for this teacher yet.")
+
+                st.markdown("---")
+
+                # Visual grid to select multiple periods; toggles are kept in the browser until saved
+                st.markdown("**Quick Selection Grid:**")
+                st.caption("Tick the free periods, then save them all at once")
+
+                grid = pd.DataFrame(
+                    week.mask(current_free).reshape(week.shape), index=week.days, columns=week.periods)
+                with st.form(f"free_grid_form_{selected_teacher}"):
+                    edited_grid = st.data_editor(
+                        grid,
+                        # Keyed on the saved periods so the grid resets whenever they change elsewhere
+                        key=f"free_grid_{selected_teacher}_{hash(tuple(map(tuple, current_free)))}",
+                        use_container_width=True,
+                    )
+                    save_grid = st.form_submit_button("Save Free Periods", use_container_width=True)
+
+                if save_grid and not edited_grid.equals(grid):
+                    ticked = {(day, period) for day in week.days for period in week.periods
+                              if edited_grid.loc[day, period]}
+                    # Periods outside the week (from an earlier week shape) are left alone
+                    kept = [tuple(slot) for slot in current_free
+                            if tuple(slot) in ticked or tuple(slot) not in week.slot_of]
+                    st.session_state.teacher_preferences[selected_teacher] = kept + [
+                        slot for slot in week.slots if slot in ticked and slot not in kept]
+                    preferences_changed()
+
+                st.markdown("---")
+
+                # Setting free periods section
+                st.markdown(f"#### Setting free periods for: **{selected_teacher}**")
+                st.markdown("**Add Free Period:**")
+
+                col1, col2, col3 = st.columns([2, 2, 1])
+
+                if 'prev_free_day' not in st.session_state:
+                    st.session_state.prev_free_day = week.days[0]
+
+                with col1:
+                    free_day = st.selectbox("Day", week.days, key="free_day_select")
+
+                with col2:
+                    free_periods = st.multiselect("Periods", week.periods, key=f"free_periods_select_{free_day}")
+
+                with col3:
+                    st.markdown("")
+                    st.markdown("")
+                    if st.button("Add", key="add_free_period", use_container_width=True):
+                        if free_periods:
+                            added_count = 0
+                            for period in free_periods:
+                                if (free_day, period) not in current_free:
+                                    st.session_state.teacher_preferences[selected_teacher].append((free_day, period))
+                                    added_count += 1
+
+                            if added_count > 0:
+                                st.success(f"Added {added_count} free period(s) for {free_day}")
+                                preferences_changed()
                             else:
-                                st.session_state.teacher_preferences[selected_teacher].append((day, period))
+                                st.warning("All selected periods already exist")
+                        else:
+                            st.warning("Please select at least one period")
 
-                            if st.session_state.timetable_generated:
-                                st.session_state.timetable_generated = False
-                                st.info("Teacher preferences changed. Please regenerate the timetable.")
-                            st.rerun()
+                st.session_state.prev_free_day = free_day
 
-                st.markdown("")
+                st.markdown("---")
 
-            st.markdown("---")
+                # Summary statistics
+                st.markdown("**Summary:**")
+                col1, col2, col3 = st.columns(3)
 
-            # Setting free periods section
-            st.markdown(f"#### Setting free periods for: **{selected_teacher}**")
-            st.markdown("**Add Free Period:**")
+                # Free periods from an earlier week shape do not count
+                free_in_week = int(week.mask(current_free).sum())
+                with col1:
+                    st.metric("Free Periods Set", free_in_week)
 
-            col1, col2, col3 = st.columns([2, 2, 1])
+                with col2:
+                    total_periods = week.slot_count
+                    available_periods = total_periods - free_in_week
+                    st.metric("Available Periods", available_periods)
 
-            if 'prev_free_day' not in st.session_state:
-                st.session_state.prev_free_day = DAYS[0]
+                with col3:
+                    utilization = (available_periods / total_periods) * 100
+                    st.metric("Availability", f"{utilization:.0f}%")
 
-            with col1:
-                free_day = st.selectbox("Day", DAYS, key="free_day_select")
+            st.markdown("---")
 
-            with col2:
-                free_periods = st.multiselect("Periods", PERIODS, key=f"free_periods_select_{free_day}")
+            # Summary of all teacher preferences
+            if st.session_state.teacher_preferences:
+                with st.expander("All Teacher Preferences Summary", expanded=False):
+                    for teacher, free_periods in st.session_state.teacher_preferences.items():
+                        if free_periods:
+                            st.markdown(f"**{teacher}**: {len(free_periods)} free period(s)")
+                            periods_str = ", ".join([f"{day} {period}" for day, period in free_periods])
+                            st.caption(periods_str)
 
-            with col3:
-                st.markdown("")
-                st.markdown("")
-                if st.button("Add", key="add_free_period", use_container_width=True):
-                    if free_periods:
-                        added_count = 0
-                        for period in free_periods:
-                            if (free_day, period) not in current_free:
-                                st.session_state.teacher_preferences[selected_teacher].append((free_day, period))
-                                added_count += 1
-
-                        if added_count > 0:
-                            st.success(f"Added {added_count} free period(s) for {free_day}")
-                            if st.session_state.timetable_generated:
-                                st.session_state.timetable_generated = False
-                                st.info("Teacher preferences changed. Please regenerate the timetable.")
-                            st.rerun()
-                        else:
-                            st.warning("All selected periods already exist")
-                    else:
-                        st.warning("Please select at least one period")
+        teacher_preferences_editor(assigned_teachers)
+
+    st.markdown("---")
 
-            st.session_state.prev_free_day = free_day
+    # Local scheduling rules, compiled into penalty tables at generation time
+    st.markdown("### Scheduling Rules")
+    st.info("Declare local rules once. Hard rules are never broken; soft rules lower the quality score.")
 
-            st.markdown("---")
+    rule_subjects = [s.name for s in st.session_state.subjects.confirmed("theory")]
+    rule_teachers = sorted(st.session_state.teacher_assignments.keys())
 
-            # Summary statistics
-            st.markdown("**Summary:**")
-            col1, col2, col3 = st.columns(3)
+    if not rule_subjects:
+        st.warning("Confirm theory subjects before adding scheduling rules.")
+    else:
+        rule_labels = {
+            "avoid_periods": "Avoid subject in periods",
+            "spread_across_days": "Spread subject across days",
+            "avoid_adjacent": "Avoid two subjects back-to-back",
+            "max_consecutive": "Limit teacher's consecutive periods",
+        }
+        rule_type = st.selectbox("Rule Type", list(rule_labels.keys()),
+                                 format_func=lambda t: rule_labels[t], key="rule_type_select")
 
+        with st.form("rule_form", clear_on_submit=True):
+            col1, col2 = st.columns(2)
+            rule = {"type": rule_type}
             with col1:
-                st.metric("Free Periods Set", len(current_free))
-
+                if rule_type == "avoid_periods":
+                    rule["subject"] = st.selectbox("Subject", rule_subjects)
+                    rule["periods"] = st.multiselect("Periods", week.periods, default=[week.periods[-1]])
+                elif rule_type == "spread_across_days":
+                    rule["subject"] = st.selectbox("Subject", rule_subjects)
+                    rule["max_per_day"] = st.number_input("Max Periods per Day", 1, 2, 1)
+                elif rule_type == "avoid_adjacent":
+                    rule["subject_a"] = st.selectbox("First Subject", rule_subjects)
+                    rule["subject_b"] = st.selectbox("Second Subject", rule_subjects)
+                else:
+                    rule["teacher"] = st.selectbox("Teacher", rule_teachers or ["No teachers assigned"])
+                    rule["limit"] = st.number_input("Max Consecutive Periods", 1, max(week.split, len(week.periods_an)), 2)
             with col2:
-                total_periods = 40
-                available_periods = total_periods - len(current_free)
-                st.metric("Available Periods", available_periods)
+                rule["kind"] = st.radio("Kind", [SOFT, HARD], horizontal=True)
+                rule["weight"] = st.number_input("Penalty Weight", 1, 30, 5)
 
-            with col3:
-                utilization = ((total_periods - len(current_free)) / total_periods) * 100
-                st.metric("Availability", f"{utilization:.0f}%")
+            add_rule = st.form_submit_button("Add Rule", use_container_width=True)
 
-    st.markdown("---")
+        if add_rule and rule_type == "max_consecutive" and not rule_teachers:
+            st.error("Assign teachers to subjects before limiting their consecutive periods")
+        elif add_rule:
+            # Numbered by a counter that never goes down, so removing a rule never frees a name
+            rule["name"] = f"{rule_labels[rule_type]} #{st.session_state.rule_count + 1}"
+            try:
+                ConstraintRegistry.from_config(st.session_state.scheduling_rules + [rule])
+            except ValueError as e:
+                st.error(str(e))
+            else:
+                st.session_state.rule_count += 1
+                st.session_state.scheduling_rules.append(rule)
+                if st.session_state.timetable_generated:
+                    st.session_state.timetable_generated = False
+                    st.info("Scheduling rules changed. Please regenerate the timetable.")
+                st.rerun()
 
-    # Summary of all teacher preferences
-    if st.session_state.teacher_preferences:
-        with st.expander("All Teacher Preferences Summary", expanded=False):
-            for teacher, free_periods in st.session_state.teacher_preferences.items():
-                if free_periods:
-                    st.markdown(f"**{teacher}**: {len(free_periods)} free period(s)")
-                    periods_str = ", ".join([f"{day} {period}" for day, period in free_periods])
-                    st.caption(periods_str)
+    if st.session_state.scheduling_rules:
+        for i, rule in enumerate(st.session_state.scheduling_rules):
+            col1, col2 = st.columns([4, 1])
+            with col1:
+                details = ", ".join(f"{k}: {v}" for k, v in rule.items() if k not in ("type", "name"))
+                st.write(f"**{rule['name']}** ({rule['kind']}) - {details}")
+            with col2:
+                if st.button("Remove", key=f"remove_rule_{i}", use_container_width=True):
+                    st.session_state.scheduling_rules.pop(i)
+                    if st.session_state.timetable_generated:
+                        st.session_state.timetable_generated = False
+                        st.info("Scheduling rules changed. Please regenerate the timetable.")
+                    st.rerun()
 
 # -------------------------------------------------
 # TAB 4: GENERATE TIMETABLE (Remains unchanged)
@@ -1999,9 +1971,9 @@ with tab3:
 with tab4:
     st.markdown("### Generate Timetable")
 
-    unscheduled_labs = [l for l in st.session_state.lab_subjects if l.get("needs_schedule", False)]
-    confirmed_theory = [s for s in st.session_state.theory_subjects if s["confirmed"]]
-    confirmed_lab = [l for l in st.session_state.lab_subjects if l["confirmed"] and not l.get("needs_schedule", False)]
+    unscheduled_labs = [l for l in st.session_state.subjects.of_kind("lab") if l.needs_schedule]
+    confirmed_theory = st.session_state.subjects.confirmed("theory")
+    confirmed_lab = st.session_state.subjects.confirmed("lab")
 
     if unscheduled_labs:
         st.warning(f"Please schedule {len(unscheduled_labs)} lab(s) before generating timetable")
@@ -2019,12 +1991,18 @@ with tab4:
         theory_periods = sum(s["periods"] for s in confirmed_theory)
         st.metric("Theory Periods", theory_periods)
     with col4:
-        lab_periods = len(confirmed_lab) * 4
+        lab_periods = lab_period_count(confirmed_lab)
         st.metric("Lab Periods", lab_periods)
 
+    # Labs scheduled before the week shape changed may fall outside it
+    labs_outside_week = [l for l in confirmed_lab if l["day"] not in week.days]
+    if labs_outside_week:
+        st.error("These labs are on days outside the week (" + week.label + "): "
+                 + ", ".join(f"{l['name']} ({l['day']})" for l in labs_outside_week))
+
     # Capacity check
     total_periods_needed = theory_periods + lab_periods
-    available_slots = 40
+    available_slots = week.slot_count
 
     if total_periods_needed > available_slots:
         st.error(f"**Over-capacity**: Need {total_periods_needed} periods but only {available_slots} available!")
@@ -2039,12 +2017,77 @@ with tab4:
     st.markdown("---")
 
     # Generation options
+    engine_options = ["Greedy restarts", "Genetic (island model)", "Portfolio (race engines)"]
+    if exact_available():
+        engine_options.append("Exact (CP-SAT)")
+    engine = st.radio(
+        "Engine",
+        engine_options,
+        horizontal=True,
+        key="engine_select",
+        help="Greedy restarts suit light loads; the genetic engine keeps improving on near-capacity loads "
+             "and uses all CPU cores; the portfolio races several engines and keeps the first good result; "
+             "the exact engine proves how good the best timetable can be"
+    )
+
     col1, col2 = st.columns([3, 1])
     with col1:
-        max_iterations = st.slider("Optimization Iterations", 10, 200, 50,
-                                   help="More iterations = better timetable but slower generation")
+        if engine == "Greedy restarts":
+            max_iterations = st.slider("Optimization Iterations", 10, 200, 50,
+                                       help="More iterations = better timetable but slower generation")
+        elif engine == "Genetic (island model)":
+            max_iterations = st.slider("Generations", 20, 1000, 200, step=20,
+                                       help="More generations = better timetable but slower generation")
+        elif engine == "Exact (CP-SAT)":
+            max_iterations = st.slider("Time Limit (seconds)", 5, 120, 30, step=5,
+                                       help="The solver stops earlier once the timetable is proven optimal")
+        else:
+            max_iterations = st.slider("Time Limit (seconds)", 5, 120, 30, step=5,
+                                       help="Shared deadline for all engines in the portfolio")
+            target_score = st.slider("Target Score", 80, 100, 100,
+                                     help="The race stops as soon as any engine reaches this score")
     with col2:
-        st.metric("Expected Time", f"~{max_iterations // 20}s")
+        if engine == "Greedy restarts":
+            st.metric("Expected Time", f"~{max_iterations // 20}s")
+        elif engine == "Genetic (island model)":
+            st.metric("Islands", os.cpu_count() or 1)
+        elif engine == "Exact (CP-SAT)":
+            st.metric("Workers", os.cpu_count() or 1)
+        else:
+            st.metric("Engines", len(DEFAULT_PORTFOLIO))
+
+    # Long greedy and genetic runs can save progress to disk and resume after a restart
+    checkpoint = None
+    if engine in ("Greedy restarts", "Genetic (island model)"):
+        engine_key = "greedy" if engine == "Greedy restarts" else "genetic"
+        checkpoint_key = file_stem(st.text_input(
+            "Checkpoint Key", st.session_state.checkpoint_key, key="checkpoint_key_input",
+            help="Runs are saved under this key. Note it down and enter it in a new session "
+                 "to resume a run interrupted in this one")) or st.session_state.checkpoint_key
+        st.session_state.checkpoint_key = checkpoint_key
+        checkpoint = Checkpoint(os.path.join(
+            CHECKPOINT_DIR, f"{checkpoint_key}_{file_stem(f'{dept} {semester} {section}')}_{engine_key}.npz"))
+        saved_run = checkpoint.peek()
+        fingerprint = instance_fingerprint(
+            confirmed_theory, confirmed_lab, st.session_state.get("teacher_preferences", {}),
+            ConstraintRegistry.from_config(st.session_state.scheduling_rules).compile(confirmed_theory, week),
+            week=week)
+        resumable = saved_run is not None and saved_run["fingerprint"] == fingerprint
+        if resumable:
+            col1, col2 = st.columns([3, 1])
+            with col1:
+                st.info(f"An interrupted run was saved at "
+                        f"{datetime.fromtimestamp(saved_run['saved_at']).strftime('%H:%M:%S')} "
+                        f"after {saved_run['meta']['elapsed']:.0f}s of search. Generating resumes it.")
+            with col2:
+                if st.button("Discard Saved Run", use_container_width=True):
+                    checkpoint.clear()
+                    st.rerun()
+        use_checkpoint = st.checkbox("Save progress every 30 seconds", key="use_checkpoint",
+                                     help="An interrupted run (restart, session timeout, Clear All Data) "
+                                          f"resumes where it stopped, for up to {KEEP_FOR // 86400} days")
+        if not use_checkpoint and not resumable:
+            checkpoint = None
 
     # Generate button
     if st.session_state.generation_count == 0:
@@ -2052,29 +2095,123 @@ with tab4:
     else:
         button_label = f"Re-generate Timetable (Attempt #{st.session_state.generation_count + 1})"
 
+    # Editor fragments compare against this to know when the button needs a full rerun
+    st.session_state.generate_enabled = can_generate()
     if st.button(button_label, type="primary", use_container_width=True,
-                 disabled=(len(unscheduled_labs) > 0 or (not confirmed_theory and not confirmed_lab))):
+                 disabled=not st.session_state.generate_enabled):
 
         st.session_state.generation_count += 1
-        random.seed(st.session_state.generation_count * 42)
+        # One seed per press of the button; engines never touch the process-wide random state
+        seed = st.session_state.generation_count * 42
+
+        with st.spinner(f"Generating optimal timetable ({engine}, {max_iterations} iterations)..."):
+            rule_constraints = ConstraintRegistry.from_config(
+                st.session_state.scheduling_rules).compile(confirmed_theory, week)
+            if engine == "Greedy restarts":
+                result = generate_timetable_with_optimization(
+                    confirmed_theory, confirmed_lab, max_iterations,
+                    teacher_free_periods=st.session_state.get("teacher_preferences", {}),
+                    constraints=rule_constraints,
+                    history=st.session_state.history,
+                    checkpoint=checkpoint,
+                    seed=seed,
+                    week=week
+                )
+            elif engine == "Genetic (island model)":
+                result = evolve_timetables(
+                    confirmed_theory, confirmed_lab,
+                    teacher_free_periods=st.session_state.get("teacher_preferences", {}),
+                    constraints=rule_constraints,
+                    generations=max_iterations,
+                    checkpoint=checkpoint,
+                    seed=seed,
+                    week=week
+                )
+            elif engine == "Exact (CP-SAT)":
+                result = solve_exact(
+                    confirmed_theory, confirmed_lab,
+                    teacher_free_periods=st.session_state.get("teacher_preferences", {}),
+                    constraints=rule_constraints,
+                    time_limit=max_iterations,
+                    seed=seed,
+                    week=week
+                )
+            else:
+                result = run_portfolio(
+                    confirmed_theory, confirmed_lab,
+                    teacher_free_periods=st.session_state.get("teacher_preferences", {}),
+                    constraints=rule_constraints,
+                    time_limit=max_iterations,
+                    target_score=target_score,
+                    log_path=PORTFOLIO_LOG,
+                    seed=seed,
+                    week=week
+                )
+
+            # Every engine returns (timetable, unallocated, score, pool, report)
+            timetable, unallocated, score, pool, report = result
+            if engine == "Portfolio (race engines)" and report is not None:
+                st.session_state.portfolio_history.append(report)
 
-        with st.spinner(f"Generating optimal timetable ({max_iterations} iterations)..."):
-            result = generate_timetable_with_optimization(confirmed_theory, confirmed_lab, max_iterations)
+            if timetable is None and not unallocated:
+                st.error("**Generation Failed - No engine returned a timetable that keeps the hard rules "
+                         "before the deadline**")
+                st.stop()
 
-            if result[0] is None:
+            if timetable is None:
                 st.error("**Generation Failed - Lab Conflicts Detected!**")
-                lab_conflicts = result[1]
-                for conflict in lab_conflicts:
+                for conflict in unallocated:
                     st.write(f"• **{conflict[0]}** and **{conflict[1]}** both on **{conflict[2]} {conflict[3]}**")
                 st.stop()
 
-            timetable, unallocated, score = result
+            if engine != "Greedy restarts":
+                # Other engines search inside worker processes; keep the results they return
+                try:
+                    history_run = st.session_state.history.start_run(engine, confirmed_theory, confirmed_lab)
+                    for entry in pool:
+                        st.session_state.history.record_timetable(
+                            history_run, entry["timetable"], entry["score"], entry["seed"])
+                except ValueError as e:
+                    st.warning(f"Not recorded in the generation history: {e}")
+            elif report["history_error"]:
+                st.warning(f"Not all attempts were recorded in the generation history: {report['history_error']}")
             st.session_state.timetable = timetable
             st.session_state.unallocated = unallocated
             st.session_state.timetable_score = score
+            st.session_state.timetable_pool = pool
             st.session_state.timetable_generated = True
+            st.session_state.term_plan = None
 
         st.success(f"**Timetable Generated! Quality Score: {score:.1f}/100**")
+        if engine == "Portfolio (race engines)":
+            st.info(f"Winning engine: **{report['engine']}** ({report['reason']}, {report['elapsed']:.1f}s)")
+            if os.path.exists(PORTFOLIO_LOG):
+                with st.expander("Portfolio Wins on This Server"):
+                    st.dataframe(pd.DataFrame(summarize_portfolio_log(PORTFOLIO_LOG)),
+                                 use_container_width=True, hide_index=True)
+        stop_reasons = {
+            "target": "target score reached",
+            "upper_bound": "proven optimal",
+            "plateau": "no further improvement",
+            "time_limit": "time limit reached",
+            "max_iterations": "all iterations used",
+            "max_generations": "all generations used",
+            "max_steps": "all steps used",
+        }
+        if engine == "Greedy restarts":
+            st.info(f"Stopped after {report['attempts']} attempts: {stop_reasons[report['stop_reason']]} "
+                    f"(upper bound {report['upper_bound']:.1f}, {report['elapsed']:.1f}s)")
+        if engine == "Genetic (island model)":
+            islands = f"{report['islands']} island" + ("s" if report["islands"] != 1 else "")
+            st.info(f"Stopped after {report['generations']} generations on {islands}: "
+                    f"{stop_reasons[report['stop_reason']]} ({report['elapsed']:.1f}s)")
+        if engine == "Exact (CP-SAT)":
+            if report["optimal"]:
+                st.info(f"**Proven optimal**: no timetable can score higher than {report['objective']:.1f} "
+                        f"({report['wall_time']:.1f}s)")
+            else:
+                st.info(f"Best bound {report['best_bound']:.1f}, gap {report['gap']:.1f} points "
+                        f"({report['status']}, {report['wall_time']:.1f}s)")
         st.balloons()
 
     # Display timetable if generated
@@ -2102,19 +2239,86 @@ with tab4:
         if st.session_state.generation_count > 1:
             st.info(f"This is generation attempt #{st.session_state.generation_count}")
 
-        display_timetable = create_display_timetable(st.session_state.timetable)
-
-
-        def style_timetable(val):
-            if val == "BREAK":
-                return 'background-color: #1a1a1a; color: #fafafa; font-weight: bold; text-align: center'
-            if val == "Library":
-                return 'background-color: #1a4d2e; color: #fafafa'
-            if val == "":
-                return 'background-color: #0e1117; color: #fafafa'
-            return 'background-color: #262730; color: #fafafa; border: 1px solid #3d3d3d'
-
-
+        # Alternatives kept from the last optimization run
+        pool = st.session_state.get("timetable_pool", [])
+        if len(pool) > 1:
+            option_labels = [
+                f"Option {i + 1} - Score {entry['score']:.1f}"
+                + (f" ({sum(u['remaining'] for u in entry['unallocated'])} periods unallocated)"
+                   if entry["unallocated"] else "")
+                for i, entry in enumerate(pool)
+            ]
+            current_option = next((i for i, entry in enumerate(pool)
+                                   if entry["timetable"] is st.session_state.timetable), 0)
+            selected_option = st.selectbox(
+                f"Alternative Timetables ({len(pool)} distinct options)",
+                range(len(pool)),
+                index=current_option,
+                format_func=lambda i: option_labels[i],
+                key=f"pool_option_select_{st.session_state.generation_count}",
+                help="Switch between the best distinct timetables found, without re-generating"
+            )
+            if selected_option != current_option:
+                chosen = pool[selected_option]
+                st.session_state.timetable = chosen["timetable"]
+                st.session_state.unallocated = chosen["unallocated"]
+                st.session_state.timetable_score = chosen["score"]
+                st.session_state.term_plan = None
+                st.rerun()
+            st.caption(f"Seed: {pool[selected_option]['seed']}")
+
+        # Every recorded attempt, restorable without re-generating
+        history = st.session_state.history
+        matching_runs = history.runs_matching(confirmed_theory, confirmed_lab)
+        if matching_runs:
+            with st.expander(f"Generation History ({len(history)} timetables, {history.nbytes / 1024:.0f} KB)"):
+                records = history.records(matching_runs).sort_values("Score", ascending=False, kind="stable")
+                st.dataframe(records.head(200), use_container_width=True, hide_index=True)
+                # Selected by hash: record numbers shift when old records are dropped
+                restorable = records.drop_duplicates("Hash").head(200)
+                restore_labels = {row.Hash: f"{row.Hash} - Score {row.Score:.1f} ({row.Engine})"
+                                  for row in restorable.itertuples()}
+                col1, col2 = st.columns([3, 1])
+                with col1:
+                    restore_hash = st.selectbox(
+                        "Restore Timetable", list(restore_labels),
+                        format_func=restore_labels.get,
+                        key="history_restore_select"
+                    )
+                with col2:
+                    st.markdown("<br>", unsafe_allow_html=True)
+                    if st.button("Restore", use_container_width=True, key="history_restore_button"):
+                        entry = history.entry(history.find(restore_hash, matching_runs))
+                        st.session_state.timetable = entry["timetable"]
+                        st.session_state.unallocated = entry["unallocated"]
+                        st.session_state.timetable_score = entry["score"]
+                        st.session_state.timetable_pool = []
+                        st.session_state.term_plan = None
+                        st.rerun()
+
+        # What changed against an earlier version of this timetable
+        compare_options = {}
+        section_label = f"{dept} {semester} {section}"
+        saved = st.session_state.saved_timetables.get(section_label)
+        if saved is not None and saved["timetable"] is not st.session_state.timetable:
+            compare_options["Saved in the timetable store"] = (saved["cells"], saved["subject_teachers"])
+        for version in reversed(st.session_state.published_versions):
+            if section_label in version["timetables"]:
+                published = version["timetables"][section_label]
+                compare_options[f"Published: {version['name']}"] = (published["cells"], published["subject_teachers"])
+        for i, option in enumerate(pool):
+            if option["timetable"] is not st.session_state.timetable:
+                compare_options[f"Option {i + 1} - Score {option['score']:.1f}"] = (option["timetable"], None)
+        if compare_options:
+            with st.expander("Compare Timetables"):
+                compare_with = st.selectbox("Compare With", list(compare_options), key="compare_with")
+                old_timetable, old_teachers = compare_options[compare_with]
+                subject_teachers = get_subject_teacher_map()
+                show_timetable_diff(diff_timetables(old_timetable, st.session_state.timetable,
+                                                    old_teachers or subject_teachers, subject_teachers,
+                                                    label=section_label, week=week), key="compare")
+
+        display_timetable = create_display_timetable(st.session_state.timetable, week)
         styled_table = display_timetable.style.map(style_timetable)
         st.dataframe(styled_table, use_container_width=True, height=250)
 
@@ -2149,12 +2353,50 @@ with tab4:
             for item in st.session_state.unallocated:
                 st.write(
                     f"- **{item['subject']}**: {item['allocated']}/{item['needed']} allocated, {item['remaining']} remaining")
+
+            diagnosis = st.session_state.diagnosis
+            if diagnosis is None or diagnosis[0] is not st.session_state.timetable:
+                if st.button("Diagnose Unallocated Subjects", use_container_width=True):
+                    st.session_state.diagnosis = (st.session_state.timetable, diagnose_unallocated(
+                        confirmed_theory, confirmed_lab, st.session_state.unallocated,
+                        st.session_state.get("teacher_preferences", {}), st.session_state.scheduling_rules,
+                        week=week))
+                    st.rerun()
+            else:
+                with st.expander("Diagnosis", expanded=True):
+                    results = diagnosis[1]["subjects"]
+                    if len(results) > 1:
+                        results = results + [dict(diagnosis[1]["overall"], subject=None)]
+                    for result in results:
+                        heading = f"**{result['subject']}**" if result["subject"] else "**All subjects together**"
+                        if result["overloaded"]:
+                            st.error(f"{heading}: {result['shortfall']} period(s) cannot fit even with every "
+                                     "free period, lab and day rule relaxed. Reduce the periods per week.")
+                        elif result["conflict"] is None:
+                            st.info(f"{heading}: no conflicting constraints; a longer run or another "
+                                    "engine should place it.")
+                        else:
+                            st.warning(f"{heading} is blocked by: " + "; ".join(summarize_constraints(result["conflict"], week)))
+                            fixes = [f"Remove {line}" if "free period" in line else f"Relax: {line}"
+                                     for line in summarize_constraints([c for c in result["relax"] if c[0] != LAB], week)]
+                            fixes += [f"Move {lab} to {move[0]} {move[1]}" if move else f"Drop {lab}"
+                                      for lab, move in result["lab_moves"].items()]
+                            st.write("To fit it:\n" + "\n".join(f"- {fix}" for fix in fixes))
         else:
             st.success("**All subjects successfully allocated!**")
 
         # Constraint violations
         with st.expander("Constraint Validation"):
-            violations = validate_constraints(st.session_state.timetable, confirmed_theory)
+            violations = validate_constraints(st.session_state.timetable, confirmed_theory, week)
+
+            rule_constraints = ConstraintRegistry.from_config(
+                st.session_state.scheduling_rules).compile(confirmed_theory, week)
+            if rule_constraints.active:
+                rule_penalty, rule_violations = rule_constraints.evaluate(
+                    rule_constraints.grid_from_timetable(st.session_state.timetable))
+                violations += rule_violations
+                if rule_penalty:
+                    st.info(f"Soft scheduling rules cost {rule_penalty:.0f} point(s)")
 
             if violations:
                 st.warning(f"Found {len(violations)} constraint violation(s):")
@@ -2163,6 +2405,185 @@ with tab4:
             else:
                 st.success("All constraints satisfied!")
 
+        # Keep this section's timetable for cross-section views
+        if dept and semester and section:
+            saved = st.session_state.saved_timetables.get(section_label)
+            if saved is not None and saved["timetable"] is st.session_state.timetable:
+                st.caption(f"Saved to the timetable store as **{section_label}**")
+            elif st.button(f"Save to Timetable Store ({section_label})", use_container_width=True):
+                st.session_state.saved_timetables[section_label] = {
+                    "dept": dept,
+                    "regulation": regulation,
+                    "semester": semester,
+                    "section": section,
+                    "timetable": st.session_state.timetable,
+                    "subject_teachers": get_subject_teacher_map(),
+                    "lab_floors": {l["name"]: l.get("floor") for l in confirmed_lab},
+                    "cells": timetable_cells(st.session_state.timetable, week),
+                    "score": st.session_state.timetable_score,
+                    "week": week,
+                    "saved_at": datetime.now().isoformat(timespec="seconds"),
+                }
+                st.session_state.teacher_index.save_section(
+                    section_label, st.session_state.timetable, get_subject_teacher_map())
+                st.session_state.store_version += 1
+                st.rerun()
+
+        # Term calendar derived from this week
+        st.markdown("---")
+        st.markdown("### Term Calendar")
+        st.info("Derive every week of the term from this timetable. Holidays only move the periods they remove.")
+
+        with st.form("term_form"):
+            col1, col2 = st.columns(2)
+            with col1:
+                term_start = st.date_input("First Monday of Term")
+                term_weeks = st.number_input("Weeks", min_value=1, max_value=30, value=16)
+                exam_weeks = st.multiselect("Exam Weeks", list(range(1, 31)))
+            with col2:
+                holiday_text = st.text_area("Holidays (one YYYY-MM-DD per line)")
+                saturday_text = st.text_area("Compensatory Saturdays (YYYY-MM-DD Weekday per line)",
+                                             placeholder="2026-08-22 Monday")
+            term_submitted = st.form_submit_button("Generate Term Calendar", type="primary")
+
+        if term_submitted:
+            try:
+                holidays = {datetime.strptime(line.strip(), "%Y-%m-%d").date()
+                            for line in holiday_text.splitlines() if line.strip()}
+                compensatory = {}
+                for line in saturday_text.splitlines():
+                    if not line.strip():
+                        continue
+                    date_text, weekday = line.split()
+                    date = datetime.strptime(date_text, "%Y-%m-%d").date()
+                    if date.weekday() != 5 or weekday.capitalize() not in week.days:
+                        raise ValueError(f"{line.strip()} is not a Saturday followed by a weekday")
+                    compensatory[date] = weekday.capitalize()
+            except ValueError as e:
+                st.error(f"Invalid calendar entry: {e}")
+            else:
+                if term_start.weekday() != 0:
+                    st.warning("The term start is not a Monday; weeks start on the chosen date")
+                rule_constraints = ConstraintRegistry.from_config(
+                    st.session_state.scheduling_rules).compile(confirmed_theory, week)
+                planner = TermPlanner(st.session_state.timetable, confirmed_theory, confirmed_lab,
+                                      st.session_state.get("teacher_preferences", {}), rule_constraints, week)
+                st.session_state.term_plan = planner.plan_term(
+                    term_start, int(term_weeks), holidays, set(exam_weeks), compensatory)
+
+        term = st.session_state.term_plan
+        if term:
+            st.dataframe(term_summary(term), use_container_width=True, hide_index=True)
+
+            week_number = st.selectbox("View Week", [w["week"] for w in term],
+                                       format_func=lambda n: f"Week {n} ({term[n - 1]['type']})",
+                                       key="term_week_select")
+            term_week = term[week_number - 1]
+            st.dataframe(create_display_timetable(term_week["timetable"], week).style.map(style_timetable),
+                         use_container_width=True)
+            for subject, day, period in term_week["rescheduled"]:
+                st.write(f"- **{subject}** moved to {day} {period}")
+            for item in term_week["unplaced"]:
+                st.error(f"**{item['subject']}**: {item['periods']} period(s) could not be rescheduled")
+
+            output = BytesIO()
+            with pd.ExcelWriter(output, engine='openpyxl') as writer:
+                term_summary(term).to_excel(writer, sheet_name='Term', index=False)
+                for w in term:
+                    create_display_timetable(w["timetable"], week).to_excel(writer, sheet_name=f"Week {w['week']}")
+            st.download_button(
+                label="Download Term Calendar (Excel)",
+                data=output.getvalue(),
+                file_name="Term_Calendar.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                use_container_width=True
+            )
+
+        # What-if scenarios against this configuration
+        st.markdown("---")
+        st.markdown("### What-if Scenarios")
+        st.info("Try a change before making it. Each scenario is solved in parallel with the same seed "
+                "and compared with this timetable.")
+
+        scenario_base = base_configuration(confirmed_theory, confirmed_lab,
+                                           st.session_state.get("teacher_preferences", {}),
+                                           st.session_state.scheduling_rules, week)
+        scenarios = st.session_state.scenarios
+        theory_names = [s["name"] for s in confirmed_theory]
+        lab_names = [l["name"] for l in confirmed_lab]
+
+        edit_type = st.selectbox("Change", list(EDIT_TYPES), format_func=EDIT_TYPES.get, key="scenario_edit_type")
+        with st.form("scenario_form"):
+            col1, col2 = st.columns(2)
+            edit = {"type": edit_type}
+            with col1:
+                scenario_name = st.text_input("Scenario Name", f"Scenario {len(scenarios) + 1}")
+                if edit_type == "teacher_unavailable":
+                    edit["teacher"] = st.selectbox("Teacher", teachers)
+                elif edit_type == "add_subject":
+                    edit["name"] = st.text_input("Subject Name", "Elective")
+                elif edit_type in ("remove_subject", "assign_teacher"):
+                    edit["name"] = st.selectbox("Subject", theory_names + lab_names)
+                elif edit_type == "set_periods":
+                    edit["name"] = st.selectbox("Subject", theory_names)
+                else:
+                    edit["name"] = st.selectbox("Lab", lab_names)
+            with col2:
+                if edit_type == "teacher_unavailable":
+                    edit["days"] = st.multiselect("Days", week.days, default=week.days[-2:])
+                    edit["periods"] = st.multiselect("Periods (empty = all)", week.periods)
+                elif edit_type == "add_subject":
+                    edit["periods"] = st.number_input("Periods per Week", 1, 8, 3)
+                    edit["teacher"] = st.selectbox("Teacher", teachers)
+                elif edit_type == "set_periods":
+                    edit["periods"] = st.number_input("Periods per Week", 1, 8, 4)
+                elif edit_type == "assign_teacher":
+                    edit["teacher"] = st.selectbox("Teacher", teachers)
+                elif edit_type == "move_lab":
+                    edit["day"] = st.selectbox("Day", week.days)
+                    edit["session"] = st.radio("Session", ["FN", "AN"], horizontal=True)
+
+            add_edit = st.form_submit_button("Add to Scenario", use_container_width=True)
+
+        if add_edit:
+            try:
+                apply_edits(scenario_base, scenarios.get(scenario_name, []) + [edit])
+            except ValueError as e:
+                st.error(str(e))
+            else:
+                scenarios.setdefault(scenario_name, []).append(edit)
+                st.session_state.scenario_results = None
+                st.rerun()
+
+        for name, edits in list(scenarios.items()):
+            col1, col2 = st.columns([4, 1])
+            with col1:
+                st.write(f"**{name}**: " + "; ".join(describe_edit(e) for e in edits))
+            with col2:
+                if st.button("Remove", key=f"remove_scenario_{name}", use_container_width=True):
+                    del scenarios[name]
+                    st.session_state.scenario_results = None
+                    st.rerun()
+
+        if scenarios and st.button("Evaluate Scenarios", use_container_width=True):
+            with st.spinner(f"Evaluating {len(scenarios)} scenario(s)..."):
+                st.session_state.scenario_results = evaluate_scenarios(
+                    scenario_base, scenarios, st.session_state.timetable)
+
+        if st.session_state.scenario_results is not None:
+            comparison, scenario_results = st.session_state.scenario_results
+            st.dataframe(comparison, use_container_width=True, hide_index=True)
+            st.caption("Disruption is measured against the current timetable; the Base row shows "
+                       "what regenerating without any change would move.")
+            viewable = [name for name, result in scenario_results.items() if result["timetable"] is not None]
+            if viewable:
+                view_scenario = st.selectbox("View Scenario Timetable", viewable, key="view_scenario")
+                result = scenario_results[view_scenario]
+                st.dataframe(create_display_timetable(result["timetable"], week).style.map(style_timetable),
+                             use_container_width=True)
+                for item in result["unallocated"]:
+                    st.error(f"**{item['subject']}**: {item['remaining']} period(s) unallocated")
+
 # -------------------------------------------------
 # TAB 5: ANALYTICS (Remains unchanged)
 # -------------------------------------------------
@@ -2175,17 +2596,18 @@ with tab5:
         timetable = st.session_state.timetable
 
         subject_teacher_map = get_subject_teacher_map()
-        workload_data = calculate_teacher_workload(timetable, subject_teacher_map)
-        utilization, filled, library = calculate_utilization_score(timetable)
+        slots = slot_table([(st.session_state.get("current_section", ""), timetable, subject_teacher_map)], week)
+        workload_data = teacher_workload(slots).to_dict()
+        utilization_rate, filled, library = utilization(slots)
 
         # Overview metrics
         st.markdown("#### Overview Metrics")
         col1, col2, col3 = st.columns(3)
 
         with col1:
-            st.metric("Utilization Rate", f"{utilization:.1f}%")
+            st.metric("Utilization Rate", f"{utilization_rate:.1f}%")
         with col2:
-            st.metric("Filled Slots", f"{filled}/40")
+            st.metric("Filled Slots", f"{filled}/{week.slot_count}")
         with col3:
             st.metric("Library Periods", library)
 
@@ -2197,7 +2619,7 @@ with tab5:
         if workload_data:
             workload_df = pd.DataFrame([
                 {"Teacher": k, "Periods per Week": v}
-                for k, v in sorted(workload_data.items(), key=lambda x: x[1], reverse=True)
+                for k, v in workload_data.items()
             ])
 
             fig = px.bar(workload_df, x="Teacher", y="Periods per Week",
@@ -2223,28 +2645,9 @@ with tab5:
         # Subject Distribution Analysis
         st.markdown("#### Subject Distribution Analysis")
 
-        subject_distribution = defaultdict(lambda: {"FN": 0, "AN": 0, "total": 0})
-
-        for day in DAYS:
-            for period in PERIODS:
-                subject = timetable.loc[day, period]
-                if subject and subject != "" and subject != "Library":
-                    session = "FN" if period in PERIODS_FN else "AN"
-                    subject_distribution[subject][session] += 1
-                    subject_distribution[subject]["total"] += 1
-
-        if subject_distribution:
-            dist_df = pd.DataFrame([
-                {
-                    "Subject": k,
-                    "FN Periods": v["FN"],
-                    "AN Periods": v["AN"],
-                    "Total": v["total"],
-                    "Balance": abs(v["FN"] - v["AN"])
-                }
-                for k, v in subject_distribution.items()
-            ])
+        dist_df = subject_distribution(slots)
 
+        if not dist_df.empty:
             fig = go.Figure()
             fig.add_trace(go.Bar(name='Forenoon', x=dist_df['Subject'], y=dist_df['FN Periods']))
             fig.add_trace(go.Bar(name='Afternoon', x=dist_df['Subject'], y=dist_df['AN Periods']))
@@ -2263,15 +2666,9 @@ with tab5:
         # Daily Load Analysis
         st.markdown("#### Daily Load Analysis")
 
-        daily_load = {}
-        for day in DAYS:
-            filled = sum(1 for period in PERIODS
-                         if timetable.loc[day, period] not in ["", "Library", "BREAK"])
-            daily_load[day] = filled
-
         daily_df = pd.DataFrame([
-            {"Day": k, "Filled Periods": v, "Utilization": f"{(v / 8 * 100):.1f}%"}
-            for k, v in daily_load.items()
+            {"Day": k, "Filled Periods": int(v), "Utilization": f"{(v / len(week.periods) * 100):.1f}%"}
+            for k, v in daily_load(slots).items()
         ])
 
         fig = px.line(daily_df, x="Day", y="Filled Periods",
@@ -2288,18 +2685,17 @@ with tab5:
         # Session-wise Analysis
         st.markdown("#### Session-wise Analysis")
 
-        fn_filled = sum(1 for day in DAYS for period in PERIODS_FN
-                        if timetable.loc[day, period] not in ["", "Library"])
-        an_filled = sum(1 for day in DAYS for period in PERIODS_AN
-                        if timetable.loc[day, period] not in ["", "Library"])
+        sessions = session_load(slots)
+        fn_filled, an_filled = int(sessions["FN"]), int(sessions["AN"])
+        fn_slots, an_slots = len(week.days) * week.session_length("FN"), len(week.days) * week.session_length("AN")
 
         col1, col2 = st.columns(2)
         with col1:
-            st.metric("Forenoon Utilization", f"{(fn_filled / 20 * 100):.1f}%",
-                      help=f"{fn_filled}/20 periods filled")
+            st.metric("Forenoon Utilization", f"{(fn_filled / fn_slots * 100):.1f}%",
+                      help=f"{fn_filled}/{fn_slots} periods filled")
         with col2:
-            st.metric("Afternoon Utilization", f"{(an_filled / 20 * 100):.1f}%",
-                      help=f"{an_filled}/20 periods filled")
+            st.metric("Afternoon Utilization", f"{(an_filled / an_slots * 100):.1f}%",
+                      help=f"{an_filled}/{an_slots} periods filled")
 
         session_data = pd.DataFrame({
             "Session": ["Forenoon", "Afternoon"],
@@ -2311,6 +2707,324 @@ with tab5:
         fig.update_layout(height=300)
         st.plotly_chart(fig, use_container_width=True)
 
+    # College-wide dashboard over every saved timetable
+    if st.session_state.saved_timetables:
+        st.markdown("---")
+        st.markdown("### College Dashboard")
+
+        college_slots = slot_table([
+            (label, entry["cells"], entry["subject_teachers"], entry["dept"])
+            for label, entry in st.session_state.saved_timetables.items()
+        ], week)
+        st.caption(f"{college_slots['section'].nunique()} saved timetable(s)")
+
+        college_workload = teacher_workload(college_slots).rename("Periods per Week").reset_index()
+        college_workload.columns = ["Teacher", "Periods per Week"]
+        if not college_workload.empty:
+            fig = px.bar(college_workload, x="Teacher", y="Periods per Week",
+                         title="Teacher Load Across All Sections",
+                         color="Periods per Week",
+                         color_continuous_scale="Blues")
+            fig.update_layout(height=400)
+            st.plotly_chart(fig, use_container_width=True)
+
+        dept_sessions = session_load(college_slots, by="dept").reset_index()
+        dept_sessions.columns = ["Department", "FN Periods", "AN Periods"]
+        fig = go.Figure()
+        fig.add_trace(go.Bar(name='Forenoon', x=dept_sessions['Department'], y=dept_sessions['FN Periods']))
+        fig.add_trace(go.Bar(name='Afternoon', x=dept_sessions['Department'], y=dept_sessions['AN Periods']))
+        fig.update_layout(barmode='group', title="Forenoon vs Afternoon by Department", height=350)
+        st.plotly_chart(fig, use_container_width=True)
+
+        with st.expander("Teacher Idle Gaps"):
+            st.caption("Free periods between a teacher's first and last class of the day, across all sections")
+            st.dataframe(idle_gaps(college_slots), use_container_width=True, hide_index=True)
+
+# -------------------------------------------------
+# TAB 6: FACULTY
+# -------------------------------------------------
+with tab6:
+    st.markdown("### Timetable Store")
+
+    saved_timetables = st.session_state.saved_timetables
+
+    if columnar_available():
+        with st.expander("Bulk Import / Export (Parquet, Arrow)"):
+            exports = prepared_download(
+                "store", "Prepare Export (Parquet, Arrow)",
+                lambda: {fmt: export_store(saved_timetables, fmt, week) for fmt in ("parquet", "arrow")}
+            ) if saved_timetables else None
+            if exports is not None:
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.download_button(
+                        label="Export All (Parquet)",
+                        data=exports["parquet"],
+                        file_name="timetables.parquet",
+                        mime="application/octet-stream",
+                        use_container_width=True
+                    )
+                with col2:
+                    st.download_button(
+                        label="Export All (Arrow)",
+                        data=exports["arrow"],
+                        file_name="timetables.arrow",
+                        mime="application/octet-stream",
+                        use_container_width=True
+                    )
+
+            uploaded = st.file_uploader("Import Timetables", type=["parquet", "arrow"], key="columnar_import")
+            if uploaded is not None and st.button("Import into Store", key="columnar_import_button"):
+                try:
+                    imported = import_store(uploaded.getvalue())
+                    file_week = next(iter(imported.values()))["week"] if imported else week
+                    if file_week != week:
+                        raise ValueError(f"the file has {file_week.label} timetables, this session uses "
+                                         f"{week.label}. Change the week shape first.")
+                except ValueError as e:
+                    st.error(f"Could not import: {e}")
+                else:
+                    for label, entry in imported.items():
+                        saved_timetables[label] = entry
+                        st.session_state.teacher_index.save_section(
+                            label, entry["timetable"], entry["subject_teachers"])
+                    st.session_state.store_version += 1
+                    st.success(f"Imported {len(imported)} timetable(s)")
+                    st.rerun()
+
+    if not saved_timetables:
+        st.info("Save generated timetables from the Generate tab to use the faculty tools.")
+    else:
+        st.dataframe(pd.DataFrame([
+            {"Section": label, "Regulation": entry["regulation"], "Score": round(entry["score"], 1),
+             "Saved": entry["saved_at"]}
+            for label, entry in saved_timetables.items()
+        ]), use_container_width=True, hide_index=True)
+
+        st.markdown("---")
+        st.markdown("### Published Versions")
+        st.info("Publish the store when timetables go out, then see exactly what changed since.")
+
+        published_versions = st.session_state.published_versions
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            version_name = st.text_input("Version Name", f"Version {len(published_versions) + 1}",
+                                         key="version_name")
+        with col2:
+            st.markdown("<br>", unsafe_allow_html=True)
+            if st.button("Publish", use_container_width=True, key="publish_version"):
+                published_versions.append(take_snapshot(saved_timetables, version_name))
+                st.rerun()
+
+        if published_versions:
+            versions = {f"{v['name']} ({v['taken_at']})": v["timetables"] for v in published_versions}
+            versions["Current store"] = saved_timetables
+            col1, col2 = st.columns(2)
+            with col1:
+                diff_from = st.selectbox("From", list(versions), index=len(versions) - 2, key="diff_from")
+            with col2:
+                diff_to = st.selectbox("To", list(versions), index=len(versions) - 1, key="diff_to")
+            show_timetable_diff(diff_snapshots(versions[diff_from], versions[diff_to], week), key="versions")
+
+        all_teachers = sorted({t for semesters in TEACHERS_BY_DEPT_SEMESTER.values()
+                               for names in semesters.values() for t in names})
+        teacher_index = st.session_state.teacher_index
+        occupancy = OccupancyIndex.from_teacher_index(
+            teacher_index, all_teachers,
+            {t: info["subjects"] for t, info in st.session_state.teacher_assignments.items()})
+        teacher_free_periods = st.session_state.get("teacher_preferences", {})
+
+        st.markdown("---")
+        st.markdown("### Teacher Timetables")
+
+        col1, col2 = st.columns([2, 1])
+        with col1:
+            personal_teacher = st.selectbox("Teacher", teacher_index.teachers, key="personal_teacher")
+        with col2:
+            st.metric("Periods per Week", teacher_index.load(personal_teacher))
+
+        personal_display = create_display_timetable(teacher_index.personal_timetable(personal_teacher), week)
+        st.dataframe(personal_display, use_container_width=True, height=250)
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button(
+                label=f"Download {personal_teacher} (CSV)",
+                data=personal_display.to_csv().encode("utf-8"),
+                file_name=f"{personal_teacher}_Timetable.csv",
+                mime="text/csv",
+                use_container_width=True
+            )
+        with col2:
+            teacher_workbook = prepared_download(
+                "teachers", "Prepare All Teachers (Excel)",
+                lambda: export_teacher_timetables(teacher_index, teacher_index.teachers))
+            if teacher_workbook is not None:
+                st.download_button(
+                    label="Download All Teachers (Excel)",
+                    data=teacher_workbook,
+                    file_name="Teacher_Timetables.xlsx",
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    use_container_width=True
+                )
+
+        st.markdown("#### Clash Report")
+        clashes = teacher_index.clashes()
+        if clashes:
+            st.warning(f"Found {len(clashes)} slot(s) where a teacher is booked in more than one section:")
+            st.dataframe(pd.DataFrame([
+                {"Teacher": c["teacher"], "Day": c["day"], "Period": c["period"],
+                 "Sections": ", ".join(c["sections"]), "Subjects": ", ".join(c["subjects"])}
+                for c in clashes
+            ]), use_container_width=True, hide_index=True)
+        else:
+            st.success("No teacher is booked in two sections at once!")
+
+        st.markdown("---")
+        st.markdown("### Print Run")
+        st.info("Render a printable page for every saved section and every teacher. "
+                "Re-runs skip timetables that have not changed.")
+
+        print_pdf = st.checkbox("Also PDF", disabled=not pdf_available(), key="print_pdf",
+                                help=None if pdf_available() else "Install WeasyPrint for PDFs")
+
+        if st.button("Render All Timetables", use_container_width=True):
+            # Each session renders into its own temporary folder, removed with the session
+            if "print_run_dir" not in st.session_state:
+                st.session_state.print_run_dir = tempfile.TemporaryDirectory(prefix="timetable_print_")
+            print_dir = st.session_state.print_run_dir.name
+            with st.spinner("Rendering timetables..."):
+                documents = section_documents(saved_timetables) + teacher_documents(teacher_index)
+                result = render_batch(documents, print_dir, pdf=print_pdf, week=week)
+            st.success(f"Rendered {len(result['rendered'])} document(s), "
+                       f"skipped {len(result['skipped'])} unchanged")
+
+            # Only this run's documents: the folder may still hold pages of sections removed since
+            archive = BytesIO()
+            with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zf:
+                for stem in sorted(result["rendered"] + result["skipped"]):
+                    for ext in (("html", "pdf") if print_pdf else ("html",)):
+                        zf.write(os.path.join(print_dir, f"{stem}.{ext}"), f"{stem}.{ext}")
+            st.download_button(
+                label="Download Print Run (ZIP)",
+                data=archive.getvalue(),
+                file_name="Timetable_Printouts.zip",
+                mime="application/zip",
+                use_container_width=True
+            )
+
+        st.markdown("---")
+        st.markdown("### Free Slot Finder")
+        st.info("Find common free periods for make-up classes and meetings. "
+                "Teachers' preferred free periods count as busy.")
+
+        availability = store_availability(teacher_free_periods)
+
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            query_sections = st.multiselect("Sections", list(saved_timetables), key="free_sections")
+        with col2:
+            query_teachers = st.multiselect("Teachers", all_teachers, key="free_teachers")
+        with col3:
+            query_rooms = st.multiselect("Rooms", CLASSROOMS + LAB_FLOORS, key="free_rooms")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            query_days = st.multiselect("Days", week.days, default=week.days, key="free_days")
+        with col2:
+            query_sessions = st.multiselect("Sessions", ["FN", "AN"], default=["FN", "AN"], key="free_sessions")
+
+        if query_sections or query_teachers or query_rooms:
+            within = 0
+            for day in query_days:
+                for session in query_sessions:
+                    within |= session_mask(day, session, week)
+            free_slots = availability.common_free_slots(query_sections, query_rooms, query_teachers, within)
+            if free_slots:
+                st.success(f"{len(free_slots)} common free period(s)")
+                free_by_day = defaultdict(list)
+                for day, period in free_slots:
+                    free_by_day[day].append(period)
+                for day in week.days:
+                    if free_by_day[day]:
+                        st.write(f"- **{day}**: {', '.join(free_by_day[day])}")
+            else:
+                st.warning("No common free period for this selection")
+
+        st.markdown("#### Who is Free?")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            free_day = st.selectbox("Day", week.days, key="free_query_day")
+        with col2:
+            free_period = st.selectbox("Period", week.periods, key="free_query_period")
+        with col3:
+            free_session = week.session_of(free_period)
+            st.metric("Session", free_session)
+
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.markdown("**Sections**")
+            st.write(", ".join(availability.free_at("sections", free_day, free_period)) or "None")
+        with col2:
+            st.markdown("**Classrooms**")
+            st.write(", ".join(availability.free_at("rooms", free_day, free_period, CLASSROOMS)) or "None")
+        with col3:
+            st.markdown(f"**Lab Floors (whole {free_session})**")
+            st.write(", ".join(availability.open_for_session("rooms", free_day, free_session, LAB_FLOORS))
+                     or "None")
+
+        st.markdown("---")
+        st.markdown("### Substitute Finder")
+
+        sub_tab1, sub_tab2 = st.tabs(["Single Period", "Whole Day"])
+        with sub_tab1:
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                cover_section = st.selectbox("Section", list(saved_timetables), key="cover_section")
+            with col2:
+                cover_day = st.selectbox("Day", week.days, key="cover_day")
+            with col3:
+                cover_period = st.selectbox("Period", week.periods, key="cover_period")
+
+            slot = occupancy.slots.get((cover_section, cover_day, cover_period))
+            if slot is None:
+                st.info("No class is scheduled in this slot.")
+            else:
+                st.write(f"**{slot[0]}** taught by **{slot[1]}**")
+                candidates = occupancy.find_substitutes(cover_section, cover_day, cover_period,
+                                                        teacher_free_periods, limit=10)
+                if candidates:
+                    st.dataframe(pd.DataFrame([
+                        {"Teacher": c["teacher"], "Teaches Subject": "Yes" if c["qualified"] else "",
+                         "Teaches Section": "Yes" if c["same_section"] else "",
+                         f"Periods on {cover_day}": c["load"]}
+                        for c in candidates
+                    ]), use_container_width=True, hide_index=True)
+                else:
+                    st.warning("No teacher is free in this slot.")
+
+        with sub_tab2:
+            col1, col2 = st.columns([1, 2])
+            with col1:
+                absence_day = st.selectbox("Day", week.days, key="absence_day")
+            with col2:
+                absent_teachers = st.multiselect("Absent Teachers", occupancy.teachers, key="absent_teachers")
+
+            if absent_teachers:
+                plan = occupancy.cover_day(absence_day, absent_teachers, teacher_free_periods)
+                if plan:
+                    st.dataframe(pd.DataFrame([
+                        {"Period": row["period"], "Section": row["section"], "Subject": row["subject"],
+                         "Absent": row["absent"], "Substitute": row["substitute"] or "Unassigned",
+                         "Teaches Subject": "Yes" if row["qualified"] else ""}
+                        for row in plan
+                    ]), use_container_width=True, hide_index=True)
+                    unassigned = sum(1 for row in plan if row["substitute"] is None)
+                    if unassigned:
+                        st.warning(f"{unassigned} class(es) have no free teacher to cover them")
+                else:
+                    st.info(f"The absent teachers have no classes on {absence_day}.")
+
 # -------------------------------------------------
 # FOOTER
 # -------------------------------------------------
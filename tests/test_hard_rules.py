@@ -0,0 +1,91 @@
+"""Hard scheduling rules hold in every engine's results, not just in their scores"""
+from timetable.constraints import ConstraintRegistry
+from timetable.genetic import evolve_timetables
+from timetable.local_search import local_search_timetables
+from timetable.portfolio import run_portfolio
+from timetable.term import TermPlanner
+from timetable.week import STANDARD_WEEK
+
+THEORY = [
+    {"name": "Maths", "periods": 6, "teacher": "Dr. Priya"},
+    {"name": "Physics", "periods": 4, "teacher": "Dr. Kumar"},
+    {"name": "Chemistry", "periods": 4, "teacher": "Dr. Priya"},
+]
+RULES = [
+    {"type": "spread_across_days", "name": "Maths once a day", "subject": "Maths", "max_per_day": 1,
+     "kind": "hard", "weight": 5},
+    {"type": "avoid_adjacent", "name": "Physics apart from Chemistry", "subject_a": "Physics",
+     "subject_b": "Chemistry", "kind": "hard", "weight": 5},
+    {"type": "max_consecutive", "name": "Dr. Priya one at a time", "teacher": "Dr. Priya", "limit": 1,
+     "kind": "hard", "weight": 5},
+]
+
+
+def hard_violations(constraints, timetable):
+    return constraints.evaluate(constraints.grid_from_timetable(timetable))[1]
+
+
+def check_engine(engine, **options):
+    constraints = ConstraintRegistry.from_config(RULES).compile(THEORY)
+    timetable, unallocated, score, pool, report = engine(THEORY, [], None, constraints, seed=1, **options)
+    for entry in pool:
+        assert hard_violations(constraints, entry["timetable"]) == []
+    # Six Maths periods at most once a day on a five-day week: one must be left out
+    assert {u["subject"]: u["remaining"] for u in unallocated}.get("Maths") == 1
+    assert score < 100
+    assert report["stop_reason"] != "target"
+
+
+def test_genetic_keeps_hard_rules():
+    check_engine(evolve_timetables, generations=60, islands=2, workers=1)
+
+
+def test_local_search_keeps_hard_rules():
+    check_engine(local_search_timetables, max_steps=300)
+
+
+def test_portfolio_result_keeps_hard_rules():
+    constraints = ConstraintRegistry.from_config(RULES).compile(THEORY)
+    portfolio = [
+        {"label": "greedy", "engine": "greedy", "options": {"max_iterations": 50}},
+        {"label": "genetic", "engine": "genetic", "options": {"generations": 60, "islands": 2, "workers": 1}},
+    ]
+    timetable, unallocated, score, pool, report = run_portfolio(
+        THEORY, [], None, constraints, portfolio=portfolio, time_limit=20, seed=1)
+    assert report["engine"] is not None
+    assert hard_violations(constraints, timetable) == []
+    for entry in pool:
+        assert hard_violations(constraints, entry["timetable"]) == []
+
+
+def test_day_violation_names_the_strictest_rule():
+    rules = [
+        {"type": "spread_across_days", "name": "Maths once a day", "subject": "Maths", "max_per_day": 1,
+         "kind": "hard", "weight": 5},
+        {"type": "spread_across_days", "name": "Maths twice a day", "subject": "Maths", "max_per_day": 2,
+         "kind": "hard", "weight": 5},
+    ]
+    constraints = ConstraintRegistry.from_config(rules).compile(THEORY)
+    grid = constraints.empty_grid()
+    grid[0, 0] = grid[0, 1] = constraints.index["Maths"]
+    assert [v["rule"] for v in constraints.evaluate(grid)[1]] == ["Maths once a day"]
+
+
+def test_avoid_adjacent_with_itself_charges_its_weight_once():
+    rules = [{"type": "avoid_adjacent", "name": "No double Maths", "subject_a": "Maths", "subject_b": "Maths",
+              "kind": "soft", "weight": 5}]
+    constraints = ConstraintRegistry.from_config(rules).compile(THEORY)
+    grid = constraints.empty_grid()
+    grid[0, 0] = grid[0, 1] = constraints.index["Maths"]
+    assert constraints.evaluate(grid)[0] == 5
+
+
+def test_term_planner_keeps_hard_rules_when_moving_lost_periods():
+    constraints = ConstraintRegistry.from_config(RULES).compile(THEORY)
+    base = STANDARD_WEEK.empty_timetable("Library")
+    base["P1"] = "Maths"
+    planner = TermPlanner(base, THEORY, [], None, constraints)
+    # Monday's Maths has nowhere to go: every other day already has its one Maths period
+    derived = planner.derive_week(["Monday"])
+    assert derived["rescheduled"] == []
+    assert derived["unplaced"] == [{"subject": "Maths", "periods": 1}]
@@ -0,0 +1,25 @@
+"""The generation history keeps every name it sees and finds records by hash"""
+from timetable.history import HistoryStore
+from timetable.week import STANDARD_WEEK
+
+
+def test_store_widens_past_256_subjects():
+    history = HistoryStore()
+    run = history.start_run("greedy", [{"name": f"Subject {i}", "periods": 1} for i in range(300)], [])
+    timetable = STANDARD_WEEK.empty_timetable("Library")
+    timetable.loc["Friday", "P8"] = "Subject 299"
+    history.record_timetable(run, timetable, 50.0, 1)
+    assert history.decode(0).equals(timetable)
+
+
+def test_records_are_found_by_hash_after_older_ones_are_dropped():
+    history = HistoryStore()
+    run = history.start_run("greedy", [{"name": "Maths", "periods": 1}], [])
+    for day in STANDARD_WEEK.days:
+        timetable = STANDARD_WEEK.empty_timetable("Library")
+        timetable.loc[day, "P1"] = "Maths"
+        history.record_timetable(run, timetable, 50.0, 1)
+    friday = history.records()["Hash"].iloc[-1]
+    history.drop_oldest(2)
+    assert history.decode(history.find(friday)).loc["Friday", "P1"] == "Maths"
+    assert history.find(friday, runs=[run + 1]) is None
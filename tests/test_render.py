@@ -0,0 +1,15 @@
+"""Bulk rendering writes one file per document"""
+from timetable.render import render_batch, section_documents
+from timetable.week import STANDARD_WEEK
+
+
+def test_sections_with_colliding_file_names_get_their_own_files(tmp_path):
+    saved_timetables = {
+        label: {"timetable": STANDARD_WEEK.empty_timetable(subject), "section": "A"}
+        for label, subject in (("CSE V A/B", "Maths"), ("CSE V A B", "Physics"))
+    }
+    documents = section_documents(saved_timetables)
+    result = render_batch(documents, tmp_path, workers=1)
+    assert len(set(result["rendered"])) == 2
+    pages = [(tmp_path / f"{stem}.html").read_text(encoding="utf-8") for stem in result["rendered"]]
+    assert any("Maths" in page for page in pages) and any("Physics" in page for page in pages)
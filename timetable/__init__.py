@@ -0,0 +1,6 @@
+"""
+Scheduling engine for the Intelligent Timetable Scheduler.
+
+Everything in this package is independent of Streamlit so it can be used
+from the app, from scripts, and from worker processes.
+"""
@@ -0,0 +1,129 @@
+"""
+Timetable analytics on a long-format slot table.
+
+Every (section, day, period) cell becomes one row with its subject, teacher
+and session, so single-timetable charts and college-wide dashboards are the
+same grouped aggregations over more rows.
+"""
+import numpy as np
+import pandas as pd
+
+from timetable.teacher_index import NOT_TAUGHT
+from timetable.week import STANDARD_WEEK, SESSIONS
+
+SLOT_COLUMNS = ["section", "dept", "day", "period", "subject", "teacher", "session"]
+
+
+def timetable_cells(timetable, week=None):
+    """
+    Days x periods object array of a timetable's cells, cheap to keep next to
+    a stored timetable; in `week` order if given, else as the DataFrame is laid out
+    """
+    if week is not None:
+        return week.cells(timetable)
+    return timetable.to_numpy(dtype=object)
+
+
+def slot_table(timetables, week=STANDARD_WEEK):
+    """
+    Long-format table of (section, dept, day, period, subject, teacher, session)
+    plus a boolean "taught" column, from (section, timetable, subject_teachers[, dept]) tuples.
+    A timetable may be a DataFrame or its timetable_cells() array; converting
+    DataFrames dominates the cost, so stores should pass the cached arrays.
+    Day, period and session are ordered categoricals; every timetable has the shape of `week`.
+    """
+    sections, depts, subjects, teachers = [], [], [], []
+    count = 0
+    for section, timetable, subject_teachers, *rest in timetables:
+        if isinstance(timetable, pd.DataFrame):
+            timetable = timetable_cells(timetable, week)
+        cells = timetable.ravel()
+        subjects.append(cells)
+        teachers.append([subject_teachers.get(cell) for cell in cells])
+        sections.append(section)
+        depts.append(rest[0] if rest else "")
+        count += 1
+
+    cells_per_timetable = week.slot_count
+    day_codes = np.tile(week.slot_day, count)
+    period_codes = np.tile(week.slot_period, count)
+    subject = np.concatenate(subjects) if subjects else np.array([], dtype=object)
+
+    table = pd.DataFrame({
+        "section": np.repeat(np.array(sections, dtype=object), cells_per_timetable),
+        "dept": np.repeat(np.array(depts, dtype=object), cells_per_timetable),
+        "day": pd.Categorical.from_codes(day_codes, categories=week.days, ordered=True),
+        "period": pd.Categorical.from_codes(period_codes, categories=week.periods, ordered=True),
+        "subject": subject,
+        "teacher": np.concatenate(teachers) if teachers else np.array([], dtype=object),
+        "session": pd.Categorical.from_codes(np.tile(week.slot_session, count).astype(np.int8),
+                                             categories=SESSIONS, ordered=True),
+    })
+    table["taught"] = ~table["subject"].isin(NOT_TAUGHT) & table["subject"].notna()
+    return table
+
+
+def teacher_workload(slots):
+    """Periods per week for each teacher, busiest first"""
+    taught = slots[slots["taught"] & slots["teacher"].notna()]
+    return taught.groupby("teacher").size().sort_values(ascending=False, kind="stable")
+
+
+def subject_distribution(slots):
+    """FN/AN periods per subject in first-seen order, with total and imbalance"""
+    taught = slots[slots["taught"]]
+    counts = taught.groupby(["subject", "session"], sort=False, observed=False).size().unstack(fill_value=0)
+    counts = counts.reindex(taught["subject"].unique())
+    return pd.DataFrame({
+        "Subject": counts.index,
+        "FN Periods": counts["FN"].to_numpy(),
+        "AN Periods": counts["AN"].to_numpy(),
+        "Total": (counts["FN"] + counts["AN"]).to_numpy(),
+        "Balance": (counts["FN"] - counts["AN"]).abs().to_numpy(),
+    })
+
+
+def daily_load(slots):
+    """Taught periods per day (averaged over sections)"""
+    sections = max(slots["section"].nunique(), 1)
+    return slots[slots["taught"]].groupby("day", observed=False).size() / sections
+
+
+def session_load(slots, by=None):
+    """Taught periods per session, optionally per `by` column (e.g. "dept")"""
+    taught = slots[slots["taught"]]
+    if by is None:
+        return taught.groupby("session", observed=False).size()
+    return taught.groupby([by, "session"], observed=False).size().unstack(fill_value=0)
+
+
+def utilization(slots):
+    """(percentage of slots taught, taught slots, Library slots)"""
+    taught = int(slots["taught"].sum())
+    library = int((slots["subject"] == "Library").sum())
+    return (taught / len(slots) * 100 if len(slots) else 0.0), taught, library
+
+
+def idle_gaps(slots):
+    """
+    Per teacher: idle periods between their first and last class of a day,
+    summed over the week, with the worst single day. A period taught in two
+    sections at once counts once.
+    """
+    taught = slots[slots["taught"] & slots["teacher"].notna()]
+    if taught.empty:
+        return pd.DataFrame(columns=["Teacher", "Idle Periods", "Worst Day Idle", "Teaching Days"])
+    position = taught["period"].cat.codes
+    days = pd.DataFrame({"teacher": taught["teacher"].to_numpy(), "day": taught["day"].cat.codes.to_numpy(),
+                         "position": position.to_numpy()}).drop_duplicates()
+    per_day = days.groupby(["teacher", "day"]).agg(first=("position", "min"), last=("position", "max"),
+                                                   taught=("position", "size"))
+    per_day["idle"] = per_day["last"] - per_day["first"] + 1 - per_day["taught"]
+    per_teacher = per_day.groupby("teacher").agg(idle=("idle", "sum"), worst=("idle", "max"),
+                                                 days=("idle", "size"))
+    return pd.DataFrame({
+        "Teacher": per_teacher.index,
+        "Idle Periods": per_teacher["idle"].to_numpy(),
+        "Worst Day Idle": per_teacher["worst"].to_numpy(),
+        "Teaching Days": per_teacher["days"].to_numpy(),
+    }).sort_values("Idle Periods", ascending=False, kind="stable")
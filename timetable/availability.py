@@ -0,0 +1,113 @@
+"""
+Free-slot queries over occupancy bitmasks.
+
+Every section, room and teacher gets one integer with a bit per weekly slot
+(the week's slot number, 40 bits for the standard 5 x 8 week), set where it
+is busy. A common free period for any mix of them is the complement of the
+OR of their masks, so questions like "a free period for C1-C4 and
+Dr. Priya" never open a timetable.
+
+Rooms are the section's classroom for theory periods and the lab's floor
+for lab sessions. Library periods count as free.
+"""
+from timetable.teacher_index import NOT_TAUGHT
+from timetable.week import STANDARD_WEEK
+
+
+def all_slots(week=STANDARD_WEEK):
+    return (1 << week.slot_count) - 1
+
+
+ALL_SLOTS = all_slots()
+
+
+def slot_bit(day, period, week=STANDARD_WEEK):
+    return 1 << week.slot_of[(day, period)]
+
+
+def slots_mask(slots, week=STANDARD_WEEK):
+    """Mask with a bit set for each (day, period); slots outside the week are ignored"""
+    mask = 0
+    for slot in slots:
+        i = week.slot_of.get(tuple(slot))
+        if i is not None:
+            mask |= 1 << i
+    return mask
+
+
+def mask_slots(mask, week=STANDARD_WEEK):
+    """(day, period) for every set bit, in week order"""
+    return [slot for i, slot in enumerate(week.slots) if mask >> i & 1]
+
+
+def session_mask(day, session, week=STANDARD_WEEK):
+    return slots_mask(((day, period) for period in week.session_periods(session)), week)
+
+
+def day_mask(day, week=STANDARD_WEEK):
+    return slots_mask(((day, period) for period in week.periods), week)
+
+
+class AvailabilityIndex:
+    """Busy masks for sections, rooms and teachers over one week shape"""
+
+    def __init__(self, week=STANDARD_WEEK):
+        self.week = week
+        self.sections = {}
+        self.rooms = {}
+        self.teachers = {}
+
+    @classmethod
+    def from_store(cls, saved_timetables, teacher_free_periods=None, week=STANDARD_WEEK):
+        """
+        Build from a {section: {"timetable", "subject_teachers", "section", "lab_floors"}} store.
+        With `teacher_free_periods`, a teacher's preferred free periods count as busy.
+        """
+        index = cls(week)
+        for label, entry in saved_timetables.items():
+            index.add_section(label, entry["timetable"], entry["subject_teachers"],
+                              room=entry.get("section"), lab_floors=entry.get("lab_floors"))
+        for teacher, periods in (teacher_free_periods or {}).items():
+            index.teachers[teacher] = index.teachers.get(teacher, 0) | slots_mask(periods, week)
+        return index
+
+    def add_section(self, label, timetable, subject_teachers, room=None, lab_floors=None):
+        lab_floors = lab_floors or {}
+        busy = 0
+        for i, subject in enumerate(self.week.cells(timetable).ravel()):
+            if subject in NOT_TAUGHT:
+                continue
+            bit = 1 << i
+            busy |= bit
+            place = lab_floors.get(subject) or room
+            if place:
+                self.rooms[place] = self.rooms.get(place, 0) | bit
+            teacher = subject_teachers.get(subject)
+            if teacher:
+                self.teachers[teacher] = self.teachers.get(teacher, 0) | bit
+        self.sections[label] = busy
+
+    def busy_mask(self, sections=(), rooms=(), teachers=()):
+        """OR of the busy masks of everything named"""
+        mask = 0
+        for group, names in ((self.sections, sections), (self.rooms, rooms), (self.teachers, teachers)):
+            for name in names:
+                mask |= group.get(name, 0)
+        return mask
+
+    def common_free_slots(self, sections=(), rooms=(), teachers=(), within=None):
+        """Slots where every named section, room and teacher is free, limited to the `within` mask"""
+        within = all_slots(self.week) if within is None else within
+        return mask_slots(~self.busy_mask(sections, rooms, teachers) & within, self.week)
+
+    def free_at(self, group, day, period, names=None):
+        """Names in `group` ("sections", "rooms" or "teachers") free at one slot"""
+        masks = getattr(self, group)
+        bit = slot_bit(day, period, self.week)
+        return sorted(name for name in (names if names is not None else masks) if not masks.get(name, 0) & bit)
+
+    def open_for_session(self, group, day, session, names=None):
+        """Names in `group` free for a whole session (e.g. lab floors for a lab)"""
+        masks = getattr(self, group)
+        bits = session_mask(day, session, self.week)
+        return sorted(name for name in (names if names is not None else masks) if not masks.get(name, 0) & bits)
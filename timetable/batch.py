@@ -0,0 +1,84 @@
+"""
+Vectorized scoring of many candidate timetables at once.
+
+score_timetable_batch reproduces calculate_timetable_score exactly, but for
+an N x days x periods stack of encoded grids in a single NumPy pass.
+"""
+import numpy as np
+
+from timetable.encoding import SubjectTable, encode_timetable
+from timetable.week import STANDARD_WEEK
+
+
+def score_timetable_batch(grids, subject_table, constraints=None):
+    """
+    Score a stack of encoded timetables.
+
+    grids: integer array of shape (N, days, periods) holding subject IDs
+    subject_table: SubjectTable the grids were encoded with
+    constraints: optional compiled rules (timetable.constraints), evaluated per grid
+
+    Returns (scores, violation_counts, unallocated_periods), each of length N.
+    The unallocated count per subject is its weekly periods minus the periods
+    found in the grid, as reported by the generator.
+    """
+    grids = np.asarray(grids, dtype=np.int64)
+    if grids.ndim == 2:
+        grids = grids[None]
+    n, n_days, n_periods = grids.shape
+    n_subjects = len(subject_table)
+    theory_ids = subject_table.theory_ids
+    split = subject_table.week.split
+
+    # counts[n, subject, day] and forenoon counts, via one bincount each
+    base = (np.arange(n)[:, None, None] * n_subjects + grids) * n_days + np.arange(n_days)[None, :, None]
+    counts = np.bincount(base.ravel(), minlength=n * n_subjects * n_days).reshape(n, n_subjects, n_days)
+    fn_counts = np.bincount(base[:, :, :split].ravel(),
+                            minlength=n * n_subjects * n_days).reshape(n, n_subjects, n_days)
+    counts = counts[:, theory_ids]
+    fn_counts = fn_counts[:, theory_ids]
+
+    # 1. Allocation completeness (40 points)
+    needed = subject_table.periods[theory_ids]
+    total_periods_needed = int(needed.sum())
+    unallocated = np.maximum(needed[None, :] - counts.sum(axis=2), 0).sum(axis=1)
+    if total_periods_needed > 0:
+        allocation_score = ((total_periods_needed - unallocated) / total_periods_needed) * 40
+    else:
+        allocation_score = np.full(n, 40.0)
+
+    # 2. Distribution quality (30 points)
+    max_count = counts.max(axis=2, initial=0)
+    min_positive = np.where(counts > 0, counts, np.iinfo(np.int64).max).min(axis=2, initial=np.iinfo(np.int64).max)
+    min_positive = np.where(min_positive == np.iinfo(np.int64).max, 0, min_positive)
+    distribution_penalties = ((max_count - min_positive) > 1).sum(axis=1) * 5
+
+    # 3. Constraint satisfaction (30 points)
+    over_limit = (counts > 2).sum(axis=(1, 2))
+    session_split = ((counts == 2) & (fn_counts == 1)).sum(axis=(1, 2))
+    violations = over_limit + session_split
+
+    rule_penalties = np.zeros(n)
+    rule_weights = np.zeros(n)
+    if constraints is not None and constraints.active:
+        # Compiled rules index theory subjects from 0 and use -1 for everything else
+        theory_grids = np.where(np.isin(grids, theory_ids), grids - 1, -1)
+        for i in range(n):
+            soft, hard = constraints.evaluate(theory_grids[i])
+            rule_penalties[i] = soft
+            rule_weights[i] = sum(v["weight"] for v in hard)
+
+    distribution_score = np.maximum(0, 30 - distribution_penalties - rule_penalties)
+    constraint_score = np.maximum(0, 30 - violations * 5 - rule_weights)
+    scores = np.minimum(100, allocation_score + distribution_score + constraint_score)
+
+    return scores, violations, unallocated
+
+
+def score_timetables(timetables, confirmed_theory, confirmed_lab=(), constraints=None, week=STANDARD_WEEK):
+    """Convenience wrapper: encode a list of timetable DataFrames and batch-score them"""
+    if not timetables:
+        return np.zeros(0), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    subject_table = SubjectTable(confirmed_theory, confirmed_lab, week)
+    grids = np.stack([encode_timetable(t, subject_table) for t in timetables])
+    return score_timetable_batch(grids, subject_table, constraints)
@@ -0,0 +1,66 @@
+"""
+Shared read-only catalog of predefined subjects and teachers.
+
+The regulation / department / semester subject lists and the department
+teacher lists are built into one Catalog per server process and never
+modified. Sessions copy only what they edit: a session's predefined subject
+records keep the catalog entry's id and share its name and code strings, so
+a hundred open sessions hold one copy of the catalog between them.
+"""
+from dataclasses import dataclass
+from types import MappingProxyType
+
+from timetable.subjects import LAB, THEORY
+
+LAB_CREDIT = 2
+
+
+@dataclass(frozen=True, slots=True)
+class CatalogSubject:
+    """One predefined subject; a lab takes a whole session, so it has no period count"""
+    id: int
+    kind: str
+    name: str
+    code: str
+    credit: int
+    periods: int | None = None
+
+
+class Catalog:
+    """Predefined subjects by (regulation, dept, semester) and teachers by (dept, semester)"""
+
+    def __init__(self, predefined_subjects, teachers_by_dept_semester):
+        entries = []
+        offerings = {}
+        for regulation, depts in predefined_subjects.items():
+            for dept, semesters in depts.items():
+                for semester, kinds in semesters.items():
+                    start = len(entries)
+                    for sub in kinds.get("theory", ()):
+                        entries.append(CatalogSubject(len(entries), THEORY, sub["name"], sub["code"],
+                                                      sub["credit"], sub["periods"]))
+                    for lab in kinds.get("lab", ()):
+                        entries.append(CatalogSubject(len(entries), LAB, lab["name"], lab["code"],
+                                                      lab.get("credit", LAB_CREDIT)))
+                    offerings[(regulation, dept, semester)] = tuple(entries[start:])
+        self.entries = tuple(entries)
+        self._offerings = MappingProxyType(offerings)
+        self._teachers = MappingProxyType({
+            (dept, semester): tuple(names)
+            for dept, semesters in teachers_by_dept_semester.items()
+            for semester, names in semesters.items()
+        })
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __getitem__(self, catalog_id):
+        return self.entries[catalog_id]
+
+    def subjects(self, regulation, dept, semester):
+        """Predefined subjects of one semester, theory first (empty if none are defined)"""
+        return self._offerings.get((regulation, dept, semester), ())
+
+    def teachers(self, dept, semester):
+        """Teachers of one department and semester (empty if none are defined)"""
+        return self._teachers.get((dept, semester), ())
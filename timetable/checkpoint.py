@@ -0,0 +1,157 @@
+"""
+Checkpoint and resume for long optimization runs.
+
+An engine given a Checkpoint saves its state every `interval` seconds, at a
+point between batches or migrations where the state is complete: the
+best-so-far pool as encoded grids, the RNG state, engine counters or
+populations, and the elapsed budget. A file is one compressed .npz, with
+arrays stored as-is and everything else as a JSON header, written to a
+temporary file and renamed so a crash never leaves half a checkpoint.
+
+Starting the same engine on the same instance with the same checkpoint path
+resumes from the saved state; iteration and generation budgets then continue
+exactly as if the run had not stopped (time-based stops count the elapsed
+budget but are timing dependent as always). A checkpoint is removed once its
+run finishes. The instance fingerprint guards against resuming a checkpoint
+taken for different subjects, labs, preferences or rules. Checkpoints of runs
+nobody resumed are removed by prune_checkpoints once they are KEEP_FOR old.
+"""
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+from timetable.core import timetable_hash
+from timetable.encoding import encode_timetable, decode_timetable
+from timetable.week import STANDARD_WEEK
+
+FORMAT_VERSION = 1
+# Seconds an unfinished run's checkpoint is kept for resuming
+KEEP_FOR = 7 * 24 * 3600
+
+
+def instance_fingerprint(confirmed_theory, confirmed_lab, teacher_free_periods=None, constraints=None,
+                         week=STANDARD_WEEK):
+    """Hash of everything that changes what an engine searches"""
+    teachers = {s.get("teacher") for s in list(confirmed_theory) + list(confirmed_lab)}
+    description = json.dumps({
+        "week": week.spec,
+        "theory": [(s["name"], s["periods"], s.get("teacher")) for s in confirmed_theory],
+        "labs": [(l["name"], l["day"], l["session"], l.get("teacher")) for l in confirmed_lab],
+        "free": {t: sorted(map(list, periods)) for t, periods in sorted((teacher_free_periods or {}).items())
+                 if t in teachers},
+    }, sort_keys=True, default=str)
+    digest = hashlib.blake2b(description.encode("utf-8"), digest_size=16)
+    if constraints is not None and constraints.active:
+        for table in (constraints.slot_penalty, constraints.slot_forbidden, constraints.pair_penalty,
+                      constraints.pair_forbidden, constraints.day_penalty, constraints.day_forbidden):
+            digest.update(np.ascontiguousarray(table).tobytes())
+        digest.update(repr(sorted(constraints.run_limits.items())).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class Checkpoint:
+    """One checkpoint file for one run"""
+
+    def __init__(self, path, interval=30.0):
+        self.path = path
+        self.interval = interval
+        self.last_saved = time.monotonic()
+
+    def due(self):
+        """True once `interval` seconds have passed since the last save"""
+        return time.monotonic() - self.last_saved >= self.interval
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def save(self, engine, fingerprint, meta, arrays):
+        """Atomically replace the checkpoint with `meta` (JSON-able) and named arrays"""
+        header = json.dumps({"version": FORMAT_VERSION, "engine": engine, "fingerprint": fingerprint,
+                             "saved_at": time.time(), "meta": meta})
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "wb") as f:
+            np.savez_compressed(f, header=np.array(header), **arrays)
+        os.replace(temporary, self.path)
+        self.last_saved = time.monotonic()
+
+    def peek(self):
+        """Header of the saved checkpoint (engine, fingerprint, saved_at, meta), or None"""
+        if not self.exists():
+            return None
+        with np.load(self.path) as data:
+            return json.loads(str(data["header"]))
+
+    def load(self, engine, fingerprint):
+        """(meta, arrays) of a checkpoint for this engine and instance, or None"""
+        if not self.exists():
+            return None
+        with np.load(self.path) as data:
+            header = json.loads(str(data["header"]))
+            if header["version"] != FORMAT_VERSION or header["engine"] != engine \
+                    or header["fingerprint"] != fingerprint:
+                return None
+            arrays = {name: data[name] for name in data.files if name != "header"}
+        return header["meta"], arrays
+
+    def clear(self):
+        if self.exists():
+            os.remove(self.path)
+
+
+def prune_checkpoints(directory, keep_for=KEEP_FOR):
+    """Delete checkpoint files in `directory` last saved more than `keep_for` seconds ago; returns how many"""
+    if not os.path.isdir(directory):
+        return 0
+    cutoff = time.time() - keep_for
+    removed = 0
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if not name.endswith((".npz", ".npz.tmp")):
+            continue
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except FileNotFoundError:
+            # Another session pruned or finished it first
+            pass
+    return removed
+
+
+def pool_state(pool, subject_table):
+    """(meta, arrays) for a TimetablePool's entries"""
+    grids = np.stack([encode_timetable(e["timetable"], subject_table) for e in pool.entries]).astype(np.uint8) \
+        if pool.entries else np.zeros((0, 0, 0), dtype=np.uint8)
+    meta = [{"score": e["score"], "seed": e["seed"], "unallocated": e["unallocated"]} for e in pool.entries]
+    return meta, {"pool_grids": grids}
+
+
+def restore_pool(pool, meta, arrays, subject_table):
+    """Refill an empty TimetablePool from pool_state output, in saved order"""
+    for entry, grid in zip(meta, arrays["pool_grids"]):
+        timetable = decode_timetable(grid.astype(np.int64), subject_table)
+        pool.entries.append({
+            "timetable": timetable,
+            "unallocated": entry["unallocated"],
+            "score": entry["score"],
+            "seed": entry["seed"],
+            "hash": timetable_hash(timetable),
+        })
+        pool._hashes.add(pool.entries[-1]["hash"])
+
+
+def random_state_to_json(state):
+    """random.getstate() as JSON-able lists"""
+    version, internal, gauss = state
+    return [version, list(internal), gauss]
+
+
+def random_state_from_json(state):
+    version, internal, gauss = state
+    return version, tuple(internal), gauss
+
@@ -0,0 +1,156 @@
+"""
+Columnar export and import of the timetable store (optional dependency).
+
+All stored timetables are written as one long table, one row per
+(section, day, period), with every string column dictionary-encoded, as
+Parquet or an Arrow IPC file. Importing reshapes the rows straight back into
+day x period grids without touching spreadsheets. The week shape travels in
+the file's metadata.
+
+Install with `pip install pyarrow`. Without it, columnar_available() is
+False and the export/import functions raise ImportError.
+"""
+import io
+
+import numpy as np
+import pandas as pd
+
+from timetable.analytics import slot_table
+from timetable.week import STANDARD_WEEK, WEEKDAYS, Week
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+FORMAT_VERSION = "1"
+SECTION_COLUMNS = ["dept", "regulation", "semester", "room"]
+STRING_COLUMNS = ["section", *SECTION_COLUMNS, "day", "period", "subject", "teacher", "session", "lab_floor"]
+
+
+def columnar_available():
+    """True if pyarrow can be used"""
+    return pa is not None
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("Columnar export needs pyarrow: pip install pyarrow")
+
+
+def store_to_arrow(saved_timetables, week=STANDARD_WEEK):
+    """Long-format Arrow table of every stored timetable (all of `week`'s shape), strings dictionary-encoded"""
+    _require_pyarrow()
+    labels = list(saved_timetables)
+    slots = slot_table([
+        (label, entry.get("cells", entry["timetable"]), entry["subject_teachers"], entry.get("dept", ""))
+        for label, entry in saved_timetables.items()
+    ], week)
+    cells = week.slot_count
+    for column, key in (("regulation", "regulation"), ("semester", "semester"), ("room", "section")):
+        slots[column] = np.repeat(np.array([saved_timetables[l].get(key, "") for l in labels], dtype=object), cells)
+    slots["lab_floor"] = [saved_timetables[section].get("lab_floors", {}).get(subject)
+                          for section, subject in zip(slots["section"], slots["subject"])]
+    slots["score"] = np.repeat(np.array([saved_timetables[l].get("score", 0.0) for l in labels], dtype=float), cells)
+
+    arrays = {}
+    for column in STRING_COLUMNS:
+        values = pa.array(slots[column].astype(object).to_numpy(), type=pa.string(), from_pandas=True)
+        arrays[column] = values.dictionary_encode()
+    arrays["score"] = pa.array(slots["score"].to_numpy(), type=pa.float64())
+    return pa.table(arrays).replace_schema_metadata({
+        "timetable_format": FORMAT_VERSION,
+        "days": ",".join(week.days),
+        "periods": ",".join(week.periods),
+        "forenoon": str(week.split),
+    })
+
+
+def export_store(saved_timetables, fmt="parquet", week=STANDARD_WEEK):
+    """Stored timetables as Parquet ("parquet") or Arrow IPC ("arrow") bytes"""
+    table = store_to_arrow(saved_timetables, week)
+    sink = io.BytesIO()
+    if fmt == "parquet":
+        pq.write_table(table, sink, use_dictionary=True, compression="zstd")
+    elif fmt == "arrow":
+        options = pa.ipc.IpcWriteOptions(compression="zstd")
+        with pa.ipc.new_file(sink, table.schema, options=options) as writer:
+            writer.write_table(table)
+    else:
+        raise ValueError(f"Unknown columnar format: {fmt}")
+    return sink.getvalue()
+
+
+def read_table(data):
+    """Arrow table from Parquet or Arrow IPC bytes (detected from the file magic)"""
+    _require_pyarrow()
+    if data[:4] == b"PAR1":
+        return pq.read_table(io.BytesIO(data))
+    if data[:6] == b"ARROW1":
+        return pa.ipc.open_file(pa.BufferReader(data)).read_all()
+    raise ValueError("Not a Parquet or Arrow file")
+
+
+def file_week(metadata):
+    """Week of an exported file, from its schema metadata"""
+    days = metadata.get(b"days", b"").decode().split(",")
+    periods = metadata.get(b"periods", b"").decode().split(",")
+    forenoon = metadata.get(b"forenoon")
+    try:
+        week = Week(len(days), len(periods), int(forenoon) if forenoon else None)
+    except ValueError:
+        week = None
+    if week is None or days != WEEKDAYS[:len(days)] or periods != week.periods:
+        raise ValueError("The file does not describe a supported week shape")
+    return week
+
+
+def import_store(data):
+    """
+    Rebuild a {section: entry} timetable store from export_store bytes.
+    Entries have the same keys as ones saved from the app, including the "week".
+    """
+    table = read_table(data)
+    week = file_week(table.schema.metadata or {})
+
+    frame = table.to_pandas()
+    day_codes = pd.Categorical(frame["day"].astype(object), categories=week.days).codes
+    period_codes = pd.Categorical(frame["period"].astype(object), categories=week.periods).codes
+    if (day_codes < 0).any() or (period_codes < 0).any():
+        raise ValueError("The file has unknown days or periods")
+
+    labels, section_codes = np.unique(frame["section"].astype(object).to_numpy(), return_inverse=True)
+    order = np.lexsort((period_codes, day_codes, section_codes))
+    cells = week.slot_count
+    if len(order) != len(labels) * cells:
+        raise ValueError("Every section needs exactly one row per day and period")
+    grids = frame["subject"].astype(object).to_numpy()[order].reshape(len(labels), *week.shape)
+
+    subject_teachers = {label: {} for label in labels}
+    lab_floors = {label: {} for label in labels}
+    for column, mapping in (("teacher", subject_teachers), ("lab_floor", lab_floors)):
+        pairs = frame[["section", "subject", column]].astype(object).dropna().drop_duplicates()
+        for section, subject, value in pairs.itertuples(index=False):
+            mapping[section][subject] = value
+
+    section_values = {column: frame[column].astype(object).to_numpy()[order[::cells]]
+                      for column in (*SECTION_COLUMNS, "score")}
+    day_index, period_index = pd.Index(week.days), pd.Index(week.periods)
+    store = {}
+    for i, label in enumerate(labels):
+        store[label] = {
+            "dept": section_values["dept"][i],
+            "regulation": section_values["regulation"][i],
+            "semester": section_values["semester"][i],
+            "section": section_values["room"][i],
+            "timetable": pd.DataFrame(grids[i], index=day_index, columns=period_index, dtype=object),
+            "subject_teachers": subject_teachers[label],
+            "lab_floors": lab_floors[label],
+            "cells": grids[i],
+            "score": float(section_values["score"][i]),
+            "week": week,
+            "saved_at": "imported",
+        }
+    return store
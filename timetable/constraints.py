@@ -0,0 +1,403 @@
+"""
+Pluggable scheduling rules.
+
+Local rules are declared once in a ConstraintRegistry and compiled against
+the confirmed subjects into dense penalty tables:
+
+- slot table  (subject, day, period)       -> cost of placing a subject in a slot
+- pair table  (subject, subject)            -> cost of two subjects in adjacent periods
+- day table   (subject, periods on a day)   -> cost of a subject's daily count
+- run limits  (teacher)                     -> max consecutive theory periods
+
+The generator looks up the incremental cost of a single placement, and the
+scorer evaluates a whole grid, without rescanning the timetable once per rule.
+"""
+import numpy as np
+
+from timetable.week import STANDARD_WEEK
+
+HARD = "hard"
+SOFT = "soft"
+
+EMPTY = -1
+
+
+def _session_bounds(week):
+    """(start, end) period indices of each session, used for adjacency"""
+    return [(0, week.split), (week.split, len(week.periods))]
+
+
+class Constraint:
+    """
+    Base class for a declared rule.
+    Hard rules are never violated by the generator; soft rules only steer it.
+    `weight` is the score penalty for each violation.
+    """
+
+    def __init__(self, name, weight=5, kind=SOFT):
+        if kind not in (HARD, SOFT):
+            raise ValueError(f"Constraint kind must be '{HARD}' or '{SOFT}'")
+        self.name = name
+        self.weight = weight
+        self.kind = kind
+
+    def compile(self, tables):
+        raise NotImplementedError
+
+    def to_config(self):
+        raise NotImplementedError
+
+
+class AvoidPeriods(Constraint):
+    """
+    Keep a subject out of the given periods (optionally only on some days).
+    Days and periods the week does not have are ignored.
+    """
+    rule_type = "avoid_periods"
+
+    def __init__(self, name, subject, periods, days=None, weight=5, kind=SOFT):
+        super().__init__(name, weight, kind)
+        self.subject = subject
+        self.periods = list(periods)
+        self.days = list(days) if days else None
+
+    def compile(self, tables):
+        s = tables.index.get(self.subject)
+        if s is None:
+            return
+        week = tables.week
+        for day in (self.days or week.days):
+            for period in self.periods:
+                if day in week.day_index and period in week.period_index:
+                    tables.add_slot(self, s, week.day_index[day], week.period_index[period])
+
+    def to_config(self):
+        return {"type": self.rule_type, "name": self.name, "subject": self.subject,
+                "periods": self.periods, "days": self.days, "weight": self.weight, "kind": self.kind}
+
+
+class AvoidAdjacent(Constraint):
+    """Do not schedule two subjects back-to-back within a session"""
+    rule_type = "avoid_adjacent"
+
+    def __init__(self, name, subject_a, subject_b, weight=5, kind=SOFT):
+        super().__init__(name, weight, kind)
+        self.subject_a = subject_a
+        self.subject_b = subject_b
+
+    def compile(self, tables):
+        a = tables.index.get(self.subject_a)
+        b = tables.index.get(self.subject_b)
+        if a is None or b is None:
+            return
+        tables.add_pair(self, a, b)
+        if a != b:
+            tables.add_pair(self, b, a)
+
+    def to_config(self):
+        return {"type": self.rule_type, "name": self.name, "subject_a": self.subject_a,
+                "subject_b": self.subject_b, "weight": self.weight, "kind": self.kind}
+
+
+class SpreadAcrossDays(Constraint):
+    """Limit how many periods of a subject land on the same day"""
+    rule_type = "spread_across_days"
+
+    def __init__(self, name, subject, max_per_day=1, weight=5, kind=SOFT):
+        super().__init__(name, weight, kind)
+        self.subject = subject
+        self.max_per_day = max_per_day
+
+    def compile(self, tables):
+        s = tables.index.get(self.subject)
+        if s is None:
+            return
+        tables.add_day_limit(self, s, self.max_per_day)
+
+    def to_config(self):
+        return {"type": self.rule_type, "name": self.name, "subject": self.subject,
+                "max_per_day": self.max_per_day, "weight": self.weight, "kind": self.kind}
+
+
+class MaxConsecutive(Constraint):
+    """Limit a teacher's consecutive theory periods within a session"""
+    rule_type = "max_consecutive"
+
+    def __init__(self, name, teacher, limit=2, weight=5, kind=SOFT):
+        super().__init__(name, weight, kind)
+        self.teacher = teacher
+        self.limit = limit
+
+    def compile(self, tables):
+        if self.teacher in tables.teacher_index:
+            tables.add_run_limit(self, tables.teacher_index[self.teacher], self.limit)
+
+    def to_config(self):
+        return {"type": self.rule_type, "name": self.name, "teacher": self.teacher,
+                "limit": self.limit, "weight": self.weight, "kind": self.kind}
+
+
+RULE_TYPES = {
+    cls.rule_type: cls
+    for cls in (AvoidPeriods, AvoidAdjacent, SpreadAcrossDays, MaxConsecutive)
+}
+
+
+class ConstraintRegistry:
+    """Named collection of declared rules"""
+
+    def __init__(self, constraints=()):
+        self._constraints = {}
+        for constraint in constraints:
+            self.register(constraint)
+
+    def __iter__(self):
+        return iter(self._constraints.values())
+
+    def __len__(self):
+        return len(self._constraints)
+
+    def register(self, constraint):
+        if constraint.name in self._constraints:
+            raise ValueError(f"A rule named '{constraint.name}' is already registered")
+        self._constraints[constraint.name] = constraint
+        return constraint
+
+    def unregister(self, name):
+        self._constraints.pop(name, None)
+
+    @classmethod
+    def from_config(cls, rules):
+        """Build a registry from plain dicts (as stored in session state)"""
+        registry = cls()
+        for rule in rules:
+            rule = dict(rule)
+            rule_cls = RULE_TYPES.get(rule.pop("type", None))
+            if rule_cls is None:
+                raise ValueError(f"Unknown rule type in {rule}")
+            registry.register(rule_cls(**rule))
+        return registry
+
+    def to_config(self):
+        return [c.to_config() for c in self]
+
+    def compile(self, confirmed_theory, week=STANDARD_WEEK):
+        """Compile every rule against the confirmed theory subjects, for grids of `week`"""
+        tables = CompiledConstraints(confirmed_theory, week)
+        for constraint in self:
+            constraint.compile(tables)
+        return tables
+
+
+class CompiledConstraints:
+    """Penalty tables for one set of theory subjects"""
+
+    def __init__(self, confirmed_theory, week=STANDARD_WEEK):
+        self.week = week
+        self.subjects = [s["name"] for s in confirmed_theory]
+        self.index = {name: i for i, name in enumerate(self.subjects)}
+
+        teachers = sorted({s.get("teacher") for s in confirmed_theory if s.get("teacher")})
+        self.teachers = teachers
+        self.teacher_index = {t: i for i, t in enumerate(teachers)}
+        self.subject_teacher = np.array(
+            [self.teacher_index.get(s.get("teacher"), EMPTY) for s in confirmed_theory], dtype=np.int64)
+
+        n_subjects = len(self.subjects)
+        n_days, n_periods = week.shape
+
+        self.slot_penalty = np.zeros((n_subjects, n_days, n_periods))
+        self.slot_forbidden = np.zeros((n_subjects, n_days, n_periods), dtype=bool)
+        self.pair_penalty = np.zeros((n_subjects, n_subjects))
+        self.pair_forbidden = np.zeros((n_subjects, n_subjects), dtype=bool)
+        # Cumulative penalty / hard flag for having k periods of a subject on one day
+        self.day_penalty = np.zeros((n_subjects, n_periods + 1))
+        self.day_forbidden = np.zeros((n_subjects, n_periods + 1), dtype=bool)
+        # teacher -> list of (limit, weight, kind, rule name)
+        self.run_limits = {}
+
+        # Rule that owns each hard table entry, for violation messages
+        self._hard_rules = {}
+
+        # Adjacent period pairs that share a session
+        self.adjacent_pairs = [(p, p + 1) for start, end in _session_bounds(week) for p in range(start, end - 1)]
+
+    @property
+    def active(self):
+        return bool(self.slot_penalty.any() or self.slot_forbidden.any() or
+                    self.pair_penalty.any() or self.pair_forbidden.any() or
+                    self.day_penalty.any() or self.day_forbidden.any() or self.run_limits)
+
+    # -- compilation helpers -------------------------------------------------
+    def add_slot(self, constraint, s, d, p):
+        if constraint.kind == HARD:
+            self.slot_forbidden[s, d, p] = True
+            self._hard_rules[("slot", s, d, p)] = constraint
+        else:
+            self.slot_penalty[s, d, p] += constraint.weight
+
+    def add_pair(self, constraint, a, b):
+        if constraint.kind == HARD:
+            self.pair_forbidden[a, b] = True
+            self._hard_rules[("pair", a, b)] = constraint
+        else:
+            self.pair_penalty[a, b] += constraint.weight
+
+    def add_day_limit(self, constraint, s, max_per_day):
+        excess = np.maximum(np.arange(len(self.week.periods) + 1) - max_per_day, 0)
+        if constraint.kind == HARD:
+            self.day_forbidden[s] |= excess > 0
+            # Name the strictest hard limit: it is the one any violation breaks
+            owner = self._hard_rules.get(("day", s))
+            if owner is None or max_per_day < owner.max_per_day:
+                self._hard_rules[("day", s)] = constraint
+        else:
+            self.day_penalty[s] += excess * constraint.weight
+
+    def add_run_limit(self, constraint, teacher, limit):
+        self.run_limits.setdefault(teacher, []).append(
+            (limit, constraint.weight, constraint.kind, constraint.name))
+
+    # -- grids ---------------------------------------------------------------
+    def grid_from_timetable(self, timetable):
+        """Subject index per slot (EMPTY for library, labs and blanks)"""
+        cells = self.week.cells(timetable).ravel()
+        return np.array([self.index.get(cell, EMPTY) for cell in cells], dtype=np.int64).reshape(self.week.shape)
+
+    def empty_grid(self):
+        return np.full(self.week.shape, EMPTY, dtype=np.int64)
+
+    def _session_of(self, p):
+        for start, end in _session_bounds(self.week):
+            if start <= p < end:
+                return start, end
+
+    def _run_through(self, grid, d, p, teacher):
+        """Lengths of the same-teacher runs immediately left and right of (d, p)"""
+        start, end = self._session_of(p)
+        left = 0
+        q = p - 1
+        while q >= start and grid[d, q] != EMPTY and self.subject_teacher[grid[d, q]] == teacher:
+            left += 1
+            q -= 1
+        right = 0
+        q = p + 1
+        while q < end and grid[d, q] != EMPTY and self.subject_teacher[grid[d, q]] == teacher:
+            right += 1
+            q += 1
+        return left, right
+
+    # -- incremental evaluation ----------------------------------------------
+    def placement_cost(self, grid, s, d, p):
+        """
+        Change in soft penalty from placing subject `s` at (d, p) on `grid`,
+        or None if the placement breaks a hard rule.
+        """
+        if self.slot_forbidden[s, d, p]:
+            return None
+        cost = self.slot_penalty[s, d, p]
+
+        start, end = self._session_of(p)
+        if p > start and grid[d, p - 1] != EMPTY:
+            a = grid[d, p - 1]
+            if self.pair_forbidden[a, s]:
+                return None
+            cost += self.pair_penalty[a, s]
+        if p + 1 < end and grid[d, p + 1] != EMPTY:
+            b = grid[d, p + 1]
+            if self.pair_forbidden[s, b]:
+                return None
+            cost += self.pair_penalty[s, b]
+
+        count = int((grid[d] == s).sum())
+        if self.day_forbidden[s, count + 1]:
+            return None
+        cost += self.day_penalty[s, count + 1] - self.day_penalty[s, count]
+
+        teacher = self.subject_teacher[s]
+        if teacher in self.run_limits:
+            left, right = self._run_through(grid, d, p, teacher)
+            for limit, weight, kind, _ in self.run_limits[teacher]:
+                before = max(0, left - limit) + max(0, right - limit)
+                after = max(0, left + right + 1 - limit)
+                if after > before:
+                    if kind == HARD:
+                        return None
+                    cost += (after - before) * weight
+        return float(cost)
+
+    # -- full evaluation -----------------------------------------------------
+    def evaluate(self, grid):
+        """Return (soft_penalty, hard_violations) for a whole grid"""
+        soft = 0.0
+        violations = []
+        day_names, period_names = self.week.days, self.week.periods
+        placed = grid != EMPTY
+        days, periods = np.nonzero(placed)
+        subjects = grid[days, periods]
+
+        # Slot table
+        soft += float(self.slot_penalty[subjects, days, periods].sum())
+        hits = self.slot_forbidden[subjects, days, periods]
+        for s, d, p in zip(subjects[hits], days[hits], periods[hits]):
+            rule = self._hard_rules[("slot", s, d, p)]
+            violations.append(self._violation(rule, self.subjects[s], day_names[d],
+                                              f"{self.subjects[s]} on {day_names[d]} {period_names[p]} breaks '{rule.name}'"))
+
+        # Pair table
+        for p, q in self.adjacent_pairs:
+            both = placed[:, p] & placed[:, q]
+            if not both.any():
+                continue
+            a = grid[both, p]
+            b = grid[both, q]
+            soft += float(self.pair_penalty[a, b].sum())
+            for d, x, y in zip(np.nonzero(both)[0], a, b):
+                if self.pair_forbidden[x, y]:
+                    rule = self._hard_rules[("pair", x, y)]
+                    violations.append(self._violation(
+                        rule, self.subjects[y], day_names[d],
+                        f"{self.subjects[x]} and {self.subjects[y]} back-to-back on {day_names[d]} breaks '{rule.name}'"))
+
+        # Day table
+        n_subjects = len(self.subjects)
+        if n_subjects:
+            counts = np.zeros((n_subjects, len(day_names)), dtype=np.int64)
+            np.add.at(counts, (subjects, days), 1)
+            rows = np.arange(n_subjects)[:, None]
+            soft += float(self.day_penalty[rows, counts].sum())
+            for s, d in zip(*np.nonzero(self.day_forbidden[rows, counts])):
+                rule = self._hard_rules[("day", s)]
+                violations.append(self._violation(
+                    rule, self.subjects[s], day_names[d],
+                    f"{self.subjects[s]} has {counts[s, d]} periods on {day_names[d]}, breaks '{rule.name}'"))
+
+        # Run limits
+        if self.run_limits:
+            teacher_grid = np.where(placed, self.subject_teacher[np.where(placed, grid, 0)], EMPTY)
+            for teacher, limits in self.run_limits.items():
+                for d in range(len(day_names)):
+                    for start, end in _session_bounds(self.week):
+                        run = 0
+                        for p in range(start, end + 1):
+                            if p < end and teacher_grid[d, p] == teacher:
+                                run += 1
+                                continue
+                            for limit, weight, kind, name in limits:
+                                if run > limit:
+                                    if kind == HARD:
+                                        violations.append({
+                                            "type": "rule", "rule": name, "weight": weight,
+                                            "subject": None, "day": day_names[d],
+                                            "message": f"{self.teachers[teacher]} teaches {run} consecutive "
+                                                       f"periods on {day_names[d]}, breaks '{name}'"
+                                        })
+                                    else:
+                                        soft += (run - limit) * weight
+                            run = 0
+
+        return soft, violations
+
+    def _violation(self, rule, subject, day, message):
+        return {"type": "rule", "rule": rule.name, "weight": rule.weight,
+                "subject": subject, "day": day, "message": message}
@@ -0,0 +1,533 @@
+import hashlib
+import random
+import time
+from collections import defaultdict, deque
+
+import numpy as np
+import pandas as pd
+
+from timetable.week import STANDARD_WEEK
+
+# -------------------------------------------------
+# CONSTRAINT VALIDATION
+# -------------------------------------------------
+def validate_constraints(timetable, confirmed_theory, week=STANDARD_WEEK):
+    """Validate all constraints and return violations"""
+    violations = []
+    cells = week.cells(timetable)
+    # subject -> (periods per day, forenoon periods per day)
+    counts = {}
+    for subject in confirmed_theory:
+        placed = cells == subject["name"]
+        counts[subject["name"]] = (placed.sum(axis=1), placed[:, week.session_masks["FN"]].sum(axis=1))
+
+    # Check max 2 periods per subject per day
+    for subject in confirmed_theory:
+        subject_name = subject["name"]
+        for d in np.flatnonzero(counts[subject_name][0] > 2):
+            count = int(counts[subject_name][0][d])
+            day = week.days[d]
+            violations.append({
+                "type": "max_per_day",
+                "subject": subject_name,
+                "day": day,
+                "count": count,
+                "message": f"{subject_name} appears {count} times on {day} (max: 2)"
+            })
+
+    # Check same session for 2 periods
+    for subject in confirmed_theory:
+        subject_name = subject["name"]
+        per_day, forenoon = counts[subject_name]
+        for d in np.flatnonzero((per_day == 2) & (forenoon == 1)):
+            day = week.days[d]
+            violations.append({
+                "type": "session_split",
+                "subject": subject_name,
+                "day": day,
+                "message": f"{subject_name} on {day} spans both sessions"
+            })
+
+    return violations
+
+
+def find_lab_conflicts(confirmed_lab):
+    """Pairs of labs scheduled on the same day and session"""
+    lab_conflicts = []
+    for i, lab1 in enumerate(confirmed_lab):
+        for j, lab2 in enumerate(confirmed_lab):
+            if i < j:
+                if lab1["day"] == lab2["day"] and lab1["session"] == lab2["session"]:
+                    lab_conflicts.append((lab1["name"], lab2["name"], lab1["day"], lab1["session"]))
+    return lab_conflicts
+
+
+# -------------------------------------------------
+# TIMETABLE POOL (TOP-K DISTINCT RESULTS)
+# -------------------------------------------------
+def timetable_hash(timetable):
+    """Stable content hash of a timetable grid"""
+    cells = "\x1f".join(str(cell) for cell in timetable.values.ravel())
+    return hashlib.sha1(cells.encode("utf-8")).hexdigest()
+
+
+def timetable_distance(timetable_a, timetable_b):
+    """Number of slots whose contents differ between two timetables (Hamming distance)"""
+    return int((timetable_a.values != timetable_b.values).sum())
+
+
+class TimetablePool:
+    """
+    Bounded pool of the best distinct timetables seen during optimization.
+
+    Candidates are deduplicated by grid hash. A candidate that is closer than
+    `min_distance` slots to an existing entry only gets in if it beats every
+    such neighbour, which it then replaces. Entries are kept best-first.
+    """
+
+    def __init__(self, size=5, min_distance=4):
+        self.size = size
+        self.min_distance = min_distance
+        self.entries = []
+        self._hashes = set()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def best(self):
+        return self.entries[0] if self.entries else None
+
+    def offer(self, timetable, unallocated, score, seed):
+        """Try to add a candidate; returns True if it was kept"""
+        grid_hash = timetable_hash(timetable)
+        if grid_hash in self._hashes:
+            return False
+
+        neighbours = [e for e in self.entries
+                      if timetable_distance(e["timetable"], timetable) < self.min_distance]
+        if any(e["score"] >= score for e in neighbours):
+            return False
+        if len(self.entries) - len(neighbours) >= self.size and self.entries[-1]["score"] >= score:
+            return False
+
+        # By identity: comparing entries would compare their DataFrames
+        for entry in neighbours:
+            self._hashes.discard(entry["hash"])
+        self.entries = [e for e in self.entries if not any(e is n for n in neighbours)]
+
+        entry = {
+            "timetable": timetable.copy(),
+            "unallocated": list(unallocated) if unallocated else [],
+            "score": score,
+            "seed": seed,
+            "hash": grid_hash,
+        }
+        position = len(self.entries)
+        for i, existing in enumerate(self.entries):
+            if score > existing["score"]:
+                position = i
+                break
+        self.entries.insert(position, entry)
+        self._hashes.add(grid_hash)
+
+        while len(self.entries) > self.size:
+            dropped = self.entries.pop()
+            self._hashes.discard(dropped["hash"])
+        return True
+
+    def is_settled(self, target_score=95, require_complete=True):
+        """True once the pool is full and every entry meets the target score (and is complete)"""
+        return (len(self.entries) >= self.size and
+                all(e["score"] >= target_score and not (require_complete and e["unallocated"])
+                    for e in self.entries))
+
+
+# -------------------------------------------------
+# SCORE UPPER BOUND
+# -------------------------------------------------
+def score_upper_bound(confirmed_theory, confirmed_lab, teacher_free_periods=None, week=STANDARD_WEEK):
+    """
+    Cheap upper bound on calculate_timetable_score for an instance.
+
+    Each subject is relaxed on its own: per day it can take at most 2 periods
+    in one session, outside lab blocks and its teacher's free periods. A
+    teacher's subjects together can take at most the slots that teacher is
+    available in, and all subjects at most the free slots. Distribution and
+    constraint points are assumed in full, since within 2 periods a day the
+    uneven-distribution penalty never applies.
+    Returns {"score": bound, "allocatable": max periods that can be placed}.
+    """
+    teacher_free_periods = teacher_free_periods or {}
+    lab_slots = np.zeros(week.slot_count, dtype=bool)
+    for lab in confirmed_lab:
+        lab_slots |= week.slot_masks[(lab["day"], lab["session"])]
+
+    total_needed = sum(s["periods"] for s in confirmed_theory)
+    if total_needed == 0:
+        return {"score": 100, "allocatable": 0}
+
+    # A teacher's subjects also share the slots that teacher is available in
+    per_teacher = defaultdict(int)
+    teacher_slots = {}
+    for subject in confirmed_theory:
+        teacher = subject.get("teacher")
+        blocked = lab_slots | week.mask(teacher_free_periods.get(teacher, []))
+        open_slots = ~blocked.reshape(week.shape)
+        fn = open_slots[:, :week.split].sum(axis=1)
+        an = open_slots[:, week.split:].sum(axis=1)
+        capacity = int(np.minimum(2, np.maximum(fn, an)).sum())
+        per_teacher[teacher] += min(subject["periods"], capacity)
+        teacher_slots[teacher] = week.slot_count - int(blocked.sum())
+
+    allocatable = sum(min(count, teacher_slots[teacher]) for teacher, count in per_teacher.items())
+    allocatable = min(allocatable, week.slot_count - int(lab_slots.sum()))
+    return {"score": allocatable / total_needed * 40 + 60, "allocatable": allocatable}
+
+
+# -------------------------------------------------
+# ADVANCED TIMETABLE GENERATION WITH SCORING
+# -------------------------------------------------
+def generate_timetable_with_optimization(confirmed_theory, confirmed_lab, max_iterations=100,
+                                         teacher_free_periods=None, pool_size=5, min_distance=4,
+                                         constraints=None, batch_size=10, target_score=95, time_limit=None,
+                                         patience=30, stall_time=None, history=None, checkpoint=None,
+                                         seed=None, week=STANDARD_WEEK):
+    """
+    Generate timetable with optimization scoring
+    Tries multiple iterations and returns the best one, together with a pool
+    of up to `pool_size` distinct alternatives (best first). Every attempt runs
+    on its own seed, so any pooled timetable can be reproduced exactly. The
+    attempt seeds come from a generator of the run's own, seeded with `seed`
+    (or one draw from the random module), so the run leaves the process-wide
+    random state alone.
+    `constraints` is an optional compiled rule set (see timetable.constraints).
+    Candidates are generated `batch_size` at a time and scored together.
+
+    The run stops early when:
+    - "target": the pool is full of timetables scoring at least `target_score`
+    - "upper_bound": the target is out of reach, but the pool is full of
+      timetables scoring the instance's score_upper_bound, so they are optimal
+    - "plateau": no improvement in `patience` attempts or `stall_time` seconds
+    - "time_limit": `time_limit` seconds have passed
+    otherwise "max_iterations". The fifth return value is a report with the
+    stop reason, attempts made, the upper bound and elapsed time.
+    With a `history` store (see timetable.history), every attempt is recorded;
+    if the store refuses them, recording stops and the report's
+    "history_error" says why.
+    With a `checkpoint` (see timetable.checkpoint), the run saves its state
+    periodically and resumes from a checkpoint of the same instance.
+    `week` is the shape of the timetable (see timetable.week).
+    """
+    from timetable.batch import score_timetable_batch
+    from timetable.encoding import SubjectTable, encode_timetable
+
+    subject_table = SubjectTable(confirmed_theory, confirmed_lab, week)
+    pool = TimetablePool(pool_size, min_distance)
+    rng = random.Random(random.getrandbits(32) if seed is None else seed)
+    started = time.monotonic()
+
+    upper_bound = score_upper_bound(confirmed_theory, confirmed_lab, teacher_free_periods, week)
+    total_needed = sum(s["periods"] for s in confirmed_theory)
+    effective_target = min(target_score, upper_bound["score"])
+    require_complete = upper_bound["allocatable"] >= total_needed
+
+    stop_reason = "max_iterations"
+    attempts = 0
+    best_score = -1
+    last_improvement = 0
+    last_improvement_time = started
+    history_error = None
+    if history is not None:
+        try:
+            run = history.start_run("greedy", confirmed_theory, confirmed_lab)
+        except ValueError as e:
+            # The history is a convenience; a full store must not cost the run
+            history, history_error = None, str(e)
+
+    first_batch = 0
+    if checkpoint is not None:
+        from timetable.checkpoint import (instance_fingerprint, pool_state, restore_pool,
+                                          random_state_to_json, random_state_from_json)
+        fingerprint = instance_fingerprint(confirmed_theory, confirmed_lab, teacher_free_periods, constraints, week)
+        saved = checkpoint.load("greedy", fingerprint)
+        if saved is not None:
+            meta, arrays = saved
+            restore_pool(pool, meta["pool"], arrays, subject_table)
+            rng.setstate(random_state_from_json(meta["random_state"]))
+            first_batch = meta["next_batch"]
+            attempts, best_score, last_improvement = meta["attempts"], meta["best_score"], meta["last_improvement"]
+            started -= meta["elapsed"]
+            last_improvement_time = started + meta["last_improvement_elapsed"]
+
+    for start in range(first_batch, max_iterations, batch_size):
+        candidates = []
+        for iteration in range(start, min(start + batch_size, max_iterations)):
+            seed = rng.getrandbits(32)
+            timetable, unallocated = generate_single_timetable(
+                confirmed_theory, confirmed_lab, teacher_free_periods, random.Random(seed), constraints, week)
+
+            # Lab conflicts are independent of the seed, no point retrying
+            if timetable is None:
+                return None, unallocated, -1, [], None
+            candidates.append((timetable, unallocated, seed))
+
+        grids = np.stack([encode_timetable(timetable, subject_table) for timetable, _, _ in candidates])
+        scores, _, _ = score_timetable_batch(grids, subject_table, constraints)
+        if history is not None:
+            try:
+                history.record_grids(run, grids, subject_table, scores, [seed for _, _, seed in candidates])
+            except ValueError as e:
+                history, history_error = None, str(e)
+        for (timetable, unallocated, seed), score in zip(candidates, scores):
+            attempts += 1
+            pool.offer(timetable, unallocated, float(score), seed)
+            if score > best_score:
+                best_score = float(score)
+                last_improvement = attempts
+                last_improvement_time = time.monotonic()
+
+        now = time.monotonic()
+        if checkpoint is not None and checkpoint.due():
+            pool_meta, pool_arrays = pool_state(pool, subject_table)
+            checkpoint.save("greedy", fingerprint, {
+                "pool": pool_meta,
+                "random_state": random_state_to_json(rng.getstate()),
+                "next_batch": start + batch_size,
+                "attempts": attempts,
+                "best_score": best_score,
+                "last_improvement": last_improvement,
+                "elapsed": now - started,
+                "last_improvement_elapsed": last_improvement_time - started,
+            }, pool_arrays)
+
+        # Stop early once we have enough near-perfect alternatives
+        if pool.is_settled(effective_target, require_complete):
+            stop_reason = "target" if effective_target >= target_score else "upper_bound"
+            break
+        if patience is not None and attempts - last_improvement >= patience:
+            stop_reason = "plateau"
+            break
+        if stall_time is not None and now - last_improvement_time >= stall_time:
+            stop_reason = "plateau"
+            break
+        if time_limit is not None and now - started >= time_limit:
+            stop_reason = "time_limit"
+            break
+
+    if checkpoint is not None:
+        checkpoint.clear()
+
+    report = {
+        "stop_reason": stop_reason,
+        "attempts": attempts,
+        "upper_bound": upper_bound["score"],
+        "optimal": best_score >= upper_bound["score"],
+        "elapsed": time.monotonic() - started,
+        "history_error": history_error,
+    }
+    best = pool.best()
+    if best is None:
+        return None, None, -1, [], report
+    return best["timetable"], best["unallocated"], best["score"], pool.entries, report
+
+
+def calculate_timetable_score(timetable, confirmed_theory, unallocated, constraints=None, week=STANDARD_WEEK):
+    """
+    Calculate quality score of timetable
+    Factors:
+    - Allocation completeness (40%)
+    - Distribution quality (30%), less any soft rule penalties
+    - Constraint satisfaction (30%), less any hard rule violations
+    """
+    score = 0
+
+    # 1. Allocation completeness (40 points)
+    total_periods_needed = sum(s["periods"] for s in confirmed_theory)
+    if total_periods_needed > 0:
+        unallocated_periods = sum(u["remaining"] for u in unallocated) if unallocated else 0
+        allocated_periods = total_periods_needed - unallocated_periods
+        allocation_score = (allocated_periods / total_periods_needed) * 40
+        score += allocation_score
+    else:
+        score += 40
+
+    # 2. Distribution quality (30 points)
+    distribution_penalties = 0
+    cells = week.cells(timetable)
+    for subject in confirmed_theory:
+        subject_name = subject["name"]
+        day_counts = (cells == subject_name).sum(axis=1).tolist()
+
+        # Penalize uneven distribution
+        if day_counts:
+            max_count = max(day_counts)
+            min_count = min([c for c in day_counts if c > 0] or [0])
+            if max_count - min_count > 1:
+                distribution_penalties += 5
+
+    rule_penalties = 0
+    rule_violations = []
+    if constraints is not None and constraints.active:
+        rule_penalties, rule_violations = constraints.evaluate(constraints.grid_from_timetable(timetable))
+
+    distribution_score = max(0, 30 - distribution_penalties - rule_penalties)
+    score += distribution_score
+
+    # 3. Constraint satisfaction (30 points)
+    violations = validate_constraints(timetable, confirmed_theory, week)
+    constraint_score = max(0, 30 - (len(violations) * 5) - sum(v["weight"] for v in rule_violations))
+    score += constraint_score
+
+    return min(100, score)
+
+
+class SlotBuckets:
+    """
+    Free slots for one subject, bucketed by the subject's period count on each day.
+
+    Bucket 0 holds days the subject has not been placed on (either session),
+    bucket 1 days with one period, restricted to that period's session; days
+    with two periods drop out. Within a (day, session) queue slots keep their
+    shuffled order, so the first slot of the lowest bucket is the same one a
+    stable sort by day count over the shuffled list would pick.
+    """
+
+    def __init__(self, slots, week=STANDARD_WEEK):
+        self.queues = {}
+        self.buckets = [{}, {}]  # day count -> {day: required session or None}
+        for rank, (day, period) in enumerate(slots):
+            session = week.session_of(period)
+            self.queues.setdefault((day, session), deque()).append((rank, period))
+            self.buckets[0][day] = None
+
+    def _queues(self, days):
+        for day, session in days.items():
+            for s in ((session,) if session else ("FN", "AN")):
+                queue = self.queues.get((day, s))
+                if queue:
+                    yield day, s, queue
+
+    def first(self):
+        """(day, period, session) of the earliest slot in the lowest bucket, or None"""
+        for days in self.buckets:
+            best = None
+            for day, session, queue in self._queues(days):
+                if best is None or queue[0][0] < best[0]:
+                    best = (queue[0][0], day, queue[0][1], session)
+            if best is not None:
+                return best[1:]
+        return None
+
+    def cheapest(self, cost):
+        """
+        Like first(), but within the lowest bucket with an allowed slot pick the
+        lowest cost(day, period); a cost of None rules the slot out.
+        """
+        for days in self.buckets:
+            best = None
+            for day, session, queue in self._queues(days):
+                for rank, period in queue:
+                    c = cost(day, period)
+                    if c is not None and (best is None or (c, rank) < best[0]):
+                        best = ((c, rank), day, period, session)
+            if best is not None:
+                return best[1:]
+        return None
+
+    def take(self, day, period, session):
+        """Consume a slot and move its day to the next bucket"""
+        queue = self.queues[(day, session)]
+        if queue[0][1] == period:
+            queue.popleft()
+        else:
+            queue.remove(next(item for item in queue if item[1] == period))
+        if day in self.buckets[0]:
+            del self.buckets[0][day]
+            self.buckets[1][day] = session
+        else:
+            del self.buckets[1][day]
+
+
+def generate_single_timetable(confirmed_theory, confirmed_lab, teacher_free_periods=None, rng=random,
+                              constraints=None, week=STANDARD_WEEK):
+    """
+    Generate a single timetable attempt
+    With compiled `constraints`, hard rules rule out slots and soft rule costs
+    break ties between slots on equally loaded days.
+    """
+    cells = np.full(week.shape, "", dtype=object)
+    slots = cells.ravel()  # view: slot i is cells[slot_day[i], slot_period[i]]
+
+    # Check lab conflicts
+    lab_conflicts = find_lab_conflicts(confirmed_lab)
+    if lab_conflicts:
+        return None, lab_conflicts
+
+    # Teacher preferences (free periods)
+    teacher_free_periods = teacher_free_periods or {}
+    free_masks = {}
+
+    # Allocate labs
+    for lab in confirmed_lab:
+        slots[week.slot_masks[(lab["day"], lab["session"])]] = lab["name"]
+
+    # Sort subjects by periods (descending) for better allocation
+    sorted_subjects = sorted(confirmed_theory, key=lambda x: x["periods"], reverse=True)
+
+    unallocated = []
+
+    if constraints is not None and not constraints.active:
+        constraints = None
+    if constraints is not None:
+        grid = constraints.empty_grid()
+
+    # Allocate theory subjects
+    for subject in sorted_subjects:
+        periods_needed = subject["periods"]
+        subject_name = subject["name"]
+        teacher = subject.get("teacher")
+        allocated_count = 0
+        if constraints is not None:
+            subject_index = constraints.index[subject_name]
+
+        # Get all available slots, skipping the teacher's free periods
+        available = slots == ""
+        if teacher and teacher in teacher_free_periods:
+            if teacher not in free_masks:
+                free_masks[teacher] = week.mask(teacher_free_periods[teacher])
+            available &= ~free_masks[teacher]
+        all_slots = [week.slots[i] for i in np.flatnonzero(available)]
+
+        rng.shuffle(all_slots)
+        buckets = SlotBuckets(all_slots, week)
+
+        while allocated_count < periods_needed:
+            # Prefer days with fewer allocations for this subject, then cheaper slots
+            if constraints is not None:
+                choice = buckets.cheapest(lambda day, period: constraints.placement_cost(
+                    grid, subject_index, week.day_index[day], week.period_index[period]))
+            else:
+                choice = buckets.first()
+            if choice is None:
+                break
+
+            day, period, session = choice
+            buckets.take(day, period, session)
+
+            slots[week.slot_of[(day, period)]] = subject_name
+            if constraints is not None:
+                grid[week.day_index[day], week.period_index[period]] = subject_index
+            allocated_count += 1
+
+        if allocated_count < periods_needed:
+            unallocated.append({
+                "subject": subject_name,
+                "needed": periods_needed,
+                "allocated": allocated_count,
+                "remaining": periods_needed - allocated_count
+            })
+
+    # Fill empty slots with Library
+    slots[slots == ""] = "Library"
+
+    return week.timetable(cells), unallocated
@@ -0,0 +1,254 @@
+"""
+Why subjects could not be allocated.
+
+Allocation is relaxed to a max-flow: each subject sends its periods through
+(subject, day) nodes, capped by the max-2-per-day and same-session rules, into
+the slots it may use (outside lab blocks, its teacher's free periods and hard
+"avoid periods" rules), one subject per slot. If the flow cannot carry every
+period, no timetable can; the converse does not always hold, because the
+relaxation lets two periods on a day sit in different sessions when both
+sessions have room.
+
+The constraints that can be relaxed (teacher free periods, lab blocks, the
+per-subject day rules and hard rules) are then searched with the flow as the
+feasibility check:
+- quickxplain: a minimal conflict, constraints that together rule out a full allocation
+- minimal_relaxation: deletion filtering for a minimal set to relax, e.g.
+  "remove these 3 free periods or move this lab"
+"""
+from collections import deque
+
+from timetable.week import STANDARD_WEEK
+
+FREE_PERIOD = "free_period"
+LAB = "lab"
+MAX_PER_DAY = "max_per_day"
+SAME_SESSION = "same_session"
+RULE = "rule"
+
+# Relaxed last to first: earlier kinds are kept whenever possible
+PRIORITY = [RULE, MAX_PER_DAY, SAME_SESSION, LAB, FREE_PERIOD]
+
+
+def describe_constraint(constraint):
+    """Readable description of a candidate constraint"""
+    kind = constraint[0]
+    if kind == FREE_PERIOD:
+        return f"{constraint[1]}'s free period on {constraint[2]} {constraint[3]}"
+    if kind == LAB:
+        return f"{constraint[1]} on {constraint[2]} {constraint[3]}"
+    if kind == MAX_PER_DAY:
+        return f"at most 2 periods of {constraint[1]} per day"
+    if kind == SAME_SESSION:
+        return f"two periods of {constraint[1]} on a day in the same session"
+    return f"hard rule '{constraint[1]}'"
+
+
+def _max_flow(capacity, source, sink):
+    """Edmonds-Karp on a {u: {v: capacity}} graph; `capacity` becomes the residual graph"""
+    flow = 0
+    while True:
+        parent = {source: None}
+        queue = deque([source])
+        while queue and sink not in parent:
+            u = queue.popleft()
+            for v, c in capacity[u].items():
+                if c > 0 and v not in parent:
+                    parent[v] = u
+                    queue.append(v)
+        if sink not in parent:
+            return flow
+        bottleneck = float("inf")
+        v = sink
+        while parent[v] is not None:
+            bottleneck = min(bottleneck, capacity[parent[v]][v])
+            v = parent[v]
+        v = sink
+        while parent[v] is not None:
+            u = parent[v]
+            capacity[u][v] -= bottleneck
+            capacity[v][u] = capacity[v].get(u, 0) + bottleneck
+            v = u
+        flow += bottleneck
+
+
+class AllocationModel:
+    """Flow relaxation of an instance, with its relaxable constraints"""
+
+    def __init__(self, confirmed_theory, confirmed_lab, teacher_free_periods=None, rules=None, week=STANDARD_WEEK):
+        self.week = week
+        self.subjects = {s["name"]: s for s in confirmed_theory}
+        self.labs = confirmed_lab
+        self.teacher_free_periods = teacher_free_periods or {}
+        self.hard_rules = [r for r in (rules or []) if r.get("kind") == "hard"
+                           and r["type"] in ("avoid_periods", "spread_across_days")]
+
+    def candidates(self, subjects=None):
+        """Relaxable constraints that affect `subjects` (default: all), most important first"""
+        subjects = list(self.subjects) if subjects is None else subjects
+        teachers = {self.subjects[name].get("teacher") for name in subjects}
+        found = [(RULE, r["name"]) for r in self.hard_rules if r["subject"] in subjects]
+        found += [(MAX_PER_DAY, name) for name in subjects]
+        found += [(SAME_SESSION, name) for name in subjects]
+        found += [(LAB, l["name"], l["day"], l["session"]) for l in self.labs]
+        found += [(FREE_PERIOD, teacher, day, period)
+                  for teacher in sorted(t for t in teachers if t)
+                  for day, period in map(tuple, self.teacher_free_periods.get(teacher, []))
+                  if (day, period) in self.week.slot_of]
+        return sorted(found, key=lambda c: PRIORITY.index(c[0]))
+
+    def allocatable(self, active, subjects=None):
+        """Periods of `subjects` the relaxation can place with only the `active` constraints enforced"""
+        subjects = list(self.subjects) if subjects is None else subjects
+        week = self.week
+        active = set(active)
+        blocked = {(day, period) for kind, _, day, session in (c for c in active if c[0] == LAB)
+                   for period in week.session_periods(session)}
+        free = {}
+        for kind, teacher, day, period in (c for c in active if c[0] == FREE_PERIOD):
+            free.setdefault(teacher, set()).add((day, period))
+
+        graph = {"source": {}, "sink": {}}
+        for day, period in week.slots:
+            graph[("slot", day, period)] = {"sink": 1}
+        for name in subjects:
+            subject = self.subjects[name]
+            unusable = blocked | free.get(subject.get("teacher"), set())
+            max_per_day = 2 if (MAX_PER_DAY, name) in active else len(week.periods)
+            for rule in self.hard_rules:
+                if rule["subject"] != name or (RULE, rule["name"]) not in active:
+                    continue
+                if rule["type"] == "avoid_periods":
+                    unusable = unusable | {(d, p) for d in (rule.get("days") or week.days) for p in rule["periods"]}
+                else:
+                    max_per_day = min(max_per_day, rule["max_per_day"])
+
+            graph["source"][("subject", name)] = subject["periods"]
+            graph[("subject", name)] = {}
+            for day in week.days:
+                fn = [p for p in week.periods_fn if (day, p) not in unusable]
+                an = [p for p in week.periods_an if (day, p) not in unusable]
+                room = max(len(fn), len(an)) if (SAME_SESSION, name) in active else len(fn) + len(an)
+                if min(max_per_day, room) == 0:
+                    continue
+                graph[("subject", name)][("day", name, day)] = min(max_per_day, room)
+                graph[("day", name, day)] = {("slot", day, p): 1 for p in fn + an}
+        return _max_flow(graph, "source", "sink")
+
+    def consistent(self, active, subjects=None):
+        """True if the relaxation places every period of `subjects`"""
+        subjects = list(self.subjects) if subjects is None else subjects
+        return self.allocatable(active, subjects) >= sum(self.subjects[n]["periods"] for n in subjects)
+
+
+def quickxplain(constraints, consistent, background=()):
+    """
+    Minimal subset of `constraints` that is inconsistent together with
+    `background` (Junker's QuickXplain), or None if all of them are consistent.
+    Earlier constraints are preferred in the explanation.
+    """
+    background = list(background)
+    if consistent(background + list(constraints)):
+        return None
+    if not consistent(background):
+        return []
+
+    def explain(base, has_delta, candidates):
+        if has_delta and not consistent(base):
+            return []
+        if len(candidates) == 1:
+            return list(candidates)
+        split = len(candidates) // 2
+        first, second = candidates[:split], candidates[split:]
+        delta_second = explain(base + first, bool(first), second)
+        delta_first = explain(base + delta_second, bool(delta_second), first)
+        return delta_first + delta_second
+
+    return explain(background, False, list(constraints))
+
+
+def minimal_relaxation(constraints, consistent, background=()):
+    """
+    Deletion filtering: keep each constraint, in order, unless it breaks
+    consistency with those kept so far. Returns the ones that had to go (a
+    minimal set to relax), or None if even relaxing everything is not enough.
+    """
+    kept = list(background)
+    if not consistent(kept):
+        return None
+    relaxed = []
+    for constraint in constraints:
+        if consistent(kept + [constraint]):
+            kept.append(constraint)
+        else:
+            relaxed.append(constraint)
+    return relaxed
+
+
+def diagnose_unallocated(confirmed_theory, confirmed_lab, unallocated, teacher_free_periods=None, rules=None,
+                         week=STANDARD_WEEK):
+    """
+    Diagnose a partial allocation. Returns {"subjects": [...], "overall": {...}}:
+    each unallocated subject is checked together with the subjects that were
+    fully allocated, and "overall" checks every subject at once (subjects that
+    each fit alone can still crowd each other out). Every diagnosis has the
+    minimal "conflict" that rules out a full allocation and a minimal set of
+    constraints to "relax"; both are None when the relaxation finds room,
+    i.e. the generator missed a placement that exists. "lab_moves" maps each
+    lab to relax to a session it can move to (or None: drop it). "overloaded"
+    is set when relaxing everything is still not enough, with the
+    "shortfall" in periods.
+    """
+    model = AllocationModel(confirmed_theory, confirmed_lab, teacher_free_periods, rules, week)
+    failed = {u["subject"] for u in unallocated}
+    placed = [s["name"] for s in confirmed_theory if s["name"] not in failed]
+
+    def diagnose(subjects):
+        cache = {}
+
+        def consistent(active):
+            key = frozenset(active)
+            if key not in cache:
+                cache[key] = model.consistent(active, subjects)
+            return cache[key]
+
+        candidates = model.candidates(subjects)
+        conflict = quickxplain(candidates, consistent)
+        relax = minimal_relaxation(candidates, consistent) if conflict is not None else None
+        moves = {}
+        if relax:
+            # Relaxing a lab frees its session; find a session it can move to instead
+            kept = [c for c in candidates if c not in relax]
+            taken = {(c[2], c[3]) for c in kept if c[0] == LAB}
+            for lab in (c for c in relax if c[0] == LAB):
+                moves[lab[1]] = next((
+                    (day, session) for day in week.days for session in ("FN", "AN")
+                    if (day, session) not in taken and consistent(kept + [(LAB, lab[1], day, session)])
+                ), None)
+                if moves[lab[1]] is not None:
+                    kept.append((LAB, lab[1], *moves[lab[1]]))
+                    taken.add(moves[lab[1]])
+        shortfall = sum(model.subjects[n]["periods"] for n in subjects) - model.allocatable([], subjects)
+        return {"conflict": conflict, "relax": relax, "lab_moves": moves,
+                "overloaded": conflict is not None and relax is None, "shortfall": max(shortfall, 0)}
+
+    return {
+        "subjects": [dict(diagnose(placed + [item["subject"]]), subject=item["subject"], remaining=item["remaining"])
+                     for item in unallocated],
+        "overall": diagnose(list(model.subjects)),
+    }
+
+
+def summarize_constraints(constraints, week=STANDARD_WEEK):
+    """Descriptions with each teacher's free periods grouped by day"""
+    lines, free = [], {}
+    for constraint in constraints:
+        if constraint[0] == FREE_PERIOD:
+            free.setdefault(constraint[1], {}).setdefault(constraint[2], []).append(constraint[3])
+        else:
+            lines.append(describe_constraint(constraint))
+    for teacher, days in free.items():
+        slots = "; ".join(f"{day} {', '.join(sorted(periods, key=week.period_index.get))}" for day, periods in days.items())
+        count = sum(len(periods) for periods in days.values())
+        lines.append(f"{teacher}'s free period{'s' if count > 1 else ''} on {slots}")
+    return lines
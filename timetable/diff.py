@@ -0,0 +1,176 @@
+"""
+What changed between two timetables, or two whole-college snapshots.
+
+Both sides are stacked into (sections x slots) grids and factorized into
+integer codes against one shared vocabulary, once for subjects and once for
+teachers, so every count is a comparison or a bincount over the whole college
+at once. Per (section, subject) and (section, teacher):
+- stayed:  periods in the same slot on both sides
+- moved:   periods kept but in a different slot
+- added / removed: change in the number of periods
+
+Disruption is the share of a section's occupied slots (on either side) whose
+occupant changed; 0 means identical, 1 means nothing stayed put. Both sides
+must have the same week shape.
+"""
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from timetable.analytics import timetable_cells
+from timetable.teacher_index import NOT_TAUGHT
+from timetable.week import STANDARD_WEEK
+
+
+def take_snapshot(saved_timetables, name):
+    """Frozen copy of a timetable store, to publish and diff against later"""
+    return {
+        "name": name,
+        "taken_at": datetime.now().isoformat(timespec="seconds"),
+        "timetables": {label: dict(entry, cells=_cells(entry)) for label, entry in saved_timetables.items()},
+    }
+
+
+def _cells(entry):
+    cells = entry.get("cells")
+    return cells if cells is not None else timetable_cells(entry["timetable"])
+
+
+def _stack(store, labels, week):
+    """(sections x slots) cells, empty for sections missing from the store"""
+    grids = np.full((len(labels), week.slot_count), "", dtype=object)
+    for i, label in enumerate(labels):
+        if label in store:
+            cells = _cells(store[label])
+            if cells.shape != week.shape:
+                raise ValueError(f"{label} is not a {week.label} timetable")
+            grids[i] = cells.ravel()
+    return grids
+
+
+def _subject_codes(old, new):
+    """Shared codes for both sides' cells; not-taught cells are -1"""
+    codes, vocab = pd.factorize(np.concatenate([old.ravel(), new.ravel()]))
+    vocab = np.asarray(vocab, dtype=object)
+    codes[np.isin(codes, np.flatnonzero(pd.Index(vocab).isin(NOT_TAUGHT)))] = -1
+    old_codes, new_codes = codes.reshape(2, *old.shape)
+    return old_codes, new_codes, vocab
+
+
+def _teacher_codes(codes, vocab, subject_teachers, teacher_index):
+    """Teacher code of every cell, from each section's own subject -> teacher map"""
+    pairs = [(i, subject, teacher) for i, mapping in enumerate(subject_teachers)
+             for subject, teacher in mapping.items() if teacher]
+    teachers = np.full(codes.shape, -1, dtype=np.int64)
+    if not pairs:
+        return teachers
+    sections, subjects, names = zip(*pairs)
+    subject_codes = pd.Index(vocab).get_indexer(subjects)
+    known = subject_codes >= 0
+    keys = np.asarray(sections)[known] * len(vocab) + subject_codes[known]
+    teacher_codes = teacher_index.get_indexer(np.asarray(names, dtype=object)[known])
+
+    order = np.argsort(keys)
+    keys, teacher_codes = keys[order], teacher_codes[order]
+    cells = np.arange(len(codes))[:, None] * len(vocab) + codes
+    found = np.minimum(np.searchsorted(keys, cells), len(keys) - 1)
+    hit = (codes >= 0) & (keys[found] == cells)
+    teachers[hit] = teacher_codes[found[hit]]
+    return teachers
+
+
+def _change_counts(old, new, n_keys):
+    """(section, key, before, after, stayed, moved, added, removed) for every pair that changed"""
+    rows = np.arange(len(old))[:, None]
+    old_keys = (rows * n_keys + old)[old >= 0]
+    new_keys = (rows * n_keys + new)[new >= 0]
+    stayed_keys = (rows * n_keys + old)[(old >= 0) & (old == new)]
+    unique, inverse = np.unique(np.concatenate([old_keys, new_keys, stayed_keys]), return_inverse=True)
+    tags = np.repeat(np.arange(3), [len(old_keys), len(new_keys), len(stayed_keys)])
+    before, after, stayed = np.bincount(tags * len(unique) + inverse, minlength=3 * len(unique)).reshape(3, -1)
+
+    moved = np.minimum(before, after) - stayed
+    added = np.maximum(after - before, 0)
+    removed = np.maximum(before - after, 0)
+    changed = (moved + added + removed) > 0
+    return (unique[changed] // n_keys, unique[changed] % n_keys,
+            before[changed], after[changed], stayed[changed], moved[changed], added[changed], removed[changed])
+
+
+def diff_snapshots(old_store, new_store, week=STANDARD_WEEK):
+    """
+    Compare two {section: entry} stores (entries need "timetable" or "cells"
+    and "subject_teachers"). A section on one side only counts as fully
+    added or removed. Returns a dict with DataFrames "sections", "subjects",
+    "teachers" (with the number of sections where each one changed) and
+    "slots" (every changed cell), plus the overall "disruption".
+    """
+    labels = list(old_store) + [label for label in new_store if label not in old_store]
+    old, new = _stack(old_store, labels, week), _stack(new_store, labels, week)
+
+    old_codes, new_codes, vocab = _subject_codes(old, new)
+    old_maps = [old_store[l]["subject_teachers"] if l in old_store else {} for l in labels]
+    new_maps = [new_store[l]["subject_teachers"] if l in new_store else {} for l in labels]
+    # Only sections whose cells or teachers differ can contribute subject and teacher changes
+    touched = np.flatnonzero((old_codes != new_codes).any(axis=1) |
+                             np.array([a != b for a, b in zip(old_maps, new_maps)], dtype=bool))
+    old_maps = [old_maps[i] for i in touched]
+    new_maps = [new_maps[i] for i in touched]
+    teacher_names = pd.unique(np.array([t for mapping in old_maps + new_maps for t in mapping.values() if t]
+                                       + [""], dtype=object))
+    teacher_index = pd.Index(teacher_names)
+    old_teachers = _teacher_codes(old_codes[touched], vocab, old_maps, teacher_index)
+    new_teachers = _teacher_codes(new_codes[touched], vocab, new_maps, teacher_index)
+    labels = np.array(labels, dtype=object)
+
+    occupied = (old_codes >= 0) | (new_codes >= 0)
+    changed = occupied & (old_codes != new_codes)
+    changed_days = changed.reshape(len(labels), *week.shape).any(axis=2)
+    changed_count = changed.sum(axis=1)
+    occupied_count = occupied.sum(axis=1)
+    sections = pd.DataFrame({
+        "Section": labels,
+        "Status": np.where([l not in old_store for l in labels], "added",
+                           np.where([l not in new_store for l in labels], "removed",
+                                    np.where(changed_count > 0, "changed", "unchanged"))),
+        "Changed Slots": changed_count,
+        "Days Changed": changed_days.sum(axis=1),
+        "Disruption %": np.round(changed_count / np.maximum(occupied_count, 1) * 100, 1),
+    })
+
+    columns = ["Before", "After", "Stayed", "Moved", "Added", "Removed"]
+    section, subject, *counts = _change_counts(old_codes[touched], new_codes[touched], len(vocab))
+    subjects = pd.DataFrame({"Section": labels[touched][section], "Subject": vocab[subject], **dict(zip(columns, counts))})
+
+    section, teacher, *counts = _change_counts(old_teachers, new_teachers, len(teacher_names))
+    per_section = pd.DataFrame({"Teacher": teacher_names[teacher], **dict(zip(columns, counts))})
+    teachers = per_section.groupby("Teacher", sort=False).agg(
+        **{column: (column, "sum") for column in columns}, Sections=("Before", "size")
+    ).reset_index().sort_values(["Moved", "Added", "Removed"], ascending=False, kind="stable")
+
+    section, slot = np.nonzero(changed)
+    slots = pd.DataFrame({
+        "Section": labels[section],
+        "Day": np.array(week.days, dtype=object)[week.slot_day[slot]],
+        "Period": np.array(week.periods, dtype=object)[week.slot_period[slot]],
+        "Before": old[section, slot],
+        "After": new[section, slot],
+    })
+
+    return {
+        "sections": sections,
+        "subjects": subjects,
+        "teachers": teachers,
+        "slots": slots,
+        "disruption": float(changed.sum() / max(occupied.sum(), 1)),
+    }
+
+
+def diff_timetables(old, new, old_teachers=None, new_teachers=None, label="", week=STANDARD_WEEK):
+    """diff_snapshots for a single pair of timetables (DataFrames or cell arrays)"""
+    def entry(timetable, subject_teachers):
+        key = "timetable" if isinstance(timetable, pd.DataFrame) else "cells"
+        return {key: timetable, "subject_teachers": subject_teachers or {}}
+
+    return diff_snapshots({label: entry(old, old_teachers)}, {label: entry(new, new_teachers or old_teachers)}, week)
@@ -0,0 +1,76 @@
+"""
+Integer encoding of timetables.
+
+A timetable grid becomes a days x periods array of subject IDs. ID 0 is
+Library (a free period), theory subjects come next in confirmed order, then
+labs. The matching SubjectTable holds the per-ID data the vectorized code
+needs (periods per week, theory/lab flag, teacher ID) and the week the grids
+are shaped by.
+"""
+import numpy as np
+
+from timetable.week import STANDARD_WEEK
+
+LIBRARY = 0
+LIBRARY_NAME = "Library"
+
+
+class SubjectTable:
+    """Subject and teacher lookup tables for one set of confirmed subjects"""
+
+    def __init__(self, confirmed_theory, confirmed_lab=(), week=STANDARD_WEEK):
+        self.week = week
+        self.names = [LIBRARY_NAME] + [s["name"] for s in confirmed_theory] + [l["name"] for l in confirmed_lab]
+        self.n_theory = len(confirmed_theory)
+        self.index = {}
+        for i, name in enumerate(self.names):
+            self.index.setdefault(name, i)
+        self.index[""] = LIBRARY
+
+        self.periods = np.array([0] + [s["periods"] for s in confirmed_theory] + [0] * len(confirmed_lab),
+                                dtype=np.int64)
+        self.is_theory = np.zeros(len(self.names), dtype=bool)
+        self.is_theory[1:1 + self.n_theory] = True
+
+        subject_teachers = [None] + [s.get("teacher") for s in confirmed_theory] + \
+                           [l.get("teacher") for l in confirmed_lab]
+        self.teachers = sorted({t for t in subject_teachers if t})
+        teacher_index = {t: i for i, t in enumerate(self.teachers)}
+        self.teacher_ids = np.array([teacher_index.get(t, -1) for t in subject_teachers], dtype=np.int64)
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def theory_ids(self):
+        return np.arange(1, 1 + self.n_theory)
+
+
+def encode_timetable(timetable, subject_table):
+    """Timetable DataFrame -> days x periods array of subject IDs (unknown cells become Library)"""
+    index = subject_table.index
+    cells = subject_table.week.cells(timetable).ravel()
+    return np.array([index.get(cell, LIBRARY) for cell in cells], dtype=np.int64).reshape(subject_table.week.shape)
+
+
+def decode_timetable(grid, subject_table):
+    """Days x periods array of subject IDs -> timetable DataFrame"""
+    names = np.array(subject_table.names, dtype=object)
+    return subject_table.week.timetable(names[np.asarray(grid)])
+
+
+def unallocated_from_grid(grid, subject_table):
+    """Generator-style unallocated list for the theory subjects short of periods in `grid`"""
+    counts = np.bincount(np.asarray(grid).ravel(), minlength=len(subject_table))
+    unallocated = []
+    for s in subject_table.theory_ids:
+        needed = int(subject_table.periods[s])
+        allocated = int(counts[s])
+        if allocated < needed:
+            unallocated.append({
+                "subject": subject_table.names[s],
+                "needed": needed,
+                "allocated": allocated,
+                "remaining": needed - allocated
+            })
+    return unallocated
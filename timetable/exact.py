@@ -0,0 +1,218 @@
+"""
+Exact timetable search with OR-Tools CP-SAT (optional dependency).
+
+The theory allocation is encoded as a CP-SAT model whose objective is
+calculate_timetable_score, scaled to integers:
+
+- labs are fixed, teacher free periods and hard rules remove variables
+- at most 2 periods of a subject per day, both in the same session
+- at most the subject's weekly periods are placed; unplaced ones cost
+  allocation points
+- compiled soft rules come out of the 30 distribution points
+
+Because max-per-day and same-session are modelled as hard constraints, the
+constraint-satisfaction part of the score is always the full 30 points, and
+the uneven-distribution penalty (a spread of more than one period between a
+subject's busiest and quietest day) can never apply.
+Soft rule weights are rounded to whole points in the model.
+
+Install with `pip install ortools`. Without it, exact_available() is False
+and solve_exact raises ImportError.
+"""
+import random
+
+import numpy as np
+
+from timetable.core import TimetablePool, find_lab_conflicts
+from timetable.batch import score_timetable_batch
+from timetable.constraints import HARD
+from timetable.encoding import SubjectTable, LIBRARY, decode_timetable, unallocated_from_grid
+from timetable.week import STANDARD_WEEK
+
+try:
+    from ortools.sat.python import cp_model
+except ImportError:
+    cp_model = None
+
+
+def exact_available():
+    """True if the CP-SAT backend can be used"""
+    return cp_model is not None
+
+
+class _SolutionCollector(cp_model.CpSolverSolutionCallback if cp_model is not None else object):
+    """Keep every improving solution so the pool has alternatives"""
+
+    def __init__(self, x, base):
+        super().__init__()
+        self._x = x
+        self._base = base
+        self.grids = []
+
+    def on_solution_callback(self):
+        grid = self._base.copy()
+        for (s, d, p), var in self._x.items():
+            if self.Value(var):
+                grid[d, p] = s
+        self.grids.append(grid)
+
+
+def solve_exact(confirmed_theory, confirmed_lab, teacher_free_periods=None, constraints=None,
+                time_limit=30, gap_limit=0.0, workers=None, seed=None, pool_size=5, min_distance=4,
+                week=STANDARD_WEEK):
+    """
+    Solve the theory allocation to optimality (or until `time_limit` seconds).
+    Returns (best_timetable, unallocated, score, pool, report); the report has
+    the solver status, objective, best bound and gap, all in score points.
+    The search stops as soon as the gap is at most `gap_limit` points.
+    """
+    if cp_model is None:
+        raise ImportError("The exact backend needs OR-Tools: pip install ortools")
+
+    lab_conflicts = find_lab_conflicts(confirmed_lab)
+    if lab_conflicts:
+        return None, lab_conflicts, -1, [], None
+
+    table = SubjectTable(confirmed_theory, confirmed_lab, week)
+    teacher_free_periods = teacher_free_periods or {}
+    if constraints is not None and not constraints.active:
+        constraints = None
+    n_days, n_periods = week.shape
+    sessions = [range(0, week.split), range(week.split, n_periods)]
+
+    base = np.full(week.slot_count, LIBRARY, dtype=np.int64)
+    for lab in confirmed_lab:
+        base[week.slot_masks[(lab["day"], lab["session"])]] = table.index[lab["name"]]
+    base = base.reshape(week.shape)
+
+    model = cp_model.CpModel()
+    x = {}
+    for s, subject in zip(table.theory_ids, confirmed_theory):
+        free = week.mask(teacher_free_periods.get(subject.get("teacher"), [])).reshape(week.shape)
+        for d in range(n_days):
+            for p in range(n_periods):
+                if base[d, p] != LIBRARY or free[d, p]:
+                    continue
+                if constraints is not None and constraints.slot_forbidden[s - 1, d, p]:
+                    continue
+                x[s, d, p] = model.NewBoolVar(f"x_{s}_{d}_{p}")
+
+    def cell(s, d, p):
+        return x.get((s, d, p), 0)
+
+    # One subject per slot
+    for d in range(n_days):
+        for p in range(n_periods):
+            vars_here = [x[s, d, p] for s in table.theory_ids if (s, d, p) in x]
+            if len(vars_here) > 1:
+                model.AddAtMostOne(vars_here)
+
+    soft_terms = []
+    soft_constant = 0
+    for s in table.theory_ids:
+        for d in range(n_days):
+            one = model.NewBoolVar(f"one_{s}_{d}")
+            two = model.NewBoolVar(f"two_{s}_{d}")
+            afternoon = model.NewBoolVar(f"an_{s}_{d}")
+            model.Add(sum(cell(s, d, p) for p in range(n_periods)) == one + 2 * two)
+            model.Add(one + two <= 1)
+            # Everything on one day sits in one session
+            model.Add(sum(cell(s, d, p) for p in sessions[0]) <= 2 * (1 - afternoon))
+            model.Add(sum(cell(s, d, p) for p in sessions[1]) <= 2 * afternoon)
+
+            if constraints is not None:
+                c = s - 1
+                if constraints.day_forbidden[c, 1]:
+                    model.Add(one == 0)
+                if constraints.day_forbidden[c, 2]:
+                    model.Add(two == 0)
+                soft_constant += int(round(constraints.day_penalty[c, 0]))
+                soft_terms.append(int(round(constraints.day_penalty[c, 1])) * one)
+                soft_terms.append(int(round(constraints.day_penalty[c, 2])) * two)
+
+        model.Add(sum(v for (s2, _, _), v in x.items() if s2 == s) <= int(table.periods[s]))
+
+    if constraints is not None:
+        # Slot table
+        for (s, d, p), var in x.items():
+            weight = int(round(constraints.slot_penalty[s - 1, d, p]))
+            if weight:
+                soft_terms.append(weight * var)
+
+        # Pair table over adjacent periods in a session
+        pairs = np.argwhere((constraints.pair_penalty != 0) | constraints.pair_forbidden)
+        for d in range(n_days):
+            for p, q in constraints.adjacent_pairs:
+                for a, b in pairs:
+                    va, vb = x.get((a + 1, d, p)), x.get((b + 1, d, q))
+                    if va is None or vb is None:
+                        continue
+                    if constraints.pair_forbidden[a, b]:
+                        model.Add(va + vb <= 1)
+                    weight = int(round(constraints.pair_penalty[a, b]))
+                    if weight:
+                        both = model.NewBoolVar(f"pair_{a}_{b}_{d}_{p}")
+                        model.Add(both >= va + vb - 1)
+                        soft_terms.append(weight * both)
+
+        # Run limits: a run of length L > limit fully covers L - limit windows of size limit + 1
+        for teacher, limits in constraints.run_limits.items():
+            taught = [s for s in table.theory_ids if constraints.subject_teacher[s - 1] == teacher]
+            for limit, weight, kind, _ in limits:
+                for d in range(n_days):
+                    for session in sessions:
+                        for start in range(session.start, session.stop - limit):
+                            window = [cell(s, d, p) for s in taught for p in range(start, start + limit + 1)]
+                            if kind == HARD:
+                                model.Add(sum(window) <= limit)
+                            elif int(round(weight)):
+                                full = model.NewBoolVar(f"run_{teacher}_{d}_{start}")
+                                model.Add(full >= sum(window) - limit)
+                                soft_terms.append(int(round(weight)) * full)
+
+    # Objective: score * total_needed - 30 * total_needed, all integer
+    total_needed = int(table.periods[table.theory_ids].sum())
+    allocated = sum(x.values())
+    distribution = model.NewIntVar(0, 30, "distribution")
+    model.AddMaxEquality(distribution, [0, 30 - sum(soft_terms) - soft_constant])
+    scale = max(total_needed, 1)
+    model.Maximize(40 * allocated + scale * distribution)
+
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = float(time_limit)
+    solver.parameters.absolute_gap_limit = float(gap_limit) * scale
+    seed = random.getrandbits(31) if seed is None else seed
+    solver.parameters.random_seed = int(seed) % (2 ** 31)
+    if workers:
+        solver.parameters.num_search_workers = workers
+    collector = _SolutionCollector(x, base)
+    status = solver.Solve(model, collector)
+
+    def to_score(value):
+        if total_needed == 0:
+            return min(100.0, 40 + value + 30)
+        return min(100.0, value / total_needed + 30)
+
+    report = {
+        "status": solver.StatusName(status),
+        "optimal": status == cp_model.OPTIMAL,
+        "objective": None,
+        "best_bound": None,
+        "gap": None,
+        "wall_time": solver.WallTime(),
+    }
+    if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return None, None, -1, [], report
+
+    report["objective"] = to_score(solver.ObjectiveValue())
+    report["best_bound"] = to_score(solver.BestObjectiveBound())
+    report["gap"] = max(0.0, report["best_bound"] - report["objective"])
+
+    # Pool entries are scored with the real scorer; improving solutions arrive best-last
+    grids = collector.grids[::-1] or [base]
+    scores, _, _ = score_timetable_batch(np.stack(grids), table, constraints)
+    pool = TimetablePool(pool_size, min_distance)
+    for grid, score in zip(grids, scores):
+        pool.offer(decode_timetable(grid, table), unallocated_from_grid(grid, table), float(score), seed)
+    best = pool.best()
+    return best["timetable"], best["unallocated"], best["score"], pool.entries, report
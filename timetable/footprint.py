@@ -0,0 +1,134 @@
+"""
+Per-session memory accounting and caps.
+
+session_footprint() charges every session-state value with the bytes of the
+objects it alone reaches: each object is counted once, arrays and frames by
+their buffers, and anything reachable from the `shared` objects (the process
+catalog, the standard week) is not charged to the session at all.
+
+enforce_limits() keeps what a session generates bounded. User data (subjects,
+preferences, rules, saved timetables) is never evicted; the oldest history
+records, pool alternatives, portfolio reports and published versions are
+dropped once a cap is exceeded.
+"""
+import sys
+import types
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_LIMITS = {
+    "history_records": 20000,
+    "pool_entries": 10,
+    "portfolio_reports": 20,
+    "published_versions": 20,
+}
+
+LIMIT_LABELS = {
+    "history_records": "History Records",
+    "pool_entries": "Alternative Timetables",
+    "portfolio_reports": "Portfolio Reports",
+    "published_versions": "Published Versions",
+}
+
+
+# Code and modules belong to the process, not to the session that holds a reference
+NOT_CHARGED = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType)
+
+
+def _walk(obj, seen):
+    """Bytes of `obj` and everything it reaches that is not in `seen` yet (adds them to `seen`)"""
+    total = 0
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, NOT_CHARGED):
+            continue
+        seen.add(id(obj))
+        if isinstance(obj, np.ndarray):
+            # A view owns no buffer (getsizeof leaves it out); charge the array it points into
+            total += sys.getsizeof(obj)
+            if obj.base is not None:
+                stack.append(obj.base)
+            if obj.dtype == object:
+                stack.extend(obj.ravel().tolist())
+            continue
+        if isinstance(obj, (pd.DataFrame, pd.Series, pd.Index)):
+            # Shallow buffers, then the cell objects themselves: subject names are shared between frames
+            total += int(np.sum(obj.memory_usage()))
+            if isinstance(obj, pd.DataFrame):
+                stack.extend(obj[column].to_numpy() for column in obj.columns[obj.dtypes == object])
+                stack.extend((obj.index.to_numpy(), obj.columns.to_numpy()))
+            elif obj.dtype == object:
+                stack.append(obj.to_numpy())
+            continue
+        total += sys.getsizeof(obj)
+        if isinstance(obj, (str, bytes, int, float, bool, type(None))):
+            continue
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        else:
+            if hasattr(obj, "__dict__"):
+                stack.append(obj.__dict__)
+            for cls in type(obj).__mro__:
+                for slot in getattr(cls, "__slots__", ()):
+                    if hasattr(obj, slot):
+                        stack.append(getattr(obj, slot))
+    return total
+
+
+def session_footprint(state, shared=()):
+    """
+    DataFrame of Key, Bytes and Share for every value in `state` (a mapping), largest first.
+    Objects reachable from `shared` are left out.
+    """
+    seen = set()
+    for obj in shared:
+        _walk(obj, seen)
+    rows = [(key, _walk(value, seen)) for key, value in state.items()]
+    report = pd.DataFrame(rows, columns=["Key", "Bytes"]).sort_values("Bytes", ascending=False, kind="stable")
+    total = report["Bytes"].sum()
+    report["Share"] = (100 * report["Bytes"] / total).round(1) if total else 0.0
+    return report.reset_index(drop=True)
+
+
+def format_bytes(n):
+    for unit in ("B", "KB", "MB"):
+        if n < 1024:
+            return f"{n:.0f} {unit}"
+        n /= 1024
+    return f"{n:.1f} GB"
+
+
+def enforce_limits(state, limits=None):
+    """
+    Evict the oldest generated artifacts from `state` (a session-state mapping) beyond `limits`
+    (DEFAULT_LIMITS for missing keys). Returns {limit name: number of items dropped} for the caps hit.
+    """
+    limits = dict(DEFAULT_LIMITS, **(limits or {}))
+    dropped = {}
+
+    history = state.get("history")
+    if history is not None and len(history) > limits["history_records"]:
+        dropped["history_records"] = history.drop_oldest(len(history) - limits["history_records"])
+
+    # The pool is best-first; the timetable on screen stays even if it ranks below the cap
+    pool = state.get("timetable_pool") or []
+    if len(pool) > limits["pool_entries"]:
+        current = state.get("timetable")
+        kept = pool[:limits["pool_entries"]]
+        if current is not None and not any(entry["timetable"] is current for entry in kept):
+            kept += [entry for entry in pool if entry["timetable"] is current]
+        dropped["pool_entries"] = len(pool) - len(kept)
+        state["timetable_pool"] = kept
+
+    # Oldest first: keep the newest
+    for key, state_key in (("portfolio_reports", "portfolio_history"), ("published_versions", "published_versions")):
+        items = state.get(state_key) or []
+        if len(items) > limits[key]:
+            dropped[key] = len(items) - limits[key]
+            state[state_key] = items[len(items) - limits[key]:]
+    return {key: count for key, count in dropped.items() if count}
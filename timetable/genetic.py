@@ -0,0 +1,347 @@
+"""
+Island-model genetic algorithm for heavily constrained timetables.
+
+Each island evolves its own population of encoded grids in a worker process.
+Every `migration_interval` generations the islands hand their best
+individuals to the next island in a ring. Fitness is score_timetable_batch,
+i.e. exactly calculate_timetable_score.
+
+Operators keep the structure the greedy generator relies on:
+- labs are locked cells and never move
+- crossover copies whole days from either parent, so each day's subject
+  groups (pairs in one session) survive intact
+- mutation swaps two unlocked slots
+- a repair step restores each subject's weekly period count, following the
+  generator's rules (max 2 per day, same session, teacher free periods)
+- hard scheduling rules are never broken: repair and mutation only make
+  placements the compiled constraints accept, and crossover copies whole
+  days, within which every rule applies
+"""
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+import numpy as np
+
+from timetable.constraints import EMPTY, HARD
+from timetable.core import TimetablePool, find_lab_conflicts
+from timetable.batch import score_timetable_batch
+from timetable.encoding import SubjectTable, LIBRARY, decode_timetable, unallocated_from_grid
+from timetable.week import STANDARD_WEEK
+
+
+class IslandProblem:
+    """Everything an island needs to build, repair and score individuals"""
+
+    def __init__(self, confirmed_theory, confirmed_lab, teacher_free_periods=None, constraints=None,
+                 week=STANDARD_WEEK):
+        self.subject_table = SubjectTable(confirmed_theory, confirmed_lab, week)
+        self.constraints = constraints if constraints is not None and constraints.active else None
+        self.week = week
+        self.split = week.split
+        teacher_free_periods = teacher_free_periods or {}
+
+        base = np.full(week.slot_count, LIBRARY, dtype=np.int64)
+        for lab in confirmed_lab:
+            base[week.slot_masks[(lab["day"], lab["session"])]] = self.subject_table.index[lab["name"]]
+        self.base = base.reshape(week.shape)
+        self.locked = self.base != LIBRARY
+
+        # allowed[s, d, p]: theory subject s may sit in slot (d, p)
+        allowed = np.zeros((len(self.subject_table),) + week.shape, dtype=bool)
+        for s, subject in zip(self.subject_table.theory_ids, confirmed_theory):
+            free = week.mask(teacher_free_periods.get(subject.get("teacher"), [])).reshape(week.shape)
+            allowed[s] = ~self.locked & ~free
+            if self.constraints is not None:
+                allowed[s] &= ~self.constraints.slot_forbidden[s - 1]
+        self.allowed = allowed
+
+        # Most periods of each subject on one day: 2, or less under a hard spread rule
+        self.day_cap = np.full(len(self.subject_table), 2, dtype=np.int64)
+        # Pair, day and run rules depend on the neighbours, so placements are checked one by one
+        self.check_placements = False
+        if self.constraints is not None:
+            for s in self.subject_table.theory_ids:
+                forbidden = np.flatnonzero(self.constraints.day_forbidden[s - 1])
+                if len(forbidden):
+                    self.day_cap[s] = min(2, forbidden[0] - 1)
+            self.check_placements = bool(
+                self.constraints.pair_forbidden.any() or self.constraints.day_forbidden.any() or
+                any(kind == HARD for limits in self.constraints.run_limits.values() for _, _, kind, _ in limits))
+
+        self.needed = self.subject_table.periods
+        # Largest subjects first, like the greedy generator
+        self.fill_order = sorted(self.subject_table.theory_ids, key=lambda s: -self.needed[s])
+
+    def score(self, population):
+        scores, _, _ = score_timetable_batch(population, self.subject_table, self.constraints)
+        return scores
+
+    def _theory_grid(self, grid):
+        """`grid` in the compiled constraints' indexing (theory from 0, everything else EMPTY)"""
+        return np.where(self.subject_table.is_theory[grid], grid - 1, EMPTY)
+
+    def _pick_slot(self, grid, s, candidates, day_count, rng):
+        """
+        A slot among `candidates` for subject `s`, on a day with as few of its periods as possible,
+        that breaks no hard rule; None if there is none.
+        """
+        unusable = len(self.week.periods) + 1
+        load = np.where(candidates, day_count[:, None], unusable)
+        while load.min() < unusable:
+            options = np.argwhere(load == load.min())
+            if not self.check_placements:
+                return options[rng.integers(len(options))]
+            theory_grid = self._theory_grid(grid)
+            fits = [(d, p) for d, p in options if self.constraints.placement_cost(theory_grid, s - 1, d, p) is not None]
+            if fits:
+                return fits[rng.integers(len(fits))]
+            load[tuple(options.T)] = unusable
+        return None
+
+    def _swap_fits(self, grid, d1, p1, d2, p2):
+        """Whether swapping two slots breaks no hard rule (moving Library out never does)"""
+        if not self.check_placements:
+            return True
+        theory_grid = self._theory_grid(grid)
+        moves = [(theory_grid[d1, p1], d2, p2), (theory_grid[d2, p2], d1, p1)]
+        theory_grid[d1, p1] = theory_grid[d2, p2] = EMPTY
+        for s, d, p in moves:
+            if s == EMPTY:
+                continue
+            if self.constraints.placement_cost(theory_grid, s, d, p) is None:
+                return False
+            theory_grid[d, p] = s
+        return True
+
+    def repair(self, grid, rng):
+        """Drop surplus periods and top up missing ones, in place"""
+        counts = np.bincount(grid.ravel(), minlength=len(self.subject_table))
+        for s in self.subject_table.theory_ids:
+            surplus = counts[s] - self.needed[s]
+            if surplus > 0:
+                positions = np.argwhere(grid == s)
+                rng.shuffle(positions)
+                for d, p in positions[:surplus]:
+                    grid[d, p] = LIBRARY
+
+        fn = self.week.session_masks["FN"]
+        for s in self.fill_order:
+            missing = self.needed[s] - int((grid == s).sum())
+            while missing > 0:
+                on_day = grid == s
+                day_count = on_day.sum(axis=1)
+                candidates = (grid == LIBRARY) & self.allowed[s] & (day_count < self.day_cap[s])[:, None]
+                # A second period on a day must stay in the session of the first
+                single = day_count == 1
+                if single.any():
+                    first_fn = (on_day & fn[None, :]).any(axis=1)
+                    wrong_session = np.where(first_fn[:, None], ~fn[None, :], fn[None, :])
+                    candidates &= ~(single[:, None] & wrong_session)
+                slot = self._pick_slot(grid, s, candidates, day_count, rng) if candidates.any() else None
+                if slot is None:
+                    break
+                d, p = slot
+                grid[d, p] = s
+                missing -= 1
+        return grid
+
+    def random_individual(self, rng):
+        return self.repair(self.base.copy(), rng)
+
+    def crossover(self, parent_a, parent_b, rng):
+        """Take each day whole from one parent or the other"""
+        from_a = rng.random(len(self.week.days)) < 0.5
+        return np.where(from_a[:, None], parent_a, parent_b)
+
+    def mutate(self, grid, rng, tries=10):
+        """Swap two unlocked slots, as long as both subjects may sit in their new slots and no hard rule breaks"""
+        free = np.argwhere(~self.locked)
+        if len(free) < 2:
+            return grid
+        for _ in range(tries):
+            i, j = rng.choice(len(free), size=2, replace=False)
+            (d1, p1), (d2, p2) = free[i], free[j]
+            a, b = grid[d1, p1], grid[d2, p2]
+            if a == b:
+                continue
+            if ((a == LIBRARY or self.allowed[a, d2, p2]) and (b == LIBRARY or self.allowed[b, d1, p1])
+                    and self._swap_fits(grid, d1, p1, d2, p2)):
+                grid[d1, p1], grid[d2, p2] = b, a
+                return grid
+        return grid
+
+
+def _tournament(scores, rng, size=3):
+    contenders = rng.integers(len(scores), size=size)
+    return contenders[np.argmax(scores[contenders])]
+
+
+def evolve_island(problem, population, rng_state, generations, settings, immigrants=None):
+    """
+    Run one island for `generations` generations.
+    Returns (population, scores, rng_state) so the caller can migrate and resume.
+    """
+    rng = np.random.default_rng()
+    rng.bit_generator.state = rng_state
+
+    if population is None:
+        population = np.stack([problem.random_individual(rng) for _ in range(settings["population_size"])])
+    scores = problem.score(population)
+
+    if immigrants is not None and len(immigrants):
+        worst = np.argsort(scores)[:len(immigrants)]
+        population[worst] = immigrants
+        scores = problem.score(population)
+
+    elite_count = settings["elite"]
+    for generation in range(generations):
+        if scores.max() >= settings["target_score"]:
+            break
+        if settings["deadline"] is not None and time.time() >= settings["deadline"]:
+            break
+        order = np.argsort(-scores, kind="stable")
+        children = [population[i].copy() for i in order[:elite_count]]
+        while len(children) < len(population):
+            parent_a = population[_tournament(scores, rng)]
+            if rng.random() < settings["crossover_rate"]:
+                parent_b = population[_tournament(scores, rng)]
+                child = problem.crossover(parent_a, parent_b, rng)
+            else:
+                child = parent_a.copy()
+            if rng.random() < settings["mutation_rate"]:
+                problem.mutate(child, rng)
+            children.append(problem.repair(child, rng))
+        population = np.stack(children)
+        scores = problem.score(population)
+
+    return population, scores, rng.bit_generator.state
+
+
+def evolve_timetables(confirmed_theory, confirmed_lab, teacher_free_periods=None, constraints=None,
+                      islands=None, population_size=40, generations=200, migration_interval=20,
+                      migrants=2, crossover_rate=0.8, mutation_rate=0.3, target_score=100,
+                      time_limit=None, pool_size=5, min_distance=4, seed=None, workers=None, checkpoint=None,
+                      week=STANDARD_WEEK):
+    """
+    Evolve timetables on parallel islands.
+    Returns (best_timetable, unallocated, score, pool, report), like
+    generate_timetable_with_optimization; pooled entries carry the run seed.
+    The report has the stop reason ("target", "time_limit" or
+    "max_generations"), generations run, islands and elapsed time.
+    One island per CPU core by default; `workers` caps the worker processes
+    (1 runs every island in this process).
+    With a `checkpoint` (see timetable.checkpoint), the islands are saved
+    after migrations and a run of the same instance resumes from them.
+    `week` is the shape of the timetable (see timetable.week).
+    """
+    lab_conflicts = find_lab_conflicts(confirmed_lab)
+    if lab_conflicts:
+        return None, lab_conflicts, -1, [], None
+
+    problem = IslandProblem(confirmed_theory, confirmed_lab, teacher_free_periods, constraints, week)
+    islands = islands or os.cpu_count() or 1
+    seed = random.getrandbits(32) if seed is None else seed
+    island_seeds = np.random.SeedSequence(seed).spawn(islands)
+    settings = {
+        "population_size": population_size,
+        "elite": max(1, population_size // 20),
+        "crossover_rate": crossover_rate,
+        "mutation_rate": mutation_rate,
+        "target_score": target_score,
+        "deadline": time.time() + time_limit if time_limit is not None else None,
+    }
+
+    populations = [None] * islands
+    scores = [None] * islands
+    rng_states = [np.random.default_rng(s).bit_generator.state for s in island_seeds]
+    immigrants = [None] * islands
+    remaining = generations
+    started = time.time()
+
+    if checkpoint is not None:
+        from timetable.checkpoint import instance_fingerprint
+        fingerprint = instance_fingerprint(confirmed_theory, confirmed_lab, teacher_free_periods, constraints, week)
+        saved = checkpoint.load("genetic", fingerprint)
+        if saved is not None and saved[0]["islands"] == islands:
+            meta, arrays = saved
+            seed, remaining, rng_states = meta["seed"], meta["remaining"], meta["rng_states"]
+            populations = list(arrays["populations"].astype(problem.base.dtype))
+            scores = list(arrays["scores"])
+            immigrants = list(arrays["immigrants"].astype(problem.base.dtype))
+            started -= meta["elapsed"]
+            if settings["deadline"] is not None:
+                settings["deadline"] -= meta["elapsed"]
+
+    workers = min(islands, workers or os.cpu_count() or 1)
+    executor = None
+    if workers > 1:
+        # spawn, not fork: the Streamlit server process runs threads
+        executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+
+    stop_reason = "max_generations"
+    try:
+        while remaining > 0:
+            step = min(migration_interval, remaining)
+            if executor is not None:
+                futures = [executor.submit(evolve_island, problem, populations[i], rng_states[i],
+                                           step, settings, immigrants[i])
+                           for i in range(islands)]
+                results = [f.result() for f in futures]
+            else:
+                results = [evolve_island(problem, populations[i], rng_states[i], step, settings, immigrants[i])
+                           for i in range(islands)]
+            for i, (population, island_scores, rng_state) in enumerate(results):
+                populations[i], scores[i], rng_states[i] = population, island_scores, rng_state
+            remaining -= step
+
+            if max(s.max() for s in scores) >= target_score:
+                stop_reason = "target"
+                break
+            if settings["deadline"] is not None and time.time() >= settings["deadline"]:
+                stop_reason = "time_limit"
+                break
+
+            # Ring migration: each island receives the best of its neighbour
+            immigrants = [
+                populations[i - 1][np.argsort(-scores[i - 1], kind="stable")[:migrants]].copy()
+                for i in range(islands)
+            ]
+            if checkpoint is not None and checkpoint.due():
+                checkpoint.save("genetic", fingerprint, {
+                    "islands": islands,
+                    "seed": seed,
+                    "remaining": remaining,
+                    "rng_states": rng_states,
+                    "elapsed": time.time() - started,
+                }, {
+                    "populations": np.stack(populations).astype(np.uint8),
+                    "scores": np.stack(scores),
+                    "immigrants": np.stack(immigrants).astype(np.uint8),
+                })
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    if checkpoint is not None:
+        checkpoint.clear()
+
+    pool = TimetablePool(pool_size, min_distance)
+    candidates = [(float(s), grid) for i in range(islands) for grid, s in zip(populations[i], scores[i])]
+    candidates.sort(key=lambda c: -c[0])
+    for score, grid in candidates:
+        table = problem.subject_table
+        pool.offer(decode_timetable(grid, table), unallocated_from_grid(grid, table), score, seed)
+        if len(pool) >= pool_size and pool.entries[-1]["score"] > score:
+            break
+
+    report = {
+        "stop_reason": stop_reason,
+        "generations": generations - remaining,
+        "islands": islands,
+        "optimal": False,
+        "elapsed": time.time() - started,
+    }
+    best = pool.best()
+    return best["timetable"], best["unallocated"], best["score"], pool.entries, report
@@ -0,0 +1,212 @@
+"""
+Compact timetable codec and generation-history store.
+
+A timetable is stored as one uint8 subject ID per slot of its week, in
+day-major order (40 bytes for the standard week). IDs point into a table of subject names (and their
+teachers) interned once per store, so a record costs about 70 bytes with
+its score, seed, run and hash, and hundreds of thousands of candidates fit
+in a few MB. A store that sees more than 256 names widens its IDs to
+uint16. Decoding is a single fancy-index into the name table.
+
+The stable hash depends only on the subject names in the cells, so it is the
+same across stores, sessions and interning order.
+"""
+import hashlib
+import time
+
+import numpy as np
+import pandas as pd
+
+from timetable.encoding import LIBRARY_NAME
+from timetable.week import STANDARD_WEEK
+
+MAX_SUBJECTS = 65536
+
+
+def stable_hash(names):
+    """64-bit content hash of a timetable given its cell names in day-major order"""
+    return int.from_bytes(hashlib.blake2b("\x1f".join(names).encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HistoryStore:
+    """Every recorded timetable of one week shape, as packed grids plus per-record columns"""
+
+    def __init__(self, capacity=1024, week=STANDARD_WEEK):
+        self.week = week
+        self.names = [LIBRARY_NAME]
+        self.index = {LIBRARY_NAME: 0, "": 0}
+        self.teachers = [None]
+        self.runs = []
+        self.size = 0
+        self._grids = np.zeros((capacity, week.slot_count), dtype=np.uint8)
+        # float64, so a restored record shows exactly the score it was recorded with
+        self._scores = np.zeros(capacity, dtype=np.float64)
+        self._seeds = np.zeros(capacity, dtype=np.uint64)
+        self._run_ids = np.zeros(capacity, dtype=np.int32)
+        self._hashes = np.zeros(capacity, dtype=np.uint64)
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def nbytes(self):
+        """Memory held by the packed records"""
+        return sum(a[:self.size].nbytes for a in
+                   (self._grids, self._scores, self._seeds, self._run_ids, self._hashes))
+
+    def intern(self, name, teacher=None):
+        """Stable ID of a subject name, adding it on first sight"""
+        if name not in self.index:
+            if len(self.names) >= MAX_SUBJECTS:
+                raise ValueError(f"History store is limited to {MAX_SUBJECTS} distinct subjects")
+            if len(self.names) > np.iinfo(self._grids.dtype).max:
+                self._grids = self._grids.astype(np.uint16)
+            self.index[name] = len(self.names)
+            self.names.append(name)
+            self.teachers.append(teacher)
+        return self.index[name]
+
+    def start_run(self, engine, confirmed_theory, confirmed_lab):
+        """Register a generation run; returns its run ID"""
+        for subject in list(confirmed_theory) + list(confirmed_lab):
+            self.intern(subject["name"], subject.get("teacher"))
+        self.runs.append({
+            "engine": engine,
+            "started": time.time(),
+            "theory": [(s["name"], s["periods"]) for s in confirmed_theory],
+            "labs": [l["name"] for l in confirmed_lab],
+        })
+        return len(self.runs) - 1
+
+    def _grow(self, extra):
+        needed = self.size + extra
+        if needed <= len(self._grids):
+            return
+        capacity = max(needed, 2 * len(self._grids))
+        for attr in ("_grids", "_scores", "_seeds", "_run_ids", "_hashes"):
+            old = getattr(self, attr)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, attr, new)
+
+    def drop_oldest(self, count):
+        """
+        Forget the `count` oldest records and shrink the arrays to what is left.
+        Record numbers shift down by `count`; runs are kept. Returns the number dropped.
+        """
+        count = min(count, self.size)
+        if count <= 0:
+            return 0
+        keep = self.size - count
+        for attr in ("_grids", "_scores", "_seeds", "_run_ids", "_hashes"):
+            old = getattr(self, attr)
+            setattr(self, attr, old[count:self.size].copy())
+        self.size = keep
+        return count
+
+    def record_grids(self, run, grids, subject_table, scores, seeds):
+        """Record a batch of SubjectTable-encoded grids (n x days x periods)"""
+        grids = np.asarray(grids)
+        if grids.shape[1:] != self.week.shape:
+            raise ValueError(f"History store holds {self.week.label} timetables")
+        grids = grids.reshape(len(grids), self.week.slot_count)
+        ids = [self.intern(name) for name in subject_table.names]
+        id_map = np.array(ids, dtype=self._grids.dtype)
+        packed = id_map[grids]
+        names = np.array(self.names, dtype=object)
+        hashes = [stable_hash(names[row]) for row in packed]
+
+        self._grow(len(packed))
+        rows = slice(self.size, self.size + len(packed))
+        self._grids[rows] = packed
+        self._scores[rows] = scores
+        self._seeds[rows] = seeds
+        self._run_ids[rows] = run
+        self._hashes[rows] = hashes
+        self.size += len(packed)
+
+    def record_timetable(self, run, timetable, score, seed):
+        """Record one timetable DataFrame"""
+        cells = self.week.cells(timetable).ravel()
+        ids = [self.intern(cell) for cell in cells]
+        packed = np.array(ids, dtype=self._grids.dtype)
+        self._grow(1)
+        self._grids[self.size] = packed
+        self._scores[self.size] = score
+        self._seeds[self.size] = seed
+        self._run_ids[self.size] = run
+        self._hashes[self.size] = stable_hash(np.array(self.names, dtype=object)[packed])
+        self.size += 1
+
+    def grids(self):
+        """Packed grids of every record (size x days x periods view of subject IDs)"""
+        return self._grids[:self.size].reshape(self.size, *self.week.shape)
+
+    def decode(self, i):
+        """Timetable DataFrame of record `i`"""
+        names = np.array(self.names, dtype=object)
+        return self.week.timetable(names[self._grids[i]])
+
+    def unallocated(self, i):
+        """Generator-style unallocated list of record `i`, against its run's subjects"""
+        counts = np.bincount(self._grids[i], minlength=len(self.names))
+        unallocated = []
+        for name, needed in self.runs[self._run_ids[i]]["theory"]:
+            allocated = int(counts[self.index[name]])
+            if allocated < needed:
+                unallocated.append({"subject": name, "needed": needed, "allocated": allocated,
+                                    "remaining": needed - allocated})
+        return unallocated
+
+    def score(self, i):
+        """Score of record `i`"""
+        return float(self._scores[i])
+
+    def engine(self, i):
+        """Engine that produced record `i`"""
+        return self.runs[self._run_ids[i]]["engine"]
+
+    def entry(self, i):
+        """Pool-style entry of record `i`"""
+        run = self.runs[self._run_ids[i]]
+        return {
+            "timetable": self.decode(i),
+            "unallocated": self.unallocated(i),
+            "score": self.score(i),
+            "seed": int(self._seeds[i]),
+            "hash": f"{int(self._hashes[i]):016x}",
+            "engine": run["engine"],
+            "run": int(self._run_ids[i]),
+        }
+
+    def records(self, runs=None):
+        """One row per record: run, engine, seed, score, hash (optionally only some runs)"""
+        run_ids = self._run_ids[:self.size]
+        keep = np.isin(run_ids, list(runs)) if runs is not None else np.ones(self.size, dtype=bool)
+        positions = np.flatnonzero(keep)
+        engines = np.array([run["engine"] for run in self.runs] or [""], dtype=object)
+        return pd.DataFrame({
+            "Record": positions,
+            "Run": run_ids[positions],
+            "Engine": engines[run_ids[positions]],
+            "Seed": self._seeds[positions],
+            "Score": self._scores[positions].round(2),
+            "Hash": [f"{int(h):016x}" for h in self._hashes[positions]],
+        })
+
+    def find(self, record_hash, runs=None):
+        """
+        Newest record with hash `record_hash` (hex, as in records()), optionally only in
+        some runs; None once it has been dropped. Unlike record numbers, hashes do not shift.
+        """
+        matches = self._hashes[:self.size] == np.uint64(int(record_hash, 16))
+        if runs is not None:
+            matches &= np.isin(self._run_ids[:self.size], list(runs))
+        positions = np.flatnonzero(matches)
+        return int(positions[-1]) if len(positions) else None
+
+    def runs_matching(self, confirmed_theory, confirmed_lab):
+        """IDs of runs over the same subjects, whose records can be restored as-is"""
+        theory = [(s["name"], s["periods"]) for s in confirmed_theory]
+        labs = [l["name"] for l in confirmed_lab]
+        return [i for i, run in enumerate(self.runs) if run["theory"] == theory and run["labs"] == labs]
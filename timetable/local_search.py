@@ -0,0 +1,93 @@
+"""
+Local search over encoded timetables.
+
+Starts from a repaired random grid and repeatedly scores a batch of
+neighbours (slot swap + repair) in one vectorized call, moving to the best
+one if it is at least as good. After `restart_after` steps without
+improvement it restarts from a fresh grid.
+"""
+import random
+import time
+
+import numpy as np
+
+from timetable.core import TimetablePool, find_lab_conflicts
+from timetable.encoding import decode_timetable, unallocated_from_grid
+from timetable.genetic import IslandProblem
+from timetable.week import STANDARD_WEEK
+
+
+def local_search_timetables(confirmed_theory, confirmed_lab, teacher_free_periods=None, constraints=None,
+                            max_steps=2000, neighbours=32, restart_after=100, target_score=100,
+                            time_limit=None, pool_size=5, min_distance=4, seed=None, week=STANDARD_WEEK):
+    """
+    Hill-climb with sideways moves and restarts.
+    Returns (best_timetable, unallocated, score, pool, report), like
+    generate_timetable_with_optimization. The report has the stop reason
+    ("target", "time_limit" or "max_steps"), steps taken, restarts and
+    elapsed time.
+    """
+    lab_conflicts = find_lab_conflicts(confirmed_lab)
+    if lab_conflicts:
+        return None, lab_conflicts, -1, [], None
+
+    problem = IslandProblem(confirmed_theory, confirmed_lab, teacher_free_periods, constraints, week)
+    seed = random.getrandbits(32) if seed is None else seed
+    rng = np.random.default_rng(seed)
+    pool = TimetablePool(pool_size, min_distance)
+    started = time.monotonic()
+
+    current = problem.random_individual(rng)
+    current_score = float(problem.score(current[None])[0])
+    best_grid, best_score = current.copy(), current_score
+    stale = 0
+    stop_reason = "max_steps"
+    steps = restarts = 0
+
+    for steps in range(max_steps):
+        if best_score >= target_score:
+            stop_reason = "target"
+            break
+        if time_limit is not None and time.monotonic() - started >= time_limit:
+            stop_reason = "time_limit"
+            break
+
+        candidates = np.stack([
+            problem.repair(problem.mutate(current.copy(), rng), rng) for _ in range(neighbours)
+        ])
+        scores = problem.score(candidates)
+        i = int(np.argmax(scores))
+
+        if scores[i] >= current_score:
+            stale = stale + 1 if scores[i] == current_score else 0
+            current, current_score = candidates[i], float(scores[i])
+        else:
+            stale += 1
+
+        if current_score > best_score:
+            best_grid, best_score = current.copy(), current_score
+
+        if stale >= restart_after:
+            table = problem.subject_table
+            pool.offer(decode_timetable(current, table), unallocated_from_grid(current, table),
+                       current_score, seed)
+            current = problem.random_individual(rng)
+            current_score = float(problem.score(current[None])[0])
+            stale = 0
+            restarts += 1
+    else:
+        steps = max_steps
+
+    table = problem.subject_table
+    pool.offer(decode_timetable(current, table), unallocated_from_grid(current, table), current_score, seed)
+    pool.offer(decode_timetable(best_grid, table), unallocated_from_grid(best_grid, table), best_score, seed)
+
+    report = {
+        "stop_reason": stop_reason,
+        "steps": steps,
+        "restarts": restarts,
+        "optimal": False,
+        "elapsed": time.monotonic() - started,
+    }
+    best = pool.best()
+    return best["timetable"], best["unallocated"], best["score"], pool.entries, report
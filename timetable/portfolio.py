@@ -0,0 +1,263 @@
+"""
+Solver portfolio: race several engines under one deadline.
+
+Every configuration in the portfolio runs in its own process. The first one
+to reach the target score, or to prove its result optimal, wins and the
+others are terminated; if none does
+before the deadline, the best result that came back is used. A result that
+breaks a hard scheduling rule is rejected however well it scores. Each run
+produces a report naming the winner, which can be appended to a JSON-lines
+log and summarised to tune the default portfolio on past instances. The app
+logs every race to portfolio_log.jsonl in its working directory.
+
+Command line:
+    python -m timetable.portfolio portfolio_log.jsonl
+"""
+import argparse
+import json
+import multiprocessing
+import queue
+import random
+import time
+from collections import Counter, defaultdict
+
+from timetable.core import generate_timetable_with_optimization, find_lab_conflicts
+from timetable.genetic import evolve_timetables
+from timetable.local_search import local_search_timetables
+from timetable.exact import exact_available, solve_exact
+from timetable.week import STANDARD_WEEK
+
+
+def _run_greedy(confirmed_theory, confirmed_lab, teacher_free_periods, constraints, time_limit,
+                target_score, seed, **options):
+    options.setdefault("max_iterations", 1_000_000)
+    return generate_timetable_with_optimization(
+        confirmed_theory, confirmed_lab, teacher_free_periods=teacher_free_periods, constraints=constraints,
+        target_score=target_score, time_limit=time_limit, seed=seed, **options)
+
+
+def _run_genetic(confirmed_theory, confirmed_lab, teacher_free_periods, constraints, time_limit,
+                 target_score, seed, **options):
+    options.setdefault("generations", 1_000_000)
+    return evolve_timetables(
+        confirmed_theory, confirmed_lab, teacher_free_periods, constraints,
+        target_score=target_score, time_limit=time_limit, seed=seed, **options)
+
+
+def _run_local_search(confirmed_theory, confirmed_lab, teacher_free_periods, constraints, time_limit,
+                      target_score, seed, **options):
+    options.setdefault("max_steps", 1_000_000)
+    return local_search_timetables(
+        confirmed_theory, confirmed_lab, teacher_free_periods, constraints,
+        target_score=target_score, time_limit=time_limit, seed=seed, **options)
+
+
+def _run_exact(confirmed_theory, confirmed_lab, teacher_free_periods, constraints, time_limit,
+               target_score, seed, **options):
+    options.setdefault("workers", 1)
+    return solve_exact(confirmed_theory, confirmed_lab, teacher_free_periods, constraints,
+                       time_limit=time_limit, seed=seed, **options)
+
+
+# engine name -> runner(confirmed_theory, confirmed_lab, teacher_free_periods, constraints,
+#                       time_limit, target_score, seed, **options); every engine takes a `week` option
+# and returns (timetable, unallocated, score, pool, report)
+ENGINES = {
+    "greedy": _run_greedy,
+    "local_search": _run_local_search,
+    "genetic": _run_genetic,
+    "exact": _run_exact,
+}
+
+DEFAULT_PORTFOLIO = [
+    {"label": "greedy", "engine": "greedy", "options": {}},
+    {"label": "local search", "engine": "local_search", "options": {}},
+    # Islands run inside the engine's own process so terminating it stops everything
+    {"label": "genetic (2 islands)", "engine": "genetic", "options": {"islands": 2, "workers": 1}},
+]
+if exact_available():
+    DEFAULT_PORTFOLIO.append({"label": "exact (CP-SAT)", "engine": "exact", "options": {}})
+
+
+def instance_features(confirmed_theory, confirmed_lab, teacher_free_periods=None, week=STANDARD_WEEK):
+    """Cheap summary of an instance, logged with each portfolio run"""
+    teachers = {s.get("teacher") for s in confirmed_theory}
+    teacher_free_periods = teacher_free_periods or {}
+    return {
+        "theory_subjects": len(confirmed_theory),
+        "labs": len(confirmed_lab),
+        "theory_periods": sum(s["periods"] for s in confirmed_theory),
+        "load": sum(s["periods"] for s in confirmed_theory) + sum(week.session_length(l["session"])
+                                                                  for l in confirmed_lab),
+        "week": list(week.spec),
+        "teacher_free_periods": sum(len(teacher_free_periods.get(t, [])) for t in teachers),
+    }
+
+
+def _engine_worker(label, engine, options, args, deadline, result_queue):
+    started = time.monotonic()
+    try:
+        # The deadline is shared, so time spent starting this process counts against it
+        time_limit = max(0.0, deadline - time.time())
+        confirmed_theory, confirmed_lab, teacher_free_periods, constraints, target_score, seed = args
+        *result, engine_report = ENGINES[engine](confirmed_theory, confirmed_lab, teacher_free_periods,
+                                                 constraints, time_limit, target_score, seed, **options)
+        # A result the engine proved optimal ends the race too
+        optimal = bool(engine_report and engine_report.get("optimal"))
+        result_queue.put((label, tuple(result), optimal, time.monotonic() - started, None))
+    except Exception as e:
+        result_queue.put((label, None, False, time.monotonic() - started, repr(e)))
+
+
+def _hard_violations(constraints, timetable):
+    """Hard rule violations of one timetable (none without active constraints)"""
+    if constraints is None or not constraints.active:
+        return []
+    return constraints.evaluate(constraints.grid_from_timetable(timetable))[1]
+
+
+def run_portfolio(confirmed_theory, confirmed_lab, teacher_free_periods=None, constraints=None,
+                  portfolio=None, time_limit=30, target_score=100, seed=None, log_path=None, week=STANDARD_WEEK):
+    """
+    Race the portfolio configurations and return
+    (best_timetable, unallocated, score, pool, report).
+
+    The report records the winning configuration, why the race ended
+    ("target", "optimal", "deadline" or "exhausted") and per-engine outcomes.
+    """
+    portfolio = portfolio or DEFAULT_PORTFOLIO
+    lab_conflicts = find_lab_conflicts(confirmed_lab)
+    if lab_conflicts:
+        return None, lab_conflicts, -1, [], None
+
+    seed = random.getrandbits(32) if seed is None else seed
+    ctx = multiprocessing.get_context("spawn")
+    result_queue = ctx.Queue()
+    started = time.monotonic()
+    deadline = time.time() + time_limit
+
+    processes = {}
+    for i, config in enumerate(portfolio):
+        args = (confirmed_theory, confirmed_lab, teacher_free_periods, constraints, target_score, seed + i)
+        process = ctx.Process(target=_engine_worker,
+                              args=(config["label"], config["engine"], dict(config.get("options", {}), week=week),
+                                    args, deadline, result_queue))
+        process.start()
+        processes[config["label"]] = process
+
+    outcomes = {}
+    winner = None
+    reason = "exhausted"
+    # Engines stop themselves at the deadline; allow a little time to hand results back
+    grace = 5
+    try:
+        while len(outcomes) < len(processes):
+            timeout = started + time_limit + grace - time.monotonic()
+            if timeout <= 0:
+                reason = "deadline"
+                break
+            try:
+                label, result, optimal, elapsed, error = result_queue.get(timeout=timeout)
+            except queue.Empty:
+                reason = "deadline"
+                break
+            outcomes[label] = {"result": result, "optimal": optimal, "elapsed": elapsed, "error": error,
+                               "rejected": None}
+            if result is not None and result[0] is not None:
+                violations = _hard_violations(constraints, result[0])
+                if violations:
+                    outcomes[label]["rejected"] = violations[0]["message"]
+                    continue
+            if result is not None and result[0] is not None and result[2] >= target_score:
+                winner = label
+                reason = "target"
+                break
+            if result is not None and result[0] is not None and optimal:
+                winner = label
+                reason = "optimal"
+                break
+    finally:
+        for process in processes.values():
+            if process.is_alive():
+                process.terminate()
+        for process in processes.values():
+            process.join()
+
+    finished = {label: o for label, o in outcomes.items()
+                if o["result"] is not None and o["result"][0] is not None and not o["rejected"]}
+    if winner is None and finished:
+        winner = max(finished, key=lambda label: finished[label]["result"][2])
+        if reason == "exhausted" and time.monotonic() - started >= time_limit:
+            reason = "deadline"
+
+    report = {
+        "timestamp": time.time(),
+        "seed": seed,
+        "engine": winner,
+        "reason": reason,
+        "elapsed": time.monotonic() - started,
+        "target_score": target_score,
+        "features": instance_features(confirmed_theory, confirmed_lab, teacher_free_periods, week),
+        "engines": {
+            label: {
+                "score": o["result"][2] if o["result"] is not None else None,
+                "optimal": o["optimal"],
+                "elapsed": o["elapsed"],
+                "error": o["error"],
+                "rejected": o["rejected"],
+            }
+            for label, o in outcomes.items()
+        },
+    }
+    if log_path:
+        append_portfolio_log(log_path, report)
+
+    if winner is None:
+        return None, None, -1, [], report
+    timetable, unallocated, score, pool = finished[winner]["result"]
+    pool = [entry for entry in pool if not _hard_violations(constraints, entry["timetable"])]
+    return timetable, unallocated, score, pool, report
+
+
+def append_portfolio_log(path, report):
+    """Append one portfolio report to a JSON-lines log"""
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(report) + "\n")
+
+
+def summarize_portfolio_log(path):
+    """
+    Win counts and median winning time per engine from a portfolio log,
+    most frequent winner first.
+    """
+    wins = Counter()
+    times = defaultdict(list)
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            report = json.loads(line)
+            if report.get("engine"):
+                wins[report["engine"]] += 1
+                times[report["engine"]].append(report["elapsed"])
+    summary = []
+    for engine, count in wins.most_common():
+        elapsed = sorted(times[engine])
+        summary.append({"engine": engine, "wins": count, "median_elapsed": elapsed[len(elapsed) // 2]})
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarise a portfolio log: which engine wins, and how fast")
+    parser.add_argument("log", help="JSON-lines log written by run_portfolio (the app writes portfolio_log.jsonl)")
+    args = parser.parse_args(argv)
+
+    summary = summarize_portfolio_log(args.log)
+    if not summary:
+        print("No finished races in the log")
+    for row in summary:
+        print(f"{row['engine']}: {row['wins']} wins, median {row['median_elapsed']:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
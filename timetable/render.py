@@ -0,0 +1,207 @@
+"""
+Printable timetables, rendered in bulk.
+
+Each section and each teacher becomes one HTML page (and a PDF when
+WeasyPrint is installed) using the same cell colours as the Generate tab,
+with the BREAK column. Documents are rendered in a process pool; a manifest
+of content hashes in the output folder lets a re-run skip every document
+whose timetable has not changed.
+
+Command line:
+    python -m timetable.render timetables.parquet printouts [--pdf] [--workers N]
+"""
+import argparse
+import hashlib
+import html
+import json
+import multiprocessing
+import os
+import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from timetable.week import STANDARD_WEEK
+
+try:
+    import weasyprint
+except ImportError:
+    weasyprint = None
+
+RENDER_VERSION = "2"
+MANIFEST = "manifest.json"
+
+
+def pdf_available():
+    """True if PDFs can be rendered"""
+    return weasyprint is not None
+
+
+def create_display_timetable(timetable, week=STANDARD_WEEK):
+    """Create display version with break column"""
+    display_timetable = timetable.reindex(columns=week.periods)
+    display_timetable.insert(week.split, "BREAK", "BREAK")
+    return display_timetable
+
+
+def style_timetable(val):
+    """CSS for one timetable cell"""
+    if val == "BREAK":
+        return 'background-color: #1a1a1a; color: #fafafa; font-weight: bold; text-align: center'
+    if val == "Library":
+        return 'background-color: #1a4d2e; color: #fafafa'
+    if val == "":
+        return 'background-color: #0e1117; color: #fafafa'
+    return 'background-color: #262730; color: #fafafa; border: 1px solid #3d3d3d'
+
+
+def render_html(title, timetable, subtitle="", week=STANDARD_WEEK):
+    """Standalone printable HTML page for one timetable"""
+    display = create_display_timetable(timetable, week)
+    header = "".join(f"<th>{html.escape(c)}</th>" for c in display.columns)
+    rows = []
+    for day, row in display.iterrows():
+        cells = "".join(f'<td style="{style_timetable(v)}">{html.escape(str(v))}</td>' for v in row)
+        rows.append(f"<tr><th>{html.escape(str(day))}</th>{cells}</tr>")
+    return f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{html.escape(title)}</title>
+<style>
+@page {{ size: A4 landscape; margin: 12mm; }}
+body {{ font-family: sans-serif; background: #0e1117; color: #fafafa;
+        -webkit-print-color-adjust: exact; print-color-adjust: exact; }}
+table {{ border-collapse: collapse; width: 100%; table-layout: fixed; }}
+th, td {{ padding: 8px 6px; font-size: 12px; word-wrap: break-word; }}
+th {{ background: #262730; border: 1px solid #3d3d3d; }}
+</style></head>
+<body><h2>{html.escape(title)}</h2><p>{html.escape(subtitle)}</p>
+<table><tr><th></th>{header}</tr>
+{"".join(rows)}
+</table></body></html>
+"""
+
+
+def document_hash(title, subtitle, cells, week=STANDARD_WEEK):
+    """Content hash of everything that ends up on the page"""
+    digest = hashlib.sha1(f"{RENDER_VERSION}\x1e{title}\x1e{subtitle}\x1e{week.spec}\x1e".encode("utf-8"))
+    digest.update("\x1f".join(str(cell) for cell in cells.ravel()).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def file_stem(name):
+    return re.sub(r"[^\w.-]+", "_", name).strip("_")
+
+
+def unique_stems(prefix, names):
+    """
+    {name: prefixed file stem}; names whose stems collide ("CSE V A/B" and
+    "CSE V A B") each get a short hash of the name, so neither overwrites the other.
+    """
+    stems = {name: f"{prefix}_{file_stem(name)}" for name in names}
+    counts = Counter(stems.values())
+    for name, stem in stems.items():
+        if counts[stem] > 1:
+            stems[name] = f"{stem}_{hashlib.sha1(name.encode('utf-8')).hexdigest()[:6]}"
+    return stems
+
+
+def section_documents(saved_timetables):
+    """(stem, title, subtitle, cells) for every stored section"""
+    stems = unique_stems("section", saved_timetables)
+    return [
+        (stems[label], f"{label} Timetable",
+         " | ".join(str(entry.get(k, "")) for k in ("regulation", "section") if entry.get(k)),
+         entry.get("week", STANDARD_WEEK).cells(entry["timetable"]))
+        for label, entry in saved_timetables.items()
+    ]
+
+
+def teacher_documents(teacher_index):
+    """(stem, title, subtitle, cells) for every teacher in a TeacherIndex"""
+    stems = unique_stems("teacher", teacher_index.teachers)
+    return [
+        (stems[teacher], f"{teacher} - Personal Timetable",
+         f"{teacher_index.load(teacher)} periods per week",
+         teacher_index.personal_timetable(teacher).to_numpy(dtype=object))
+        for teacher in teacher_index.teachers
+    ]
+
+
+def _render_document(out_dir, stem, title, subtitle, cells, pdf, week):
+    page = render_html(title, week.timetable(cells), subtitle, week)
+    with open(os.path.join(out_dir, f"{stem}.html"), "w", encoding="utf-8") as f:
+        f.write(page)
+    if pdf:
+        weasyprint.HTML(string=page).write_pdf(os.path.join(out_dir, f"{stem}.pdf"))
+    return stem
+
+
+def render_batch(documents, out_dir, pdf=False, workers=None, force=False, week=STANDARD_WEEK):
+    """
+    Render documents (cells shaped like `week`) into `out_dir`, skipping those whose content hash matches
+    the manifest from the last run. Returns {"rendered": [...], "skipped": [...]}.
+    """
+    if pdf and weasyprint is None:
+        raise ImportError("PDF rendering needs WeasyPrint: pip install weasyprint")
+    duplicates = [stem for stem, count in Counter(doc[0] for doc in documents).items() if count > 1]
+    if duplicates:
+        raise ValueError(f"Documents share a file name: {', '.join(sorted(duplicates))}")
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, MANIFEST)
+    manifest = {}
+    if os.path.exists(manifest_path) and not force:
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+
+    extensions = ["html", "pdf"] if pdf else ["html"]
+    pending, skipped, hashes = [], [], {}
+    for stem, title, subtitle, cells in documents:
+        hashes[stem] = document_hash(title, subtitle, cells, week) + ("+pdf" if pdf else "")
+        outputs_exist = all(os.path.exists(os.path.join(out_dir, f"{stem}.{ext}")) for ext in extensions)
+        if manifest.get(stem) == hashes[stem] and outputs_exist:
+            skipped.append(stem)
+        else:
+            pending.append((stem, title, subtitle, cells))
+
+    workers = min(len(pending), workers or os.cpu_count() or 1)
+    if workers > 1:
+        # spawn, not fork: the Streamlit server process runs threads
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            futures = [executor.submit(_render_document, out_dir, *doc, pdf, week) for doc in pending]
+            rendered = [future.result() for future in futures]
+    else:
+        rendered = [_render_document(out_dir, *doc, pdf, week) for doc in pending]
+
+    manifest.update({stem: hashes[stem] for stem in rendered})
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    return {"rendered": rendered, "skipped": skipped}
+
+
+def main(argv=None):
+    from timetable.columnar import import_store
+    from timetable.teacher_index import TeacherIndex
+
+    parser = argparse.ArgumentParser(description="Render printable section and teacher timetables")
+    parser.add_argument("store", help="Parquet or Arrow export of the timetable store")
+    parser.add_argument("out_dir", help="Output folder (re-runs skip unchanged timetables)")
+    parser.add_argument("--pdf", action="store_true", help="Also write PDFs (needs WeasyPrint)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="Re-render everything")
+    args = parser.parse_args(argv)
+
+    with open(args.store, "rb") as f:
+        saved_timetables = import_store(f.read())
+    week = next(iter(saved_timetables.values()))["week"] if saved_timetables else STANDARD_WEEK
+    teacher_index = TeacherIndex(week)
+    for label, entry in saved_timetables.items():
+        teacher_index.save_section(label, entry["timetable"], entry["subject_teachers"])
+
+    documents = section_documents(saved_timetables) + teacher_documents(teacher_index)
+    result = render_batch(documents, args.out_dir, pdf=args.pdf, workers=args.workers, force=args.force,
+                          week=week)
+    print(f"Rendered {len(result['rendered'])}, skipped {len(result['skipped'])} unchanged")
+
+
+if __name__ == "__main__":
+    main()
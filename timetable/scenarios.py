@@ -0,0 +1,213 @@
+"""
+What-if scenarios, evaluated in parallel.
+
+A scenario is a named list of edits ("Dr. Ravi only teaches Mon-Wed", "add
+an elective", "move Physics Lab to Friday AN") against a base configuration
+of theory subjects, labs, teacher free periods and scheduling rules. Edits
+are plain dicts like scheduling rules, so scenarios can sit in session state.
+
+Applying edits is copy-on-write: the base is never modified, and a scenario
+copies only the subject records, and the one teacher's free periods, that
+its edits touch; everything else is shared with the base.
+
+Each scenario, and the base itself, is solved with the same seed in its own
+spawn-context worker process, and the comparison table reports feasibility,
+score, the score upper bound and disruption (how much of the base timetable
+regenerating under the scenario would move, see timetable.diff).
+"""
+import multiprocessing
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from timetable.core import generate_timetable_with_optimization, score_upper_bound, validate_constraints
+from timetable.analytics import timetable_cells
+from timetable.constraints import ConstraintRegistry
+from timetable.diff import diff_timetables
+from timetable.week import STANDARD_WEEK
+
+BASE = "Base"
+
+# edit type -> label
+EDIT_TYPES = {
+    "teacher_unavailable": "Teacher unavailable (part-time)",
+    "add_subject": "Add theory subject",
+    "remove_subject": "Remove subject",
+    "set_periods": "Change periods per week",
+    "assign_teacher": "Reassign subject",
+    "move_lab": "Move lab",
+}
+
+
+def base_configuration(confirmed_theory, confirmed_lab, teacher_free_periods=None, rules=None,
+                       week=STANDARD_WEEK):
+    """Snapshot of the inputs a scenario starts from"""
+    return {
+        "week": week,
+        "theory": tuple(confirmed_theory),
+        "labs": tuple(confirmed_lab),
+        "teacher_free_periods": dict(teacher_free_periods or {}),
+        "rules": tuple(rules or ()),
+    }
+
+
+def describe_edit(edit):
+    """One-line description of an edit"""
+    kind = edit["type"]
+    if kind == "teacher_unavailable":
+        days = ", ".join(edit["days"]) if edit.get("days") else "every day"
+        periods = ", ".join(edit["periods"]) if edit.get("periods") else "all periods"
+        return f"{edit['teacher']} unavailable on {days} ({periods})"
+    if kind == "add_subject":
+        return f"Add {edit['name']} ({edit['periods']} periods, {edit.get('teacher') or 'no teacher'})"
+    if kind == "remove_subject":
+        return f"Remove {edit['name']}"
+    if kind == "set_periods":
+        return f"{edit['name']}: {edit['periods']} periods per week"
+    if kind == "assign_teacher":
+        return f"{edit['name']} taught by {edit['teacher']}"
+    if kind == "move_lab":
+        return f"Move {edit['name']} to {edit['day']} {edit['session']}"
+    raise ValueError(f"Unknown edit type: {kind}")
+
+
+def _replace(records, name, **changes):
+    """Tuple with one record replaced by an updated copy"""
+    for i, record in enumerate(records):
+        if record["name"] == name:
+            return records[:i] + (dict(record, **changes),) + records[i + 1:]
+    raise ValueError(f"Unknown subject: {name}")
+
+
+def apply_edits(base, edits):
+    """Configuration with `edits` applied; unchanged records are shared with `base`"""
+    config = dict(base)
+    for edit in edits:
+        kind = edit["type"]
+        if kind == "teacher_unavailable":
+            free_periods = dict(config["teacher_free_periods"])
+            existing = [tuple(slot) for slot in free_periods.get(edit["teacher"], [])]
+            known = set(existing)
+            free_periods[edit["teacher"]] = existing + [
+                (day, period) for day in (edit.get("days") or config["week"].days)
+                for period in (edit.get("periods") or config["week"].periods)
+                if (day, period) not in known
+            ]
+            config["teacher_free_periods"] = free_periods
+        elif kind == "add_subject":
+            if any(s["name"] == edit["name"] for s in config["theory"] + config["labs"]):
+                raise ValueError(f"Subject already exists: {edit['name']}")
+            config["theory"] = config["theory"] + ({
+                "name": edit["name"], "code": edit.get("code", ""), "periods": int(edit["periods"]),
+                "teacher": edit.get("teacher"), "confirmed": True,
+            },)
+        elif kind == "remove_subject":
+            theory = tuple(s for s in config["theory"] if s["name"] != edit["name"])
+            labs = tuple(l for l in config["labs"] if l["name"] != edit["name"])
+            if len(theory) + len(labs) == len(config["theory"]) + len(config["labs"]):
+                raise ValueError(f"Unknown subject: {edit['name']}")
+            config["theory"], config["labs"] = theory, labs
+        elif kind == "set_periods":
+            config["theory"] = _replace(config["theory"], edit["name"], periods=int(edit["periods"]))
+        elif kind == "assign_teacher":
+            group = "theory" if any(s["name"] == edit["name"] for s in config["theory"]) else "labs"
+            config[group] = _replace(config[group], edit["name"], teacher=edit["teacher"])
+        elif kind == "move_lab":
+            if edit["session"] not in ("FN", "AN") or edit["day"] not in config["week"].day_index:
+                raise ValueError(f"Invalid lab slot: {edit['day']} {edit['session']}")
+            config["labs"] = _replace(config["labs"], edit["name"], day=edit["day"], session=edit["session"])
+        else:
+            raise ValueError(f"Unknown edit type: {kind}")
+    return config
+
+
+def _evaluate(name, config, max_iterations, seed):
+    """Solve one configuration; runs in a worker process"""
+    try:
+        theory, labs, week = list(config["theory"]), list(config["labs"]), config["week"]
+        constraints = ConstraintRegistry.from_config(config["rules"]).compile(theory, week)
+        timetable, unallocated, score, _, _ = generate_timetable_with_optimization(
+            theory, labs, max_iterations, teacher_free_periods=config["teacher_free_periods"],
+            constraints=constraints, seed=seed, week=week)
+        bound = score_upper_bound(theory, labs, config["teacher_free_periods"], week)["score"]
+        if timetable is None:
+            return {"name": name, "cells": None, "unallocated": unallocated, "score": None, "bound": bound,
+                    "violations": 0, "error": "; ".join(f"{a} and {b} both on {day} {session}"
+                                                        for a, b, day, session in unallocated)}
+        return {"name": name, "cells": timetable_cells(timetable, week), "unallocated": unallocated, "score": score,
+                "bound": bound, "violations": len(validate_constraints(timetable, theory, week)), "error": None}
+    except Exception as e:
+        return {"name": name, "cells": None, "unallocated": [], "score": None, "bound": None,
+                "violations": 0, "error": str(e)}
+
+
+def evaluate_scenarios(base, scenarios, base_timetable=None, max_iterations=100, seed=None, workers=None):
+    """
+    Evaluate {scenario name: [edits]} against `base` (see base_configuration).
+    Disruption is measured against `base_timetable` if given (e.g. the
+    published one), else against the base configuration's own result.
+    Returns (comparison DataFrame, {name: result}) where results hold the
+    scenario's "timetable" (or None), "unallocated", "score" and "config".
+    """
+    seed = random.getrandbits(32) if seed is None else seed
+    configs = {BASE: base}
+    errors = {}
+    for name, edits in scenarios.items():
+        try:
+            configs[name] = apply_edits(base, edits)
+        except (ValueError, KeyError) as e:
+            errors[name] = str(e)
+
+    jobs = [(name, config, max_iterations, seed) for name, config in configs.items()]
+    workers = min(len(jobs), workers or os.cpu_count() or 1)
+    if workers > 1:
+        # spawn, not fork: the Streamlit server process runs threads
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            solved = list(executor.map(_evaluate, *zip(*jobs)))
+    else:
+        solved = [_evaluate(*job) for job in jobs]
+    solved = {result["name"]: result for result in solved}
+
+    base_result = solved[BASE]
+    week = base["week"]
+    reference = timetable_cells(base_timetable, week) if base_timetable is not None else base_result["cells"]
+    base_teachers = {s["name"]: s.get("teacher") for s in base["theory"] + base["labs"]}
+
+    rows, results = [], {}
+    for name in [BASE, *scenarios]:
+        if name in errors:
+            rows.append({"Scenario": name, "Feasible": False, "Error": errors[name]})
+            continue
+        result = solved[name]
+        cells = result["cells"]
+        unallocated_periods = sum(u["remaining"] for u in result["unallocated"]) if cells is not None else None
+        row = {
+            "Scenario": name,
+            "Feasible": cells is not None and not unallocated_periods and not result["violations"],
+            "Score": round(result["score"], 1) if result["score"] is not None else None,
+            "Score Change": (round(result["score"] - base_result["score"], 1)
+                             if result["score"] is not None and base_result["score"] is not None else None),
+            "Upper Bound": round(result["bound"], 1) if result["bound"] is not None else None,
+            "Unallocated Periods": unallocated_periods,
+            "Violations": result["violations"],
+        }
+        if cells is not None and reference is not None:
+            teachers = {s["name"]: s.get("teacher") for s in configs[name]["theory"] + configs[name]["labs"]}
+            diff = diff_timetables(reference, cells, base_teachers, teachers, week=week)
+            row["Changed Slots"] = len(diff["slots"])
+            row["Disruption %"] = round(diff["disruption"] * 100, 1)
+        row["Error"] = result["error"]
+        rows.append(row)
+        results[name] = {
+            "timetable": week.timetable(cells) if cells is not None else None,
+            "unallocated": result["unallocated"],
+            "score": result["score"],
+            "config": configs[name],
+        }
+
+    columns = ["Scenario", "Feasible", "Score", "Score Change", "Upper Bound", "Unallocated Periods",
+               "Violations", "Changed Slots", "Disruption %", "Error"]
+    return pd.DataFrame(rows).reindex(columns=columns), results
+
@@ -0,0 +1,242 @@
+"""
+Scaling stress harness for the engines.
+
+Every engine in timetable.portfolio.ENGINES is run on synthetic instances
+(see timetable.synthetic) across a sweep of one parameter, section by
+section, recording runtime, peak Python memory (tracemalloc, which also
+counts NumPy buffers), score, the instance's score upper bound and how many
+periods were left unallocated. Each result goes through a correctness oracle
+built on validate_constraints, which also checks lab blocks, teacher free
+periods and that the reported unallocated periods match the grid, so a
+sweep shows both where an engine gets slow and where it starts producing
+wrong or incomplete timetables.
+
+Command line:
+    python -m timetable.stress subjects 4 6 8 10 --engines greedy genetic --sections 3 \
+        --time-limit 10 --csv stress.csv --plot stress.html
+    python -m timetable.stress periods 6 8 10 --days 6 --subjects 8
+"""
+import argparse
+import time
+import tracemalloc
+
+import pandas as pd
+
+from timetable.core import score_upper_bound, validate_constraints
+from timetable.encoding import LIBRARY_NAME
+from timetable.portfolio import ENGINES
+from timetable.synthetic import DEFAULTS, generate_instance
+from timetable.teacher_index import TeacherIndex
+from timetable.week import STANDARD_WEEK
+
+# engine -> options that keep a single stress run bounded (the time limit still applies)
+ENGINE_OPTIONS = {
+    "greedy": {"max_iterations": 200},
+    "local_search": {"max_steps": 2000},
+    "genetic": {"generations": 100, "islands": 2, "workers": 1},
+    "exact": {"workers": 1},
+}
+
+
+def check_result(timetable, unallocated, confirmed_theory, confirmed_lab, teacher_free_periods=None,
+                 week=STANDARD_WEEK):
+    """Problems with an engine's result, as messages; empty when it is correct"""
+    if timetable is None:
+        return ["no timetable returned"]
+    if not week.fits(timetable):
+        return ["timetable does not have the days and periods of the week"]
+    problems = [v["message"] for v in validate_constraints(timetable, confirmed_theory, week)]
+
+    for lab in confirmed_lab:
+        for period in week.session_periods(lab["session"]):
+            if timetable.loc[lab["day"], period] != lab["name"]:
+                problems.append(f"{lab['name']} is missing from {lab['day']} {period}")
+
+    known = {s["name"] for s in confirmed_theory} | {l["name"] for l in confirmed_lab} | {LIBRARY_NAME}
+    cells = timetable.to_numpy(dtype=object)
+    for name in sorted(set(cells.ravel()) - known, key=str):
+        problems.append(f"unknown subject '{name}' in the timetable")
+
+    teacher_free_periods = teacher_free_periods or {}
+    reported = {u["subject"]: u["remaining"] for u in (unallocated or [])}
+    for subject in confirmed_theory:
+        allocated = int((cells == subject["name"]).sum())
+        if allocated > subject["periods"]:
+            problems.append(f"{subject['name']} has {allocated} periods, needs {subject['periods']}")
+        if reported.get(subject["name"], 0) != max(subject["periods"] - allocated, 0):
+            problems.append(f"{subject['name']} reports {reported.get(subject['name'], 0)} unallocated periods, "
+                            f"the timetable is short of {max(subject['periods'] - allocated, 0)}")
+        for day, period in map(tuple, teacher_free_periods.get(subject.get("teacher"), [])):
+            if timetable.loc[day, period] == subject["name"]:
+                problems.append(f"{subject['name']} is in {subject['teacher']}'s free period {day} {period}")
+    return problems
+
+
+def run_engine(engine, confirmed_theory, confirmed_lab, teacher_free_periods=None, time_limit=10, seed=0,
+               options=None, track_memory=True, teacher_index=None, section=None, week=STANDARD_WEEK):
+    """
+    Run one engine on one section; returns a row of measurements and oracle
+    results. With a TeacherIndex, the timetable is saved in it as `section`.
+    """
+    options = dict(ENGINE_OPTIONS.get(engine, {}), **(options or {}), week=week)
+    bound = score_upper_bound(confirmed_theory, confirmed_lab, teacher_free_periods, week)["score"]
+    if track_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        result = ENGINES[engine](confirmed_theory, confirmed_lab, teacher_free_periods, None,
+                                 time_limit, 100, seed, **options)
+        error = None
+    except Exception as e:
+        result, error = (None, None, -1, [], None), repr(e)
+    runtime = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1] if track_memory else None
+    if track_memory:
+        tracemalloc.stop()
+
+    timetable, unallocated, score = result[:3]
+    problems = [error] if error else check_result(timetable, unallocated, confirmed_theory, confirmed_lab,
+                                                  teacher_free_periods, week)
+    if teacher_index is not None and timetable is not None:
+        teacher_index.save_section(section, timetable, {s["name"]: s.get("teacher")
+                                                        for s in list(confirmed_theory) + list(confirmed_lab)})
+    return {
+        "Engine": engine,
+        "Runtime (s)": runtime,
+        "Peak Memory (MB)": peak / 2 ** 20 if peak is not None else None,
+        "Score": score if timetable is not None else None,
+        "Upper Bound": bound,
+        "Gap": bound - score if timetable is not None else None,
+        "Unallocated Periods": sum(u["remaining"] for u in unallocated) if timetable is not None else None,
+        "Problems": len(problems),
+        "Correct": not problems,
+        "First Problem": problems[0] if problems else None,
+    }
+
+
+def run_sweep(parameter, values, engines=("greedy",), base=None, seeds=(0,), time_limit=10,
+              engine_options=None, track_memory=True, progress=None):
+    """
+    Run every engine on every section of the instance for each value of
+    `parameter` (a timetable.synthetic parameter) and seed, other parameters
+    from `base`. Returns one row per run; `progress(done, total)` is called
+    after each. Sections are solved independently, as in the app, so
+    "Teacher Clashes" counts the slots where a shared teacher ended up booked
+    in two sections of the same instance by the same engine.
+    """
+    if parameter not in DEFAULTS:
+        raise ValueError(f"Unknown instance parameter: {parameter}")
+    engine_options = engine_options or {}
+    instances = [(value, seed, generate_instance(seed, **dict(base or {}, **{parameter: value})))
+                 for value in values for seed in seeds]
+    total = sum(len(instance["sections"]) for _, _, instance in instances) * len(engines)
+    rows = []
+    for value, seed, instance in instances:
+        for engine in engines:
+            teacher_index = TeacherIndex(instance["week"])
+            first = len(rows)
+            for label, section in instance["sections"].items():
+                row = run_engine(engine, section["theory"], section["labs"], instance["teacher_free_periods"],
+                                 time_limit, seed, engine_options.get(engine), track_memory, teacher_index, label,
+                                 instance["week"])
+                rows.append({parameter: value, "Seed": seed, "Section": label,
+                             "Load": round(instance["load"][label], 3), **row})
+                if progress is not None:
+                    progress(len(rows), total)
+            clashes = len(teacher_index.clashes())
+            for row in rows[first:]:
+                row["Teacher Clashes"] = clashes
+    return pd.DataFrame(rows)
+
+
+def summarize_sweep(results, parameter):
+    """Per engine and parameter value: median runtime, peak memory, mean score and gap, failures"""
+    summary = results.groupby(["Engine", parameter], sort=False).agg(
+        Runs=("Correct", "size"),
+        Failures=("Correct", lambda ok: int((~ok).sum())),
+        **{"Median Runtime (s)": ("Runtime (s)", "median"),
+           "Peak Memory (MB)": ("Peak Memory (MB)", "max"),
+           "Mean Score": ("Score", "mean"),
+           "Mean Gap": ("Gap", "mean"),
+           "Unallocated Periods": ("Unallocated Periods", "sum"),
+           "Teacher Clashes": ("Teacher Clashes", "max")},
+    ).reset_index()
+    return summary.round(3)
+
+
+def breaking_points(results, parameter):
+    """
+    First parameter value, per engine, at which a result was "incorrect" or
+    fell "below_bound" (short of the instance's score upper bound), and the
+    first value at which instances were "overloaded" (not every period can be
+    placed at all); None where it never happened.
+    """
+    def first(rows):
+        return rows[parameter].min() if len(rows) else None
+
+    points = {}
+    for engine, rows in results.groupby("Engine", sort=False):
+        points[engine] = {
+            "incorrect": first(rows[~rows["Correct"]]),
+            "below_bound": first(rows[rows["Gap"].fillna(float("inf")) > 1e-6]),
+            "overloaded": first(rows[rows["Upper Bound"] < 100]),
+        }
+    return points
+
+
+def plot_sweep(results, parameter):
+    """Plotly figure of runtime, memory and score curves per engine"""
+    from plotly.subplots import make_subplots
+    import plotly.graph_objects as go
+
+    summary = summarize_sweep(results, parameter)
+    metrics = ["Median Runtime (s)", "Peak Memory (MB)", "Mean Score"]
+    fig = make_subplots(rows=len(metrics), cols=1, shared_xaxes=True, subplot_titles=metrics)
+    for i, engine in enumerate(summary["Engine"].unique()):
+        rows = summary[summary["Engine"] == engine]
+        for row, metric in enumerate(metrics, start=1):
+            fig.add_trace(go.Scatter(x=rows[parameter], y=rows[metric], mode="lines+markers", name=engine,
+                                     legendgroup=engine, showlegend=row == 1,
+                                     line={"color": f"hsl({i * 70}, 60%, 45%)"}), row=row, col=1)
+    fig.update_xaxes(title_text=parameter, row=len(metrics), col=1)
+    fig.update_layout(height=300 * len(metrics), title=f"Engines across {parameter}")
+    return fig
+
+
+def _number(text):
+    return float(text) if "." in text else int(text)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the engines across a sweep of synthetic instances")
+    parser.add_argument("parameter", choices=sorted(DEFAULTS), help="Instance parameter to sweep")
+    parser.add_argument("values", nargs="+", type=_number, help="Values of the swept parameter")
+    parser.add_argument("--engines", nargs="+", default=["greedy"], choices=sorted(ENGINES))
+    for name, default in DEFAULTS.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", dest=name, type=type(default), default=None,
+                            help=f"Fixed value when not swept (default: {default})")
+    parser.add_argument("--seeds", type=int, default=1, help="Instances per value")
+    parser.add_argument("--time-limit", type=float, default=10, help="Seconds per engine run")
+    parser.add_argument("--no-memory", action="store_true", help="Skip tracemalloc (it slows runs down)")
+    parser.add_argument("--csv", help="Write every run to this CSV file")
+    parser.add_argument("--plot", help="Write the runtime, memory and score curves to this HTML file")
+    args = parser.parse_args(argv)
+
+    base = {name: getattr(args, name) for name in DEFAULTS if getattr(args, name) is not None}
+    results = run_sweep(args.parameter, args.values, args.engines, base, range(args.seeds), args.time_limit,
+                        track_memory=not args.no_memory,
+                        progress=lambda done, total: print(f"\r{done}/{total} runs", end="", flush=True))
+    print()
+    print(summarize_sweep(results, args.parameter).to_string(index=False))
+    for engine, points in breaking_points(results, args.parameter).items():
+        found = [f"{kind.replace('_', ' ')} from {args.parameter}={value}"
+                 for kind, value in points.items() if value is not None]
+        print(f"{engine}: " + ("; ".join(found) if found else "correct and optimal across the sweep"))
+    if args.csv:
+        results.to_csv(args.csv, index=False)
+    if args.plot:
+        plot_sweep(results, args.parameter).write_html(args.plot)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Indexed subject store.
+
+Theory and lab subjects are slotted records with a stable integer id. The
+store keeps them in insertion order per kind, with hash indexes on name and
+code (for duplicate checks) and on lab (day, session) (for lab clashes), so
+lookups, duplicate checks, deletes and restores do not scan the subject
+lists.
+
+Records read like the dicts the engines were written for (record["name"],
+record.get("teacher")), so the confirmed lists the UI shows are passed to
+the solvers as they are.
+"""
+import dataclasses
+from dataclasses import dataclass
+
+THEORY = "theory"
+LAB = "lab"
+KINDS = (THEORY, LAB)
+
+
+@dataclass(slots=True, eq=False)
+class Subject:
+    """One theory or lab subject; unset optional fields are None"""
+    id: int
+    kind: str
+    name: str
+    code: str
+    credit: int | None = None
+    periods: int | None = None  # theory periods per week; a lab takes a whole session
+    teacher: str | None = None
+    confirmed: bool = False
+    is_predefined: bool = False
+    day: str | None = None
+    session: str | None = None
+    floor: str | None = None
+    needs_schedule: bool = False
+    catalog_id: int | None = None  # the shared catalog entry a predefined subject was loaded from
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        if key not in FIELDS:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in FIELDS
+
+    def get(self, key, default=None):
+        """Field value, or `default` when it is unset (None), as for a dict without the key"""
+        value = getattr(self, key, None)
+        return default if value is None else value
+
+    def keys(self):
+        return FIELDS
+
+    def copy(self):
+        return dataclasses.replace(self)
+
+
+FIELDS = tuple(field.name for field in dataclasses.fields(Subject))
+
+
+class SubjectStore:
+    """Theory and lab subjects of one configuration, indexed by id, name, code and lab slot"""
+
+    def __init__(self):
+        self._next_id = 1
+        self.records = {}  # id -> Subject, in insertion order
+        self.deleted = {}  # id -> Subject removed with keep=True, restorable
+        self._names = {}  # (kind, name) -> id
+        self._codes = {}  # (kind, code) -> id
+        self._lab_slots = {}  # (day, session) -> id of the lab holding it
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, subject_id):
+        return self.records[subject_id]
+
+    def of_kind(self, kind):
+        """Subjects of one kind, in the order they were added"""
+        return [record for record in self.records.values() if record.kind == kind]
+
+    def confirmed(self, kind):
+        """Confirmed subjects of one kind (for labs, only scheduled ones), ready for the engines"""
+        return [record for record in self.records.values()
+                if record.kind == kind and record.confirmed and not record.needs_schedule]
+
+    def by_name(self, kind, name):
+        subject_id = self._names.get((kind, name))
+        return None if subject_id is None else self.records[subject_id]
+
+    def by_code(self, kind, code):
+        subject_id = self._codes.get((kind, code))
+        return None if subject_id is None else self.records[subject_id]
+
+    def duplicate(self, kind, name, code):
+        """The existing subject of `kind` with this name or code, if any"""
+        return self.by_name(kind, name) or self.by_code(kind, code)
+
+    def lab_at(self, day, session):
+        """The lab scheduled in a (day, session), if any"""
+        subject_id = self._lab_slots.get((day, session))
+        return None if subject_id is None else self.records[subject_id]
+
+    def add(self, kind, name, code, **fields):
+        """Add a subject; raises ValueError if its name, code or lab slot is taken"""
+        if kind not in KINDS:
+            raise ValueError(f"Unknown subject kind: {kind}")
+        record = Subject(self._next_id, kind, name, code, **fields)
+        self._insert(record)
+        self._next_id += 1
+        return record
+
+    def add_from_catalog(self, entry, **fields):
+        """Add a predefined subject from a catalog entry, sharing its name and code"""
+        return self.add(entry.kind, entry.name, entry.code, credit=entry.credit, periods=entry.periods,
+                        is_predefined=True, catalog_id=entry.id, **fields)
+
+    def _insert(self, record):
+        existing = self.duplicate(record.kind, record.name, record.code)
+        if existing is not None:
+            raise ValueError(f"{existing.name} ({existing.code}) already exists")
+        holder = self._lab_holder(record, record.day, record.session)
+        if holder is not None:
+            raise ValueError(f"Conflict with {holder.name} on {record.day} {record.session}")
+        self.records[record.id] = record
+        self._names[(record.kind, record.name)] = record.id
+        self._codes[(record.kind, record.code)] = record.id
+        if record.kind == LAB and record.day and record.session:
+            self._lab_slots[(record.day, record.session)] = record.id
+
+    def _lab_holder(self, record, day, session):
+        if record.kind != LAB or not day or not session:
+            return None
+        holder = self.lab_at(day, session)
+        return None if holder is None or holder.id == record.id else holder
+
+    def remove(self, subject_id, keep=False):
+        """Remove a subject; with `keep` it can be restored later under the same id"""
+        record = self.records.pop(subject_id)
+        del self._names[(record.kind, record.name)]
+        del self._codes[(record.kind, record.code)]
+        if self._lab_slots.get((record.day, record.session)) == subject_id:
+            del self._lab_slots[(record.day, record.session)]
+        if keep:
+            self.deleted[subject_id] = record.copy()
+        return record
+
+    def restore(self, subject_id, **changes):
+        """Put a kept subject back (with `changes` applied); raises ValueError if it now clashes"""
+        record = dataclasses.replace(self.deleted[subject_id], **changes)
+        self._insert(record)
+        del self.deleted[subject_id]
+        return record
+
+    def schedule_lab(self, subject_id, day, session, **changes):
+        """Move a lab to (day, session); raises ValueError if another lab holds it"""
+        record = self.records[subject_id]
+        holder = self._lab_holder(record, day, session)
+        if holder is not None:
+            raise ValueError(f"Conflict with {holder.name} on {day} {session}")
+        if self._lab_slots.get((record.day, record.session)) == subject_id:
+            del self._lab_slots[(record.day, record.session)]
+        record.day, record.session = day, session
+        for key, value in changes.items():
+            record[key] = value
+        if day and session:
+            self._lab_slots[(day, session)] = subject_id
+        return record
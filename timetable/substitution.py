@@ -0,0 +1,151 @@
+"""
+Substitute-teacher finder.
+
+Every stored section timetable is folded into a teacher x day x period
+occupancy array, plus each teacher's daily load and the subjects they teach.
+A cover query is then a few array lookups: free teachers at the slot, minus
+their own free-period preferences, ranked by
+
+1. qualified (already teaches the subject somewhere)
+2. already teaches the section
+3. lowest load on that day
+"""
+import numpy as np
+
+from timetable.teacher_index import NOT_TAUGHT
+from timetable.week import STANDARD_WEEK
+
+
+class OccupancyIndex:
+    """Who teaches where, across all stored section timetables of one week shape"""
+
+    def __init__(self, teachers=(), teacher_subjects=None, week=STANDARD_WEEK):
+        self.week = week
+        self.teachers = []
+        self.teacher_index = {}
+        self.busy = np.zeros((0,) + week.shape, dtype=bool)
+        self.load = np.zeros((0, len(week.days)), dtype=np.int64)
+        self.subjects = []  # teacher id -> set of subject names
+        self.sections = {}  # section -> set of teacher ids
+        self.slots = {}  # (section, day, period) -> (subject, teacher)
+        for teacher in teachers:
+            self._teacher_id(teacher)
+        # Assigned subjects count as qualifications even before a timetable is stored
+        for teacher, subjects in (teacher_subjects or {}).items():
+            self.subjects[self._teacher_id(teacher)].update(subjects)
+
+    def _teacher_id(self, teacher):
+        if teacher not in self.teacher_index:
+            self.teacher_index[teacher] = len(self.teachers)
+            self.teachers.append(teacher)
+            self.subjects.append(set())
+            self.busy = np.concatenate([self.busy, np.zeros((1,) + self.week.shape, dtype=bool)])
+            self.load = np.concatenate([self.load, np.zeros((1, len(self.week.days)), dtype=np.int64)])
+        return self.teacher_index[teacher]
+
+    @classmethod
+    def from_store(cls, saved_timetables, teachers=(), teacher_subjects=None, week=STANDARD_WEEK):
+        """Index every entry of a {section: {"timetable", "subject_teachers"}} store"""
+        index = cls(teachers, teacher_subjects, week)
+        for section, entry in saved_timetables.items():
+            index.add_section(section, entry["timetable"], entry["subject_teachers"])
+        return index
+
+    @classmethod
+    def from_teacher_index(cls, teacher_index, teachers=(), teacher_subjects=None):
+        """Build from a TeacherIndex without rescanning the section grids"""
+        index = cls(teachers, teacher_subjects, teacher_index.week)
+        for section, rows in teacher_index.by_section.items():
+            members = index.sections.setdefault(section, set())
+            for teacher, day, period, subject in rows:
+                index._book(section, teacher, day, period, subject, members)
+        return index
+
+    def _book(self, section, teacher, day, period, subject, members):
+        t = self._teacher_id(teacher)
+        d = self.week.day_index[day]
+        self.busy[t, d, self.week.period_index[period]] = True
+        self.load[t, d] += 1
+        self.subjects[t].add(subject)
+        members.add(t)
+        self.slots[(section, day, period)] = (subject, teacher)
+
+    def add_section(self, section, timetable, subject_teachers):
+        """Fold one section timetable into the index"""
+        members = self.sections.setdefault(section, set())
+        for (day, period), subject in zip(self.week.slots, self.week.cells(timetable).ravel()):
+            teacher = subject_teachers.get(subject)
+            if subject in NOT_TAUGHT or not teacher:
+                continue
+            self._book(section, teacher, day, period, subject, members)
+
+    def classes_on(self, teacher, day):
+        """(section, period, subject) for every class `teacher` has on `day`"""
+        return sorted((
+            (section, period, subject)
+            for (section, d, period), (subject, t) in self.slots.items()
+            if t == teacher and d == day
+        ), key=lambda c: (c[0], self.week.period_index[c[1]], c[2]))
+
+    def _candidates(self, section, day, period, busy, load, teacher_free_periods, exclude):
+        d, p = self.week.day_index[day], self.week.period_index[period]
+        subject, owner = self.slots.get((section, day, period), (None, None))
+        free = ~busy[:, d, p]
+        for teacher in set(exclude) | {owner}:
+            if teacher in self.teacher_index:
+                free[self.teacher_index[teacher]] = False
+        for teacher, periods in (teacher_free_periods or {}).items():
+            if teacher in self.teacher_index and (day, period) in {tuple(x) for x in periods}:
+                free[self.teacher_index[teacher]] = False
+
+        members = self.sections.get(section, set())
+        ranked = []
+        for t in np.flatnonzero(free):
+            ranked.append({
+                "teacher": self.teachers[t],
+                "qualified": subject in self.subjects[t],
+                "same_section": t in members,
+                "load": int(load[t, d]),
+            })
+        ranked.sort(key=lambda c: (not c["qualified"], not c["same_section"], c["load"], c["teacher"]))
+        return ranked
+
+    def find_substitutes(self, section, day, period, teacher_free_periods=None, exclude=(), limit=None):
+        """
+        Ranked free teachers who could cover `section` at `day` `period`.
+        `exclude` removes absent teachers; the slot's own teacher is always excluded.
+        """
+        ranked = self._candidates(section, day, period, self.busy, self.load, teacher_free_periods, exclude)
+        return ranked[:limit] if limit else ranked
+
+    def cover_day(self, day, absent_teachers, teacher_free_periods=None):
+        """
+        Assign a substitute to every class the absent teachers have on `day`.
+        Each assignment books the substitute, so nobody is given two classes at
+        once and load stays balanced. Classes nobody can take get substitute None.
+        """
+        busy = self.busy.copy()
+        load = self.load.copy()
+        d = self.week.day_index[day]
+        plan = []
+        for absent in absent_teachers:
+            for section, period, subject in self.classes_on(absent, day):
+                ranked = self._candidates(section, day, period, busy, load,
+                                          teacher_free_periods, absent_teachers)
+                substitute = ranked[0] if ranked else None
+                if substitute is not None:
+                    t = self.teacher_index[substitute["teacher"]]
+                    busy[t, d, self.week.period_index[period]] = True
+                    load[t, d] += 1
+                plan.append({
+                    "section": section,
+                    "day": day,
+                    "period": period,
+                    "subject": subject,
+                    "absent": absent,
+                    "substitute": substitute["teacher"] if substitute else None,
+                    "qualified": substitute["qualified"] if substitute else False,
+                    "load": substitute["load"] if substitute else None,
+                })
+        plan.sort(key=lambda row: (self.week.period_index[row["period"]], row["section"]))
+        return plan
@@ -0,0 +1,94 @@
+"""
+Reproducible synthetic scheduling instances.
+
+The predefined catalog only has small department semesters. An instance here
+is a set of sections taking the same course list, the way the sections of
+one semester do, generated from a seed and a handful of parameters:
+- sections, subjects per section and the range of periods per subject
+- labs per section, each in its own day and session
+- teacher sharing: the chance that a course in a section is taught by a
+  teacher who already teaches it in another section
+- free-period density: the share of the week each teacher marks free
+- the week shape: days, periods per day and forenoon periods
+
+The same parameters and seed always give the same instance.
+"""
+import random
+
+from timetable.week import SESSIONS, Week
+
+DEFAULTS = {
+    "sections": 1,
+    "subjects": 6,
+    "min_periods": 3,
+    "max_periods": 5,
+    "labs": 2,
+    "teacher_sharing": 0.0,
+    "free_density": 0.0,
+    "days": 5,
+    "periods": 8,
+    "forenoon": 0,  # 0: half the day, rounded up
+}
+
+
+def generate_instance(seed=0, **params):
+    """
+    Synthetic instance for `params` (see DEFAULTS). Returns
+    {"params", "seed", "week", "sections": {label: {"theory", "labs"}},
+    "teacher_free_periods", "load"}; subject records look like the app's, and
+    "load" is each section's periods against the slots of the week.
+    """
+    unknown = set(params) - set(DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown instance parameters: {', '.join(sorted(unknown))}")
+    params = dict(DEFAULTS, **params)
+    week = Week(params["days"], params["periods"], params["forenoon"] or None)
+    if params["labs"] > len(SESSIONS) * len(week.days):
+        raise ValueError(f"At most {len(SESSIONS) * len(week.days)} labs fit in a week")
+    if not 1 <= params["min_periods"] <= params["max_periods"]:
+        raise ValueError("Periods per subject must satisfy 1 <= min_periods <= max_periods")
+    rng = random.Random(seed)
+
+    courses = [(f"Subject {i + 1}", f"SYN{i + 1:03d}") for i in range(params["subjects"])]
+    lab_courses = [(f"Lab {i + 1}", f"SYNL{i + 1:02d}") for i in range(params["labs"])]
+    # course -> teachers already teaching it in some section
+    course_teachers = {}
+    teachers = []
+
+    def teacher_for(course):
+        existing = course_teachers.setdefault(course, [])
+        if existing and rng.random() < params["teacher_sharing"]:
+            return rng.choice(existing)
+        teacher = f"Teacher {len(teachers) + 1}"
+        teachers.append(teacher)
+        existing.append(teacher)
+        return teacher
+
+    sections = {}
+    for s in range(params["sections"]):
+        theory = [{
+            "name": name, "code": code, "periods": rng.randint(params["min_periods"], params["max_periods"]),
+            "teacher": teacher_for(name), "confirmed": True,
+        } for name, code in courses]
+        lab_slots = rng.sample([(day, session) for day in week.days for session in SESSIONS], params["labs"])
+        labs = [{
+            "name": name, "code": code, "day": day, "session": session, "floor": "Ground Floor",
+            "teacher": teacher_for(name), "confirmed": True,
+        } for (name, code), (day, session) in zip(lab_courses, lab_slots)]
+        sections[f"Section {s + 1}"] = {"theory": theory, "labs": labs}
+
+    free_count = round(params["free_density"] * week.slot_count)
+    teacher_free_periods = {teacher: sorted(rng.sample(week.slots, free_count))
+                            for teacher in teachers if free_count}
+
+    load = {label: (sum(s["periods"] for s in section["theory"])
+                    + sum(week.session_length(l["session"]) for l in section["labs"])) / week.slot_count
+            for label, section in sections.items()}
+    return {
+        "params": params,
+        "seed": seed,
+        "week": week,
+        "sections": sections,
+        "teacher_free_periods": teacher_free_periods,
+        "load": load,
+    }
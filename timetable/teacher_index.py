@@ -0,0 +1,81 @@
+"""
+Inverted teacher -> slot index over stored section timetables.
+
+Saving a section only touches that section's entries, so personal
+timetables, loads and clash reports are read straight from the index
+instead of scanning every section grid.
+"""
+from collections import defaultdict
+
+from timetable.week import STANDARD_WEEK
+
+NOT_TAUGHT = {"", "Library", "BREAK"}
+
+
+class TeacherIndex:
+    """teacher -> {(section, day, period, subject)}, kept up to date per saved section of one week shape"""
+
+    def __init__(self, week=STANDARD_WEEK):
+        self.week = week
+        self.entries = defaultdict(set)  # teacher -> {(section, day, period, subject)}
+        self.by_section = {}  # section -> [(teacher, day, period, subject)]
+        self.slot_sections = defaultdict(set)  # (teacher, day, period) -> {(section, subject)}
+
+    def save_section(self, section, timetable, subject_teachers):
+        """Replace a section's entries with those of `timetable`"""
+        self.remove_section(section)
+        rows = []
+        for (day, period), subject in zip(self.week.slots, self.week.cells(timetable).ravel()):
+            teacher = subject_teachers.get(subject)
+            if subject in NOT_TAUGHT or not teacher:
+                continue
+            rows.append((teacher, day, period, subject))
+            self.entries[teacher].add((section, day, period, subject))
+            self.slot_sections[(teacher, day, period)].add((section, subject))
+        self.by_section[section] = rows
+
+    def remove_section(self, section):
+        for teacher, day, period, subject in self.by_section.pop(section, []):
+            self.entries[teacher].discard((section, day, period, subject))
+            if not self.entries[teacher]:
+                del self.entries[teacher]
+            key = (teacher, day, period)
+            self.slot_sections[key].discard((section, subject))
+            if not self.slot_sections[key]:
+                del self.slot_sections[key]
+
+    @property
+    def teachers(self):
+        return sorted(self.entries)
+
+    @property
+    def sections(self):
+        return sorted(self.by_section)
+
+    def load(self, teacher):
+        """Periods per week across all sections"""
+        return len(self.entries.get(teacher, ()))
+
+    def personal_timetable(self, teacher):
+        """Days x periods grid of "subject (section)" for one teacher; clashing classes are joined with " / " """
+        timetable = self.week.empty_timetable()
+        for section, day, period, subject in sorted(self.entries.get(teacher, ())):
+            cell = f"{subject} ({section})"
+            current = timetable.loc[day, period]
+            timetable.loc[day, period] = f"{current} / {cell}" if current else cell
+        return timetable
+
+    def clashes(self, teacher=None):
+        """Slots where a teacher is booked in more than one section"""
+        report = []
+        for (t, day, period), booked in self.slot_sections.items():
+            if len(booked) > 1 and (teacher is None or t == teacher):
+                report.append({
+                    "teacher": t,
+                    "day": day,
+                    "period": period,
+                    "sections": sorted(section for section, _ in booked),
+                    "subjects": sorted({subject for _, subject in booked}),
+                })
+        report.sort(key=lambda c: (c["teacher"], self.week.day_index[c["day"]], self.week.period_index[c["period"]]))
+        return report
@@ -0,0 +1,191 @@
+"""
+Term calendar built from one base week.
+
+The base week is generated once with the usual engines. Every calendar week
+is derived from it incrementally:
+
+- exam weeks carry no classes
+- a holiday blanks its day, and only the periods lost that day are moved
+  into Library slots elsewhere in the same week (same rules as the
+  generator: at most 2 periods a day in one session, teacher free periods
+  and hard scheduling rules respected); a lost lab moves to a fully free
+  session if there is one
+- a compensatory Saturday follows the timetable of a given weekday and
+  gives back that day's periods before anything is rescheduled (only in
+  weeks that do not already teach on Saturday)
+
+Weeks with the same holidays and Saturday share one cached derivation, so a
+16-week term costs a handful of small repairs.
+"""
+import datetime
+
+import pandas as pd
+
+from timetable.constraints import EMPTY
+from timetable.week import SESSIONS, STANDARD_WEEK
+
+HOLIDAY = "Holiday"
+EXAM = "Exam"
+SATURDAY = "Saturday"
+
+
+class TermPlanner:
+    """Derive and cache the weeks of a term from a base timetable"""
+
+    def __init__(self, base_timetable, confirmed_theory, confirmed_lab, teacher_free_periods=None,
+                 constraints=None, week=STANDARD_WEEK):
+        self.base = base_timetable
+        self.week = week
+        self.teachers = {s["name"]: s.get("teacher") for s in confirmed_theory}
+        self.lab_sessions = {l["name"]: l.get("session", "FN") for l in confirmed_lab}
+        self.teacher_free_periods = teacher_free_periods or {}
+        self.constraints = constraints if constraints is not None and constraints.active else None
+        self._cache = {}
+
+    def derive_week(self, lost_days=(), saturday_follows=None, exam=False):
+        """
+        Timetable for one week, cached by its holidays and compensatory Saturday.
+        Returns {"timetable", "rescheduled": [(subject, day, period)], "unplaced": [{"subject", "periods"}]}.
+        """
+        key = (tuple(sorted(lost_days, key=self.week.day_index.get)), saturday_follows, exam)
+        if key not in self._cache:
+            if exam:
+                week = {"timetable": self.week.empty_timetable(EXAM),
+                        "rescheduled": [], "unplaced": []}
+            else:
+                week = self._derive(key[0], saturday_follows)
+            self._cache[key] = week
+        return self._cache[key]
+
+    def _derive(self, lost_days, saturday_follows):
+        timetable = self.base.copy()
+        if saturday_follows:
+            timetable.loc[SATURDAY] = self.base.loc[saturday_follows]
+        for day in lost_days:
+            timetable.loc[day] = HOLIDAY
+
+        base_counts = self.base.stack().value_counts()
+        week_counts = timetable.stack().value_counts()
+        days = [day for day in timetable.index if day not in lost_days]
+        rescheduled = []
+        unplaced = []
+
+        # Labs first: they need a whole free session as long as their own
+        for name in sorted(self.lab_sessions):
+            length = self.week.session_length(self.lab_sessions[name])
+            missing_sessions = (base_counts.get(name, 0) - week_counts.get(name, 0)) // length
+            for _ in range(missing_sessions):
+                slot = self._free_session(timetable, days, length)
+                if slot is None:
+                    unplaced.append({"subject": name, "periods": length})
+                    continue
+                for period in slot[1]:
+                    timetable.loc[slot[0], period] = name
+                    rescheduled.append((name, slot[0], period))
+
+        # Then theory periods, largest deficit first
+        deficits = {name: base_counts.get(name, 0) - week_counts.get(name, 0) for name in self.teachers}
+        for name in sorted(deficits, key=lambda n: -deficits[n]):
+            for _ in range(deficits[name]):
+                slot = self._free_period(timetable, days, name, saturday_follows)
+                if slot is None:
+                    unplaced.append({"subject": name, "periods": 1})
+                    continue
+                timetable.loc[slot] = name
+                rescheduled.append((name, *slot))
+
+        return {"timetable": timetable, "rescheduled": rescheduled, "unplaced": unplaced}
+
+    def _free_session(self, timetable, days, length):
+        for day in days:
+            for periods in map(self.week.session_periods, SESSIONS):
+                if len(periods) == length and all(timetable.loc[day, p] == "Library" for p in periods):
+                    return day, periods
+        return None
+
+    def _breaks_rule(self, timetable, day, period, name, saturday_follows):
+        """True if one more period of `name` at (day, period) breaks a hard rule"""
+        if self.constraints is None or name not in self.constraints.index:
+            return False
+        # A compensatory Saturday keeps the rules of the weekday it follows
+        d = self.week.day_index[day if day in self.week.day_index else saturday_follows]
+        grid = self.constraints.empty_grid()
+        grid[d] = [self.constraints.index.get(cell, EMPTY) for cell in timetable.loc[day, self.week.periods]]
+        return self.constraints.placement_cost(grid, self.constraints.index[name], d,
+                                               self.week.period_index[period]) is None
+
+    def _free_period(self, timetable, days, name, saturday_follows=None):
+        """Library slot for one more period of `name`, on the day where it has fewest periods"""
+        blocked = {tuple(slot) for slot in self.teacher_free_periods.get(self.teachers[name], [])}
+        best = None
+        for day in days:
+            row = timetable.loc[day]
+            placed = [p for p in self.week.periods if row[p] == name]
+            if len(placed) >= 2:
+                continue
+            if placed:
+                periods = self.week.session_periods(self.week.session_of(placed[0]))
+            else:
+                periods = self.week.periods
+            for period in periods:
+                if row[period] != "Library" or (day, period) in blocked:
+                    continue
+                if self._breaks_rule(timetable, day, period, name, saturday_follows):
+                    continue
+                if best is None or len(placed) < best[0]:
+                    best = (len(placed), day, period)
+                break
+        return best[1:] if best else None
+
+    def plan_term(self, start, weeks=16, holidays=(), exam_weeks=(), compensatory=None):
+        """
+        Derive every week of a term.
+        `start` is the first Monday, `holidays` a collection of dates,
+        `exam_weeks` 1-based week numbers and `compensatory` maps a Saturday's
+        date to the weekday whose timetable it follows.
+        Returns one dict per week with its dates, holidays and derived timetable.
+        """
+        holidays = set(holidays)
+        compensatory = compensatory or {}
+        term = []
+        for week in range(weeks):
+            monday = start + datetime.timedelta(weeks=week)
+            dates = {day: monday + datetime.timedelta(days=i) for i, day in enumerate(self.week.days)}
+            saturday = monday + datetime.timedelta(days=5)
+            saturday_follows = None if SATURDAY in dates else compensatory.get(saturday)
+            if saturday_follows:
+                dates[SATURDAY] = saturday
+            lost_days = [day for day, date in dates.items() if date in holidays and day in self.week.days]
+            exam = week + 1 in exam_weeks
+
+            derived = self.derive_week(lost_days, saturday_follows, exam)
+            term.append({
+                "week": week + 1,
+                "start": monday,
+                "dates": dates,
+                "type": "Exam" if exam else ("Adjusted" if lost_days or saturday_follows else "Regular"),
+                "holidays": [] if exam else lost_days,
+                "saturday_follows": None if exam else saturday_follows,
+                **derived,
+            })
+        return term
+
+    @property
+    def cached_weeks(self):
+        return len(self._cache)
+
+
+def term_summary(term):
+    """One row per week: type, holidays, rescheduled and unplaced periods"""
+    return pd.DataFrame([
+        {
+            "Week": week["week"],
+            "Starts": week["start"].isoformat(),
+            "Type": week["type"],
+            "Holidays": ", ".join(week["holidays"]),
+            "Saturday": f"Follows {week['saturday_follows']}" if week["saturday_follows"] else "",
+            "Rescheduled": len(week["rescheduled"]),
+            "Unplaced": sum(u["periods"] for u in week["unplaced"]),
+        }
+        for week in term
+    ])
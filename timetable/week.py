@@ -0,0 +1,118 @@
+"""
+Shape of the teaching week.
+
+A week is days x periods, split into a forenoon (FN) and an afternoon (AN)
+session; a lab takes one whole session. The standard week is 5 days of 8
+periods split 4/4, an evening programme might be 6 days of 6 split 3/3.
+
+Slot tables are precomputed once per shape so solvers, scoring, analytics
+and exports work with integer slots (day-major: slot = day * periods +
+period) instead of looking up day and period names:
+- slot -> day, period and session codes
+- day, period and (day, period) names -> indices and slots
+- session -> period mask, and (day, session) -> slot mask
+"""
+import numpy as np
+import pandas as pd
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+SESSIONS = ["FN", "AN"]
+
+
+class Week:
+    """Days, periods and session split of a timetable, with slot lookup tables"""
+
+    def __init__(self, days=5, periods=8, forenoon=None):
+        if not 1 <= days <= len(WEEKDAYS):
+            raise ValueError(f"A week has 1 to {len(WEEKDAYS)} days")
+        if periods < 2:
+            raise ValueError("A day needs at least 2 periods, one per session")
+        forenoon = (periods + 1) // 2 if forenoon is None else forenoon
+        if not 1 <= forenoon < periods:
+            raise ValueError("Both sessions need at least one period")
+
+        self.days = WEEKDAYS[:days]
+        self.periods = [f"P{i}" for i in range(1, periods + 1)]
+        self.split = forenoon
+        self.periods_fn = self.periods[:forenoon]
+        self.periods_an = self.periods[forenoon:]
+        self.shape = (days, periods)
+        self.slot_count = days * periods
+
+        self.day_index = {day: d for d, day in enumerate(self.days)}
+        self.period_index = {period: p for p, period in enumerate(self.periods)}
+        self.slot_day = np.repeat(np.arange(days), periods)
+        self.slot_period = np.tile(np.arange(periods), days)
+        self.period_session = (np.arange(periods) >= forenoon).astype(np.int64)  # 0 = FN, 1 = AN
+        self.slot_session = self.period_session[self.slot_period]
+        self.slot_of = {(day, period): d * periods + p
+                        for d, day in enumerate(self.days) for p, period in enumerate(self.periods)}
+        self.slots = list(self.slot_of)
+        self.session_masks = {session: self.period_session == s for s, session in enumerate(SESSIONS)}
+        self.slot_masks = {(day, session): (self.slot_day == d) & (self.slot_session == s)
+                           for d, day in enumerate(self.days) for s, session in enumerate(SESSIONS)}
+
+    @property
+    def spec(self):
+        """(days, periods, forenoon periods), enough to rebuild the week"""
+        return len(self.days), len(self.periods), self.split
+
+    @property
+    def label(self):
+        return f"{len(self.days)} days × {len(self.periods)} periods ({self.split}/{len(self.periods_an)})"
+
+    def __eq__(self, other):
+        return isinstance(other, Week) and self.spec == other.spec
+
+    def __hash__(self):
+        return hash(self.spec)
+
+    def __repr__(self):
+        return f"Week{self.spec}"
+
+    def __reduce__(self):
+        # Workers rebuild the tables instead of unpickling them
+        return Week, self.spec
+
+    def mask(self, slots):
+        """Boolean slot mask of (day, period) pairs; pairs outside this week are ignored"""
+        mask = np.zeros(self.slot_count, dtype=bool)
+        for slot in slots:
+            i = self.slot_of.get(tuple(slot))
+            if i is not None:
+                mask[i] = True
+        return mask
+
+    def session_periods(self, session):
+        """Periods of the "FN" or "AN" session"""
+        return self.periods_fn if session == "FN" else self.periods_an
+
+    def session_of(self, period):
+        return SESSIONS[self.period_session[self.period_index[period]]]
+
+    def session_length(self, session):
+        return len(self.session_periods(session))
+
+    def empty_timetable(self, fill=""):
+        return pd.DataFrame(fill, index=self.days, columns=self.periods)
+
+    def timetable(self, cells):
+        """Timetable DataFrame of a days x periods array of cells"""
+        return pd.DataFrame(np.asarray(cells, dtype=object).reshape(self.shape), index=self.days,
+                            columns=self.periods)
+
+    def cells(self, timetable):
+        """Days x periods object array of a timetable's cells"""
+        return timetable.loc[self.days, self.periods].to_numpy(dtype=object)
+
+    def fits(self, timetable):
+        """True if a timetable DataFrame has exactly this week's days and periods"""
+        return list(timetable.index) == self.days and list(timetable.columns) == self.periods
+
+    @classmethod
+    def of(cls, timetable, forenoon=None):
+        """Week of a timetable DataFrame (its split defaults to the first half, rounded up)"""
+        return cls(len(timetable.index), len(timetable.columns), forenoon)
+
+
+STANDARD_WEEK = Week(5, 8, 4)